@@ -2,7 +2,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import UserProfile,UsageLog
+from .models import UserProfile, UsageLog, UsageCounter, UsageDailyRollup, QuotaReservation
 
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
@@ -32,7 +32,34 @@ class UserProfileAdmin(admin.ModelAdmin):
 @admin.register(UsageLog)
 class UsageLogAdmin(admin.ModelAdmin):
     """使用日誌管理介面"""
-    list_display = ('user', 'service_type', 'operation', 'tokens_used', 'audio_duration', 'created_at')
+    list_display = ('user', 'service_type', 'operation', 'tokens_used', 'audio_duration', 'skipped_duration', 'created_at')
     list_filter = ('service_type', 'created_at', 'user')
     search_fields = ('user__username', 'operation', 'model_name')
-    date_hierarchy = 'created_at'
\ No newline at end of file
+    date_hierarchy = 'created_at'
+
+@admin.register(UsageCounter)
+class UsageCounterAdmin(admin.ModelAdmin):
+    """月度使用計數管理介面（由使用日誌維護，僅供檢視）"""
+    list_display = ('user', 'service_type', 'month', 'count', 'reserved', 'tokens_used', 'audio_duration', 'updated_at')
+    list_filter = ('service_type', 'month')
+    search_fields = ('user__username',)
+    readonly_fields = ('user', 'service_type', 'month', 'count', 'reserved', 'tokens_used', 'audio_duration', 'updated_at')
+
+
+@admin.register(QuotaReservation)
+class QuotaReservationAdmin(admin.ModelAdmin):
+    """配額保留管理介面"""
+    list_display = ('user', 'service_type', 'resource_id', 'status', 'month', 'expires_at', 'created_at')
+    list_filter = ('status', 'service_type', 'month')
+    search_fields = ('user__username',)
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(UsageDailyRollup)
+class UsageDailyRollupAdmin(admin.ModelAdmin):
+    """每日使用彙總管理介面（由使用日誌維護，僅供檢視）"""
+    list_display = ('user', 'service_type', 'date', 'count', 'tokens_used', 'audio_duration', 'updated_at')
+    list_filter = ('service_type', 'date')
+    search_fields = ('user__username',)
+    date_hierarchy = 'date'
+    readonly_fields = ('user', 'service_type', 'date', 'count', 'tokens_used', 'audio_duration', 'updated_at')
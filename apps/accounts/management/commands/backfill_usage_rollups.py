@@ -0,0 +1,48 @@
+# apps/accounts/management/commands/backfill_usage_rollups.py
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.models import UsageDailyRollup, local_date
+
+
+class Command(BaseCommand):
+    """從 UsageLog 回填每日使用彙總，用於建立彙總表前的日誌或修正不一致"""
+
+    help = "從使用日誌重建每位使用者、每種服務的每日使用彙總"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="只重建最近 N 天（含今天），預設重建全部"
+        )
+        parser.add_argument(
+            "--since",
+            help="只重建此日期（YYYY-MM-DD）之後的彙總"
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            help="只重建指定使用者 ID"
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] is not None and options["since"]:
+            raise CommandError("--days 與 --since 不可同時使用")
+
+        start_date = None
+        if options["days"] is not None:
+            if options["days"] < 1:
+                raise CommandError("--days 必須大於 0")
+            start_date = local_date() - datetime.timedelta(days=options["days"] - 1)
+        elif options["since"]:
+            try:
+                start_date = datetime.datetime.strptime(options["since"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError(f"日期格式錯誤: {options['since']}，應為 YYYY-MM-DD")
+
+        count = UsageDailyRollup.rebuild(start_date=start_date, user_id=options["user"])
+        scope = "全部日期" if start_date is None else f"{start_date:%Y-%m-%d} 起"
+        self.stdout.write(self.style.SUCCESS(f"已重建 {scope} 的 {count} 筆每日使用彙總"))
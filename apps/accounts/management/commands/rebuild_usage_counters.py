@@ -0,0 +1,46 @@
+# apps/accounts/management/commands/rebuild_usage_counters.py
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.models import UsageCounter, month_start
+
+
+class Command(BaseCommand):
+    """從 UsageLog 重算月度使用計數，修正計數與日誌不一致的情況"""
+
+    help = "從使用日誌重建每位使用者、每種服務的月度使用計數"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--month",
+            help="只重算指定月份（YYYY-MM），預設為本月"
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="重算所有月份"
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            help="只重算指定使用者 ID"
+        )
+
+    def handle(self, *args, **options):
+        if options["all"] and options["month"]:
+            raise CommandError("--all 與 --month 不可同時使用")
+
+        if options["all"]:
+            month = None
+        elif options["month"]:
+            try:
+                month = datetime.datetime.strptime(options["month"], "%Y-%m").date()
+            except ValueError:
+                raise CommandError(f"月份格式錯誤: {options['month']}，應為 YYYY-MM")
+        else:
+            month = month_start()
+
+        count = UsageCounter.rebuild(month=month, user_id=options["user"])
+        scope = "所有月份" if month is None else f"{month:%Y-%m}"
+        self.stdout.write(self.style.SUCCESS(f"已重建 {scope} 的 {count} 筆使用計數"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_usagelog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usagelog',
+            name='skipped_duration',
+            field=models.FloatField(blank=True, null=True, verbose_name='略過靜音時長(秒)'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:34
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+
+def backfill_current_month(apps, schema_editor):
+    """以本月的使用日誌建立計數，其餘月份可用 rebuild_usage_counters --all 重建"""
+    UsageLog = apps.get_model('accounts', 'UsageLog')
+    UsageCounter = apps.get_model('accounts', 'UsageCounter')
+
+    month = timezone.localdate().replace(day=1)
+    month_begin = timezone.make_aware(datetime.datetime.combine(month, datetime.time.min))
+    rows = UsageLog.objects.filter(created_at__gte=month_begin).values('user_id', 'service_type').annotate(
+        total=Count('id'),
+        total_tokens=Sum('tokens_used'),
+        total_duration=Sum('audio_duration')
+    ).order_by()
+    UsageCounter.objects.bulk_create([
+        UsageCounter(
+            user_id=row['user_id'],
+            service_type=row['service_type'],
+            month=month,
+            count=row['total'],
+            tokens_used=row['total_tokens'] or 0,
+            audio_duration=row['total_duration'] or 0.0
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_usagelog_skipped_duration'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service_type', models.CharField(choices=[('audio_transcription', '音訊轉錄'), ('speaker_identification', '講者辨識'), ('summary_generation', '摘要生成'), ('content_generation', '內容生成'), ('rag_search', '知識檢索')], max_length=50, verbose_name='服務類型')),
+                ('month', models.DateField(help_text='該月第一天（本地時區）', verbose_name='月份')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='使用次數')),
+                ('tokens_used', models.BigIntegerField(default=0, verbose_name='使用 Token 數量')),
+                ('audio_duration', models.FloatField(default=0.0, verbose_name='音訊時長(秒)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_counters', to=settings.AUTH_USER_MODEL, verbose_name='使用者')),
+            ],
+            options={
+                'verbose_name': '月度使用計數',
+                'verbose_name_plural': '月度使用計數',
+                'ordering': ['-month', 'user', 'service_type'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'service_type', 'month'), name='unique_usage_counter')],
+            },
+        ),
+        migrations.RunPython(backfill_current_month, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_usagecounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usagecounter',
+            name='reserved',
+            field=models.PositiveIntegerField(default=0, help_text='已通過配額檢查、尚未提交或釋放的保留數', verbose_name='保留中次數'),
+        ),
+        migrations.CreateModel(
+            name='QuotaReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service_type', models.CharField(choices=[('audio_transcription', '音訊轉錄'), ('speaker_identification', '講者辨識'), ('summary_generation', '摘要生成'), ('content_generation', '內容生成'), ('rag_search', '知識檢索')], max_length=50, verbose_name='服務類型')),
+                ('month', models.DateField(help_text='佔用名額所屬的月份', verbose_name='月份')),
+                ('resource_id', models.IntegerField(blank=True, null=True, verbose_name='資源 ID')),
+                ('status', models.CharField(choices=[('reserved', '保留中'), ('committed', '已提交'), ('released', '已釋放')], default='reserved', max_length=20, verbose_name='狀態')),
+                ('expires_at', models.DateTimeField(verbose_name='逾時時間')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quota_reservations', to=settings.AUTH_USER_MODEL, verbose_name='使用者')),
+            ],
+            options={
+                'verbose_name': '配額保留',
+                'verbose_name_plural': '配額保留',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'service_type', 'month', 'status'], name='quota_reservation_lookup')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_usagecounter_reserved_quotareservation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service_type', models.CharField(choices=[('audio_transcription', '音訊轉錄'), ('speaker_identification', '講者辨識'), ('summary_generation', '摘要生成'), ('content_generation', '內容生成'), ('rag_search', '知識檢索')], max_length=50, verbose_name='服務類型')),
+                ('date', models.DateField(help_text='本地時區的日期', verbose_name='日期')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='使用次數')),
+                ('tokens_used', models.BigIntegerField(default=0, verbose_name='使用 Token 數量')),
+                ('audio_duration', models.FloatField(default=0.0, verbose_name='音訊時長(秒)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+            ],
+            options={
+                'verbose_name': '每日使用彙總',
+                'verbose_name_plural': '每日使用彙總',
+                'ordering': ['-date', 'user', 'service_type'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='usagelog',
+            index=models.Index(fields=['user', '-created_at'], name='usage_log_user_recent'),
+        ),
+        migrations.AddField(
+            model_name='usagedailyrollup',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_daily_rollups', to=settings.AUTH_USER_MODEL, verbose_name='使用者'),
+        ),
+        migrations.AddIndex(
+            model_name='usagedailyrollup',
+            index=models.Index(fields=['user', 'date'], name='usage_rollup_user_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='usagedailyrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'service_type', 'date'), name='unique_usage_daily_rollup'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_usagedailyrollup_usagelog_usage_log_user_recent_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usagelog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='建立時間'),
+        ),
+    ]
@@ -1,7 +1,12 @@
 # apps/accounts/models.py
-from django.db import models
+import datetime
+
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest, TruncDate, TruncMonth
+from django.utils import timezone
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 class UserProfile(models.Model):
@@ -64,13 +69,37 @@ class UserProfile(models.Model):
         """重置已使用配額（每月自動執行）"""
         self.used_quota = {}
         self.save()
+    
+    @classmethod
+    def add_used_quota(cls, user_id, amounts):
+        """
+        鎖定配置檔資料列後累加多項已用配額，並行更新同一使用者時不會互相覆寫
+
+        參數:
+            user_id: 使用者 ID
+            amounts: 服務類型 -> 增加量
+
+        返回:
+            更新後的已用配額，配置檔不存在時返回 None
+        """
+        with transaction.atomic():
+            used_quota = cls.objects.select_for_update().filter(
+                user_id=user_id
+            ).values_list('used_quota', flat=True).first()
+            if used_quota is None:
+                return None
+            for service_type, amount in amounts.items():
+                used_quota[service_type] = used_quota.get(service_type, 0) + amount
+            cls.objects.filter(user_id=user_id).update(used_quota=used_quota, updated_at=timezone.now())
+        
+        # 以 update 寫入不會觸發 post_save，需自行清除權益快取
+        from core.payment.entitlements import invalidate_entitlements
+        invalidate_entitlements(user_id)
+        return used_quota
+    
     def update_usage_quota(self, service_type, amount=1):
         """更新指定服務類型的使用配額"""
-        if service_type not in self.used_quota:
-            self.used_quota[service_type] = 0
-        
-        self.used_quota[service_type] += amount
-        self.save()
+        self.used_quota = UserProfile.add_used_quota(self.user_id, {service_type: amount})
         
         # 檢查是否超出配額
         if service_type in self.monthly_quota:
@@ -111,6 +140,14 @@ def save_user_profile(sender, instance, **kwargs):
     """當使用者被保存時，同時保存對應的配置檔"""
     if hasattr(instance, 'profile'):
         instance.profile.save()
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_entitlements(sender, instance, **kwargs):
+    """配置檔變更時清除快取的使用者權益"""
+    from core.payment.entitlements import invalidate_entitlements
+    invalidate_entitlements(instance.user_id)
 class UsageLog(models.Model):
     """使用日誌模型，記錄使用者對系統資源的使用情況"""
     
@@ -156,8 +193,14 @@ class UsageLog(models.Model):
         blank=True,
         verbose_name="音訊時長(秒)"
     )
+    skipped_duration = models.FloatField(
+        null=True, 
+        blank=True,
+        verbose_name="略過靜音時長(秒)"
+    )
+    # 批次寫入的事件保留發生時間，不以寫入時間為準
     created_at = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
         verbose_name="建立時間"
     )
     
@@ -165,22 +208,49 @@ class UsageLog(models.Model):
         verbose_name = "使用日誌"
         verbose_name_plural = "使用日誌"
         ordering = ["-created_at"]
+        indexes = [
+            # 使用統計頁的最近使用記錄
+            models.Index(fields=['user', '-created_at'], name='usage_log_user_recent'),
+        ]
         
     def __str__(self):
         return f"{self.user.username} - {self.get_service_type_display()} ({self.created_at.strftime('%Y-%m-%d %H:%M')})"
     
     @classmethod
     def log_usage(cls, user, service_type, operation, **kwargs):
-        """記錄使用情況的便捷方法"""
-        return cls.objects.create(
-            user=user,
-            service_type=service_type,
-            operation=operation,
-            resource_id=kwargs.get('resource_id'),
-            tokens_used=kwargs.get('tokens_used', 0),
-            model_name=kwargs.get('model_name', ''),
-            audio_duration=kwargs.get('audio_duration')
-        )
+        """
+        記錄使用情況的便捷方法，同一交易內累加對應的月度計數與每日彙總
+
+        參數:
+            user: 使用者實例或使用者 ID
+        """
+        user_id = getattr(user, 'pk', user)
+        with transaction.atomic():
+            usage_log = cls.objects.create(
+                user_id=user_id,
+                service_type=service_type,
+                operation=operation,
+                resource_id=kwargs.get('resource_id'),
+                tokens_used=kwargs.get('tokens_used', 0),
+                model_name=kwargs.get('model_name', ''),
+                audio_duration=kwargs.get('audio_duration'),
+                skipped_duration=kwargs.get('skipped_duration')
+            )
+            UsageCounter.increment(
+                user_id,
+                service_type,
+                month=usage_log.created_at,
+                tokens_used=usage_log.tokens_used,
+                audio_duration=usage_log.audio_duration or 0.0
+            )
+            UsageDailyRollup.increment(
+                user_id,
+                service_type,
+                date=usage_log.created_at,
+                tokens_used=usage_log.tokens_used,
+                audio_duration=usage_log.audio_duration or 0.0
+            )
+        return usage_log
     
     @classmethod
     def get_user_usage(cls, user, service_type=None, days=30):
@@ -197,4 +267,534 @@ class UsageLog(models.Model):
         if service_type:
             query = query.filter(service_type=service_type)
             
-        return query
\ No newline at end of file
+        return query
+
+
+def local_date(value=None):
+    """取得指定時間（預設為現在）在本地時區的日期"""
+    if value is None:
+        value = timezone.now()
+    if isinstance(value, datetime.datetime):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    return value
+
+
+def month_start(value=None):
+    """取得指定時間（預設為現在）在本地時區所屬月份的第一天"""
+    return local_date(value).replace(day=1)
+
+
+def increment_usage_row(model, lookup, count=1, tokens_used=0, audio_duration=0.0):
+    """
+    原子地累加彙總資料列的使用次數、Token 數與音訊時長，資料列不存在時建立
+
+    先以 UPDATE ... SET count = count + n 累加；沒有資料列時建立，
+    若同時有其他交易搶先建立（唯一約束衝突），改回累加。
+
+    參數:
+        model: 彙總模型（UsageCounter、UsageDailyRollup）
+        lookup: 唯一鍵欄位與值
+    """
+    increments = {
+        'count': F('count') + count,
+        'tokens_used': F('tokens_used') + (tokens_used or 0),
+        'audio_duration': F('audio_duration') + (audio_duration or 0.0),
+        'updated_at': timezone.now(),
+    }
+    if model.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(
+                count=count,
+                tokens_used=tokens_used or 0,
+                audio_duration=audio_duration or 0.0,
+                **lookup
+            )
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**increments)
+
+
+class UsageCounter(models.Model):
+    """
+    每位使用者、每種服務、每月的使用量計數
+
+    由 UsageLog.log_usage 在寫入日誌的同一交易中以 F() 累加，配額檢查只需一次唯一索引查詢，
+    不必隨歷史增長對 UsageLog 做 COUNT。計數與日誌不一致時以 rebuild 從 UsageLog 重算。
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="usage_counters",
+        verbose_name="使用者"
+    )
+    service_type = models.CharField(
+        max_length=50,
+        choices=UsageLog.SERVICE_TYPES,
+        verbose_name="服務類型"
+    )
+    month = models.DateField(
+        verbose_name="月份",
+        help_text="該月第一天（本地時區）"
+    )
+    count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="使用次數"
+    )
+    tokens_used = models.BigIntegerField(
+        default=0,
+        verbose_name="使用 Token 數量"
+    )
+    audio_duration = models.FloatField(
+        default=0.0,
+        verbose_name="音訊時長(秒)"
+    )
+    reserved = models.PositiveIntegerField(
+        default=0,
+        verbose_name="保留中次數",
+        help_text="已通過配額檢查、尚未提交或釋放的保留數"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="更新時間"
+    )
+
+    class Meta:
+        verbose_name = "月度使用計數"
+        verbose_name_plural = "月度使用計數"
+        ordering = ["-month", "user", "service_type"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'service_type', 'month'],
+                name='unique_usage_counter'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.service_type} ({self.month:%Y-%m}): {self.count}"
+
+    @classmethod
+    def increment(cls, user_id, service_type, month=None, count=1, tokens_used=0, audio_duration=0.0):
+        """
+        原子地累加計數，資料列不存在時建立
+
+        參數:
+            user_id: 使用者 ID
+            service_type: 服務類型
+            month: 所屬月份的任一日期或時間，預設為本月
+        """
+        increment_usage_row(
+            cls,
+            {'user_id': user_id, 'service_type': service_type, 'month': month_start(month)},
+            count=count,
+            tokens_used=tokens_used,
+            audio_duration=audio_duration
+        )
+
+    @classmethod
+    def lock(cls, user_id, service_type, month=None):
+        """
+        取得並鎖定計數資料列（SELECT ... FOR UPDATE），資料列不存在時先建立
+
+        須在交易中呼叫；只鎖定同一使用者、同一服務、同一月份的資料列，不影響其他使用者。
+        """
+        lookup = {'user_id': user_id, 'service_type': service_type, 'month': month_start(month)}
+        try:
+            return cls.objects.select_for_update().get(**lookup)
+        except cls.DoesNotExist:
+            pass
+        try:
+            with transaction.atomic():
+                cls.objects.create(**lookup)
+        except IntegrityError:
+            # 其他交易搶先建立
+            pass
+        return cls.objects.select_for_update().get(**lookup)
+
+    @classmethod
+    def get_count(cls, user_id, service_type, month=None, include_reserved=False):
+        """
+        取得使用者指定服務在某月的使用次數（唯一索引的單點查詢）
+
+        參數:
+            include_reserved: 是否計入保留中、尚未提交的次數
+        """
+        row = cls.objects.filter(
+            user_id=user_id,
+            service_type=service_type,
+            month=month_start(month)
+        ).values_list('count', 'reserved').first()
+        if row is None:
+            return 0
+        count, reserved = row
+        return count + reserved if include_reserved else count
+
+    @classmethod
+    def rebuild(cls, month=None, user_id=None):
+        """
+        從 UsageLog 重算計數，覆寫既有計數資料列的使用量（保留中次數不變）
+
+        重算與寫入在同一交易中完成；重算期間寫入的日誌可能未被計入，宜在低流量時段執行。
+
+        參數:
+            month: 只重算指定月份，若為None則重算所有月份
+            user_id: 只重算指定使用者
+
+        返回:
+            寫入的計數資料列數
+        """
+        logs = UsageLog.objects.all()
+        counters = cls.objects.all()
+        if month is not None:
+            month = month_start(month)
+            next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+            tz = timezone.get_current_timezone()
+            logs = logs.filter(
+                created_at__gte=datetime.datetime.combine(month, datetime.time.min, tzinfo=tz),
+                created_at__lt=datetime.datetime.combine(next_month, datetime.time.min, tzinfo=tz)
+            )
+            counters = counters.filter(month=month)
+        if user_id is not None:
+            logs = logs.filter(user_id=user_id)
+            counters = counters.filter(user_id=user_id)
+
+        rows = logs.annotate(
+            log_month=TruncMonth('created_at')
+        ).values('user_id', 'service_type', 'log_month').annotate(
+            total=Count('id'),
+            total_tokens=Sum('tokens_used'),
+            total_duration=Sum('audio_duration')
+        ).order_by()
+
+        with transaction.atomic():
+            # 日誌中已不存在的計數歸零，其餘以重算結果覆寫
+            counters.update(count=0, tokens_used=0, audio_duration=0.0, updated_at=timezone.now())
+            created = cls.objects.bulk_create(
+                [
+                    cls(
+                        user_id=row['user_id'],
+                        service_type=row['service_type'],
+                        month=month_start(row['log_month']),
+                        count=row['total'],
+                        tokens_used=row['total_tokens'] or 0,
+                        audio_duration=row['total_duration'] or 0.0
+                    )
+                    for row in rows.iterator()
+                ],
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['user', 'service_type', 'month'],
+                update_fields=['count', 'tokens_used', 'audio_duration', 'updated_at']
+            )
+        return len(created)
+
+
+class QuotaReservation(models.Model):
+    """
+    配額保留
+
+    任務開始前以 reserve 在計數資料列的鎖內檢查「已使用 + 保留中」是否低於上限並佔用一次，
+    完成時 commit 轉為使用日誌，失敗時 release 歸還。並行任務因此不會同時通過最後一個名額。
+    未提交也未釋放的保留在逾時後，由同一計數的下一次 reserve 自動釋放。
+    """
+
+    STATUS_CHOICES = [
+        ('reserved', '保留中'),
+        ('committed', '已提交'),
+        ('released', '已釋放'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="quota_reservations",
+        verbose_name="使用者"
+    )
+    service_type = models.CharField(
+        max_length=50,
+        choices=UsageLog.SERVICE_TYPES,
+        verbose_name="服務類型"
+    )
+    month = models.DateField(
+        verbose_name="月份",
+        help_text="佔用名額所屬的月份"
+    )
+    resource_id = models.IntegerField(
+        null=True,
+        blank=True,
+        verbose_name="資源 ID"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='reserved',
+        verbose_name="狀態"
+    )
+    expires_at = models.DateTimeField(
+        verbose_name="逾時時間"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="建立時間"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="更新時間"
+    )
+
+    class Meta:
+        verbose_name = "配額保留"
+        verbose_name_plural = "配額保留"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=['user', 'service_type', 'month', 'status'], name='quota_reservation_lookup'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.service_type} ({self.get_status_display()})"
+
+    @classmethod
+    def reserve(cls, user_id, service_type, limit=-1, resource_id=None, ttl=None):
+        """
+        在計數資料列的鎖內佔用一次配額
+
+        同一資源已有未逾時的保留時（例如任務重試）直接沿用，不重複佔用。
+
+        參數:
+            user_id: 使用者 ID
+            service_type: 服務類型
+            limit: 每月上限，負值表示無限制
+            resource_id: 資源 ID
+            ttl: 保留的有效秒數，若為None則使用 QUOTA_RESERVATION_TTL 設定
+
+        返回:
+            QuotaReservation 實例，配額不足時返回 None
+        """
+        if ttl is None:
+            ttl = getattr(settings, 'QUOTA_RESERVATION_TTL', 6 * 60 * 60)
+        now = timezone.now()
+        month = month_start(now)
+
+        with transaction.atomic():
+            counter = UsageCounter.lock(user_id, service_type, month)
+            active = cls.objects.filter(user_id=user_id, service_type=service_type, month=month, status='reserved')
+
+            # 釋放逾時的保留
+            expired = active.filter(expires_at__lte=now).update(status='released', updated_at=now)
+            reserved = max(0, counter.reserved - expired)
+
+            reservation = None
+            if resource_id is not None:
+                reservation = active.filter(resource_id=resource_id, expires_at__gt=now).first()
+
+            if reservation is not None:
+                reservation.expires_at = now + datetime.timedelta(seconds=ttl)
+                reservation.save(update_fields=['expires_at', 'updated_at'])
+            elif limit < 0 or counter.count + reserved < limit:
+                reserved += 1
+                reservation = cls.objects.create(
+                    user_id=user_id,
+                    service_type=service_type,
+                    month=month,
+                    resource_id=resource_id,
+                    expires_at=now + datetime.timedelta(seconds=ttl)
+                )
+
+            if reserved != counter.reserved:
+                UsageCounter.objects.filter(pk=counter.pk).update(reserved=reserved, updated_at=now)
+        return reservation
+
+    @classmethod
+    def find_active(cls, user_id, service_type, resource_id):
+        """取得資源目前保留中的配額"""
+        return cls.objects.filter(
+            user_id=user_id,
+            service_type=service_type,
+            resource_id=resource_id,
+            status='reserved'
+        ).order_by('-created_at').first()
+
+    def _finish(self, status):
+        """
+        將保留轉為指定狀態並歸還保留名額
+
+        鎖定順序與 reserve 相同（先計數資料列、再保留），避免互相等待。
+
+        返回:
+            保留原本是否仍在保留中；已提交或已釋放時返回 False
+        """
+        with transaction.atomic():
+            counter = UsageCounter.lock(self.user_id, self.service_type, self.month)
+            current = type(self).objects.select_for_update().get(pk=self.pk)
+            if current.status != 'reserved':
+                self.status = current.status
+                return False
+
+            type(self).objects.filter(pk=self.pk).update(status=status, updated_at=timezone.now())
+            UsageCounter.objects.filter(pk=counter.pk).update(
+                reserved=Greatest(F('reserved') - 1, 0),
+                updated_at=timezone.now()
+            )
+        self.status = status
+        return True
+
+    def commit(self, operation, **kwargs):
+        """
+        提交保留並記錄使用日誌
+
+        保留已逾時被釋放時仍記錄使用（服務已實際提供）；已提交過則不重複記錄。
+
+        參數:
+            operation: 操作描述
+            **kwargs: 傳給 UsageLog.log_usage 的額外資訊
+
+        返回:
+            UsageLog 實例，重複提交時返回 None
+        """
+        with transaction.atomic():
+            was_reserved = self._finish('committed')
+            if not was_reserved:
+                if self.status == 'committed':
+                    return None
+                type(self).objects.filter(pk=self.pk).update(status='committed', updated_at=timezone.now())
+                self.status = 'committed'
+            return UsageLog.log_usage(self.user_id, self.service_type, operation, resource_id=self.resource_id, **kwargs)
+
+    def release(self):
+        """釋放保留，歸還佔用的名額；已提交或已釋放時不做任何事"""
+        return self._finish('released')
+
+
+class UsageDailyRollup(models.Model):
+    """
+    每位使用者、每種服務、每日的使用量彙總
+
+    由 UsageLog.log_usage 與批次寫入使用事件時累加，使用統計頁只需讀取所選期間的彙總列，
+    不必對原始使用日誌做 GROUP BY。彙總與日誌不一致或新增此表前的日誌，以 rebuild 從 UsageLog 重算。
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="usage_daily_rollups",
+        verbose_name="使用者"
+    )
+    service_type = models.CharField(
+        max_length=50,
+        choices=UsageLog.SERVICE_TYPES,
+        verbose_name="服務類型"
+    )
+    date = models.DateField(
+        verbose_name="日期",
+        help_text="本地時區的日期"
+    )
+    count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="使用次數"
+    )
+    tokens_used = models.BigIntegerField(
+        default=0,
+        verbose_name="使用 Token 數量"
+    )
+    audio_duration = models.FloatField(
+        default=0.0,
+        verbose_name="音訊時長(秒)"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="更新時間"
+    )
+
+    class Meta:
+        verbose_name = "每日使用彙總"
+        verbose_name_plural = "每日使用彙總"
+        ordering = ["-date", "user", "service_type"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'service_type', 'date'],
+                name='unique_usage_daily_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date'], name='usage_rollup_user_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.service_type} ({self.date:%Y-%m-%d}): {self.count}"
+
+    @classmethod
+    def increment(cls, user_id, service_type, date=None, count=1, tokens_used=0, audio_duration=0.0):
+        """
+        原子地累加彙總，資料列不存在時建立
+
+        參數:
+            user_id: 使用者 ID
+            service_type: 服務類型
+            date: 所屬日期或時間，預設為今天
+        """
+        increment_usage_row(
+            cls,
+            {'user_id': user_id, 'service_type': service_type, 'date': local_date(date)},
+            count=count,
+            tokens_used=tokens_used,
+            audio_duration=audio_duration
+        )
+
+    @classmethod
+    def for_period(cls, user, days, service_type=None):
+        """取得使用者最近 days 天（含今天）的彙總列"""
+        start_date = local_date() - datetime.timedelta(days=days - 1)
+        rollups = cls.objects.filter(user=user, date__gte=start_date)
+        if service_type:
+            rollups = rollups.filter(service_type=service_type)
+        return rollups
+
+    @classmethod
+    def rebuild(cls, start_date=None, user_id=None):
+        """
+        從 UsageLog 重算彙總，覆寫既有的彙總列
+
+        參數:
+            start_date: 只重算此日期（含）之後的彙總，若為None則重算全部
+            user_id: 只重算指定使用者
+
+        返回:
+            寫入的彙總列數
+        """
+        logs = UsageLog.objects.all()
+        rollups = cls.objects.all()
+        if start_date is not None:
+            tz = timezone.get_current_timezone()
+            logs = logs.filter(created_at__gte=datetime.datetime.combine(start_date, datetime.time.min, tzinfo=tz))
+            rollups = rollups.filter(date__gte=start_date)
+        if user_id is not None:
+            logs = logs.filter(user_id=user_id)
+            rollups = rollups.filter(user_id=user_id)
+
+        rows = logs.annotate(
+            log_date=TruncDate('created_at')
+        ).values('user_id', 'service_type', 'log_date').annotate(
+            total=Count('id'),
+            total_tokens=Sum('tokens_used'),
+            total_duration=Sum('audio_duration')
+        ).order_by()
+
+        with transaction.atomic():
+            # 日誌中已不存在的彙總列刪除，其餘以重算結果覆寫
+            rollups.delete()
+            created = cls.objects.bulk_create(
+                [
+                    cls(
+                        user_id=row['user_id'],
+                        service_type=row['service_type'],
+                        date=row['log_date'],
+                        count=row['total'],
+                        tokens_used=row['total_tokens'] or 0,
+                        audio_duration=row['total_duration'] or 0.0
+                    )
+                    for row in rows.iterator()
+                ],
+                batch_size=1000
+            )
+        return len(created)
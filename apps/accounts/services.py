@@ -1,18 +1,27 @@
 # apps/accounts/services.py
+from collections import defaultdict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Sum
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Sum, Count
-from .models import UsageLog
+from .models import UsageLog, UsageCounter, UsageDailyRollup, UserProfile, local_date, month_start
+from .usage_buffer import UsageEventBuffer
 
 class UsageTrackingService:
     """使用追蹤服務類，提供使用統計與分析功能"""
     
     @staticmethod
     def track_usage(user, service_type, operation, **kwargs):
-        """記錄使用情況並更新使用者配額"""
-        # 記錄使用日誌
-        usage_log = UsageLog.log_usage(user, service_type, operation, **kwargs)
+        """
+        記錄使用情況並更新使用者配額
         
+        USAGE_BUFFER_ENABLED 開啟時事件先放入程序內緩衝區，之後批次寫入，不返回使用日誌；
+        配額狀態依快取的使用者權益估算，不含尚未寫入的事件。
+        
+        返回:
+            (使用日誌或None, 是否仍在配額內)
+        """
         # 根據服務類型決定要增加的量
         amount = 1
         if service_type == 'audio_transcription' and kwargs.get('audio_duration'):
@@ -21,42 +30,127 @@ class UsageTrackingService:
         elif kwargs.get('tokens_used'):
             # 如果提供了 tokens_used，使用它
             amount = kwargs.get('tokens_used')
-            
-        # 更新使用者配額
-        profile = user.profile
-        quota_status = profile.update_usage_quota(service_type, amount)
         
-        return usage_log, quota_status
+        event = {
+            'user_id': user.pk,
+            'service_type': service_type,
+            'operation': operation,
+            'resource_id': kwargs.get('resource_id'),
+            'tokens_used': kwargs.get('tokens_used', 0),
+            'model_name': kwargs.get('model_name', ''),
+            'audio_duration': kwargs.get('audio_duration'),
+            'skipped_duration': kwargs.get('skipped_duration'),
+            'amount': amount,
+            # 事件發生時間，寫入時用於使用日誌的建立時間及計數的月份與日期
+            'created_at': timezone.now(),
+        }
+        
+        usage_log = None
+        if getattr(settings, 'USAGE_BUFFER_ENABLED', True):
+            usage_buffer.add(event)
+        else:
+            usage_log = UsageTrackingService.write_usage_events([event])[0]
+        
+        return usage_log, UsageTrackingService.quota_status(user.pk, service_type, amount)
     
     @staticmethod
-    def get_usage_summary(user, days=30):
-        """獲取使用者的使用摘要"""
-        start_date = timezone.now() - timedelta(days=days)
+    def quota_status(user_id, service_type, amount=0):
+        """依快取的使用者權益判斷加上 amount 後是否仍在每月配額內"""
+        from core.payment.entitlements import get_entitlements
         
-        # 按服務類型分組的使用次數
-        service_counts = UsageLog.objects.filter(
-            user=user, 
-            created_at__gte=start_date
-        ).values('service_type').annotate(
-            count=Count('id')
-        ).order_by('service_type')
+        try:
+            entitlements = get_entitlements(user_id)
+        except UserProfile.DoesNotExist:
+            return True
         
-        # 按服務類型分組的 Token 使用量
-        token_usage = UsageLog.objects.filter(
-            user=user, 
-            created_at__gte=start_date
-        ).values('service_type').annotate(
-            total_tokens=Sum('tokens_used')
-        ).order_by('service_type')
+        limit = entitlements.monthly_quota.get(service_type)
+        # 未設定或負值表示無限制
+        if limit is None or limit < 0:
+            return True
+        return entitlements.used_quota.get(service_type, 0) + amount < limit
+    
+    @staticmethod
+    def write_usage_events(events):
+        """
+        批次寫入使用事件
+        
+        在同一交易中以一次 bulk_create 寫入所有使用日誌，並依使用者、服務與月份（日期）合併後
+        累加月度計數與每日彙總、依使用者合併後更新已用配額；失敗時整批回滾，可安全重試。
+        月份與日期依事件的發生時間（created_at）歸屬，延遲寫入的事件不會被算入寫入當時的期間。
+        
+        返回:
+            建立的 UsageLog 列表
+        """
+        # 緩衝期間被刪除的使用者，其事件無法寫入，略過以免整批重試失敗
+        user_ids = set(get_user_model().objects.filter(
+            id__in={event['user_id'] for event in events}
+        ).values_list('id', flat=True))
+        events = [event for event in events if event['user_id'] in user_ids]
+        
+        with transaction.atomic():
+            usage_logs = UsageLog.objects.bulk_create([
+                UsageLog(
+                    user_id=event['user_id'],
+                    service_type=event['service_type'],
+                    operation=event['operation'],
+                    resource_id=event.get('resource_id'),
+                    tokens_used=event.get('tokens_used') or 0,
+                    model_name=event.get('model_name') or '',
+                    audio_duration=event.get('audio_duration'),
+                    skipped_duration=event.get('skipped_duration'),
+                    created_at=event.get('created_at') or timezone.now()
+                )
+                for event in events
+            ])
+            
+            counters = defaultdict(lambda: {'count': 0, 'tokens_used': 0, 'audio_duration': 0.0})
+            rollups = defaultdict(lambda: {'count': 0, 'tokens_used': 0, 'audio_duration': 0.0})
+            used_amounts = defaultdict(lambda: defaultdict(float))
+            for event, usage_log in zip(events, usage_logs):
+                for totals in (
+                    counters[(usage_log.user_id, usage_log.service_type, month_start(usage_log.created_at))],
+                    rollups[(usage_log.user_id, usage_log.service_type, local_date(usage_log.created_at))],
+                ):
+                    totals['count'] += 1
+                    totals['tokens_used'] += usage_log.tokens_used
+                    totals['audio_duration'] += usage_log.audio_duration or 0.0
+                used_amounts[usage_log.user_id][usage_log.service_type] += event.get('amount', 1)
+            
+            for (user_id, service_type, month), totals in counters.items():
+                UsageCounter.increment(user_id, service_type, month=month, **totals)
+            for (user_id, service_type, date), totals in rollups.items():
+                UsageDailyRollup.increment(user_id, service_type, date=date, **totals)
+            for user_id, amounts in used_amounts.items():
+                UserProfile.add_used_quota(user_id, amounts)
         
-        # 按服務類型分組的音訊時長
-        audio_duration = UsageLog.objects.filter(
-            user=user, 
-            created_at__gte=start_date,
-            audio_duration__isnull=False
-        ).values('service_type').annotate(
+        return usage_logs
+    
+    @staticmethod
+    def get_usage_summary(user, days=30):
+        """
+        獲取使用者的使用摘要
+        
+        讀取最近 days 天（含今天，以日為單位）的每日彙總，不掃描原始使用日誌。
+        """
+        totals = list(UsageDailyRollup.for_period(user, days).values('service_type').annotate(
+            count=Sum('count'),
+            total_tokens=Sum('tokens_used'),
             total_duration=Sum('audio_duration')
-        ).order_by('service_type')
+        ).order_by('service_type'))
+        
+        # 按服務類型分組的使用次數、Token 使用量與音訊時長
+        service_counts = [
+            {'service_type': item['service_type'], 'count': item['count']}
+            for item in totals
+        ]
+        token_usage = [
+            {'service_type': item['service_type'], 'total_tokens': item['total_tokens']}
+            for item in totals
+        ]
+        audio_duration = [
+            {'service_type': item['service_type'], 'total_duration': item['total_duration']}
+            for item in totals if item['total_duration']
+        ]
         
         # 最近的使用記錄
         recent_logs = UsageLog.objects.filter(
@@ -72,23 +166,16 @@ class UsageTrackingService:
     
     @staticmethod
     def get_daily_usage(user, service_type=None, days=30):
-        """獲取使用者的每日使用情況"""
-        from django.db.models.functions import TruncDate
-        
-        start_date = timezone.now() - timedelta(days=days)
-        
-        # 基本查詢
-        query = UsageLog.objects.filter(user=user, created_at__gte=start_date)
-        
-        # 如果指定了服務類型，進一步過濾
-        if service_type:
-            query = query.filter(service_type=service_type)
-            
-        # 按日期分組統計
-        daily_counts = query.annotate(
-            date=TruncDate('created_at')
-        ).values('date').annotate(
-            count=Count('id')
+        """獲取使用者的每日使用情況（讀取每日彙總）"""
+        return UsageDailyRollup.for_period(user, days, service_type).values('date').annotate(
+            count=Sum('count')
         ).order_by('date')
-        
-        return daily_counts
\ No newline at end of file
+
+
+# 每個程序一個緩衝區，由被追蹤的視圖共用
+usage_buffer = UsageEventBuffer(
+    UsageTrackingService.write_usage_events,
+    batch_size=getattr(settings, 'USAGE_BUFFER_BATCH_SIZE', 100),
+    flush_interval=getattr(settings, 'USAGE_BUFFER_FLUSH_INTERVAL', 5.0),
+    max_events=getattr(settings, 'USAGE_BUFFER_MAX_EVENTS', 10000)
+)
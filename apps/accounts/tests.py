@@ -1,7 +1,25 @@
 # apps/accounts/tests.py
-from django.test import TestCase
+import queue
+import random
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth import get_user_model
-from .models import UserProfile
+from django.core.management import call_command
+from core.ai.model_selector import ModelProviderType, ModelSelector
+from core.payment.entitlements import get_entitlements
+from core.payment.quota import QuotaManager, ServiceType
+from utils.decorators import track_usage
+from .models import UserProfile, UsageLog, UsageCounter, UsageDailyRollup, QuotaReservation, local_date, month_start
+from .services import UsageTrackingService
+from .usage_buffer import UsageEventBuffer
 
 User = get_user_model()
 
@@ -36,4 +54,366 @@ class UserProfileModelTest(TestCase):
         
         # 驗證計算
         self.assertEqual(profile.get_available_quota('test_service'), 7)
-        self.assertEqual(profile.get_available_quota('nonexistent_service'), 0)
\ No newline at end of file
+        self.assertEqual(profile.get_available_quota('nonexistent_service'), 0)
+
+
+class UsageCounterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='counteruser',
+            email='counter@example.com',
+            password='password123'
+        )
+
+    def test_log_usage_increments_counter(self):
+        """測試記錄使用日誌時同步累加月度計數"""
+        QuotaManager.log_usage(self.user.id, ServiceType.AUDIO_TRANSCRIPTION, duration=120.0)
+        QuotaManager.log_usage(self.user.id, ServiceType.AUDIO_TRANSCRIPTION, duration=30.0)
+
+        counter = UsageCounter.objects.get(user=self.user, service_type='audio_transcription')
+        self.assertEqual(counter.count, 2)
+        self.assertAlmostEqual(counter.audio_duration, 150.0)
+        self.assertEqual(UsageLog.objects.filter(user=self.user).count(), 2)
+
+    def test_check_quota_uses_counter(self):
+        """測試本月使用量達上限時拒絕，且只讀取計數"""
+        for _ in range(10):
+            QuotaManager.log_usage(self.user.id, ServiceType.RAG_SEARCH)
+
+        with self.assertNumQueries(2):
+            allowed, message = QuotaManager.check_quota(self.user.id, ServiceType.RAG_SEARCH)
+        self.assertFalse(allowed)
+        self.assertIn('本月使用限制', message)
+
+        allowed, message = QuotaManager.check_quota(self.user.id + 1000, ServiceType.RAG_SEARCH)
+        self.assertFalse(allowed)
+        self.assertEqual(message, '使用者不存在')
+
+    def test_rebuild_from_usage_log(self):
+        """測試重建指令以使用日誌修正計數"""
+        QuotaManager.log_usage(self.user.id, ServiceType.SUMMARY_GENERATION, tokens_used=100)
+        QuotaManager.log_usage(self.user.id, ServiceType.SUMMARY_GENERATION, tokens_used=50)
+        UsageCounter.objects.filter(user=self.user).update(count=99, tokens_used=0)
+
+        call_command('rebuild_usage_counters', stdout=StringIO())
+
+        counter = UsageCounter.objects.get(user=self.user, service_type='summary_generation')
+        self.assertEqual(counter.count, 2)
+        self.assertEqual(counter.tokens_used, 150)
+
+
+class UsageDailyRollupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='rollupuser',
+            email='rollup@example.com',
+            password='password123'
+        )
+
+    def test_log_usage_updates_daily_rollup(self):
+        """測試記錄使用日誌時同步累加當日彙總"""
+        QuotaManager.log_usage(self.user.id, ServiceType.SUMMARY_GENERATION, tokens_used=100)
+        QuotaManager.log_usage(self.user.id, ServiceType.SUMMARY_GENERATION, tokens_used=20)
+
+        rollup = UsageDailyRollup.objects.get(user=self.user, service_type='summary_generation')
+        self.assertEqual(rollup.date, local_date())
+        self.assertEqual(rollup.count, 2)
+        self.assertEqual(rollup.tokens_used, 120)
+
+    def test_summary_reads_rollups(self):
+        """測試使用摘要與每日使用量由彙總讀取，不受日誌筆數影響"""
+        for _ in range(5):
+            QuotaManager.log_usage(self.user.id, ServiceType.AUDIO_TRANSCRIPTION, duration=60.0)
+        QuotaManager.log_usage(self.user.id, ServiceType.RAG_SEARCH)
+        # 超出查詢範圍的彙總不計入
+        UsageDailyRollup.objects.create(
+            user=self.user, service_type='rag_search', date=local_date() - timedelta(days=40), count=7
+        )
+
+        with self.assertNumQueries(1):
+            summary = UsageTrackingService.get_usage_summary(self.user, days=30)
+            service_counts = {item['service_type']: item['count'] for item in summary['service_counts']}
+        self.assertEqual(service_counts, {'audio_transcription': 5, 'rag_search': 1})
+        self.assertEqual(summary['audio_duration'], [
+            {'service_type': 'audio_transcription', 'total_duration': 300.0}
+        ])
+
+        daily = list(UsageTrackingService.get_daily_usage(self.user, days=30))
+        self.assertEqual(daily, [{'date': local_date(), 'count': 6}])
+
+    def test_backfill_rebuilds_rollups(self):
+        """測試回填指令以使用日誌重建彙總"""
+        QuotaManager.log_usage(self.user.id, ServiceType.RAG_SEARCH)
+        QuotaManager.log_usage(self.user.id, ServiceType.RAG_SEARCH)
+        UsageDailyRollup.objects.all().delete()
+
+        call_command('backfill_usage_rollups', '--days', '7', stdout=StringIO())
+
+        rollup = UsageDailyRollup.objects.get(user=self.user, service_type='rag_search')
+        self.assertEqual(rollup.count, 2)
+
+
+class QuotaReservationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='reserveuser',
+            email='reserve@example.com',
+            password='password123'
+        )
+
+    def reserve(self, resource_id=None):
+        return QuotaManager.reserve_quota(self.user.id, ServiceType.RAG_SEARCH, resource_id=resource_id)
+
+    def test_reserve_commit_release(self):
+        """測試保留佔用名額、提交寫入日誌、釋放歸還名額"""
+        reservations = [self.reserve(resource_id=i) for i in range(10)]
+        self.assertTrue(all(allowed for allowed, _, _ in reservations))
+
+        allowed, message, reservation_id = self.reserve(resource_id=10)
+        self.assertFalse(allowed)
+        self.assertIsNone(reservation_id)
+        self.assertFalse(QuotaManager.check_quota(self.user.id, ServiceType.RAG_SEARCH)[0])
+
+        # 同一資源重複保留時沿用既有保留
+        self.assertEqual(self.reserve(resource_id=3)[2], reservations[3][2])
+
+        QuotaManager.commit_quota(self.user.id, ServiceType.RAG_SEARCH, reservation_id=reservations[0][2])
+        QuotaManager.commit_quota(self.user.id, ServiceType.RAG_SEARCH, reservation_id=reservations[0][2])
+        self.assertTrue(QuotaManager.release_quota(self.user.id, ServiceType.RAG_SEARCH, resource_id=1))
+
+        counter = UsageCounter.objects.get(user=self.user, service_type='rag_search')
+        self.assertEqual((counter.count, counter.reserved), (1, 8))
+        self.assertEqual(UsageLog.objects.filter(user=self.user).count(), 1)
+        self.assertTrue(self.reserve(resource_id=10)[0])
+
+    def test_expired_reservation_is_released(self):
+        """測試逾時未提交的保留在下次保留時歸還名額"""
+        for i in range(10):
+            self.reserve(resource_id=i)
+        QuotaReservation.objects.filter(resource_id=0).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertTrue(self.reserve(resource_id=10)[0])
+        self.assertEqual(QuotaReservation.objects.get(resource_id=0).status, 'released')
+        self.assertEqual(UsageCounter.objects.get(user=self.user, service_type='rag_search').reserved, 10)
+
+    def test_commit_and_release_errors_are_logged(self):
+        """測試提交與釋放失敗時記錄錯誤而不拋出例外"""
+        _, _, reservation_id = self.reserve(resource_id=1)
+        with mock.patch.object(QuotaReservation, 'commit', side_effect=RuntimeError('db down')), \
+                self.assertLogs('core.payment.quota', level='ERROR') as logs:
+            QuotaManager.commit_quota(self.user.id, ServiceType.RAG_SEARCH, reservation_id=reservation_id)
+        self.assertIn('配額提交錯誤', logs.output[0])
+
+        with mock.patch.object(QuotaReservation, 'release', side_effect=RuntimeError('db down')), \
+                self.assertLogs('core.payment.quota', level='ERROR') as logs:
+            self.assertFalse(QuotaManager.release_quota(self.user.id, ServiceType.RAG_SEARCH, reservation_id))
+        self.assertIn('配額釋放錯誤', logs.output[0])
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class QuotaConcurrencyTest(TransactionTestCase):
+    """並行保留的壓力測試（需要支援資料列鎖定的資料庫，例如 PostgreSQL）"""
+
+    # 並行的保留次數；實際連線數由 worker_count 限制在資料庫的連線上限內
+    THREADS = 120
+    MAX_WORKERS = 32
+
+    def worker_count(self, task_count):
+        """依資料庫的 max_connections 決定同時執行的執行緒數，保留連線給測試本身與其他用戶端"""
+        limit = self.MAX_WORKERS
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SHOW max_connections')
+                limit = min(limit, max(2, int(cursor.fetchone()[0]) // 2))
+        return min(limit, task_count)
+
+    def run_concurrently(self, targets):
+        """以有上限的執行緒池執行所有工作，每個執行緒使用一條資料庫連線並在結束時關閉"""
+        tasks = queue.Queue()
+        for target in targets:
+            tasks.put(target)
+        workers = self.worker_count(len(targets))
+        barrier = threading.Barrier(workers)
+        errors = []
+
+        def run():
+            try:
+                barrier.wait()
+                while True:
+                    try:
+                        target = tasks.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        target()
+                    except Exception as e:
+                        errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_no_over_admission(self):
+        """測試同一使用者大量並行保留時，通過的數量恰為每月上限，其他使用者不受影響"""
+        busy = User.objects.create_user(username='busy', password='password123')
+        other = User.objects.create_user(username='other', password='password123')
+        admitted = {busy.id: [], other.id: []}
+
+        def reserve(user_id, resource_id):
+            def target():
+                allowed, _, _ = QuotaManager.reserve_quota(user_id, ServiceType.RAG_SEARCH, resource_id=resource_id)
+                if allowed:
+                    admitted[user_id].append(resource_id)
+            return target
+
+        targets = [reserve(busy.id, i) for i in range(self.THREADS)]
+        targets += [reserve(other.id, i) for i in range(5)]
+        random.Random(0).shuffle(targets)
+        self.run_concurrently(targets)
+
+        self.assertEqual(len(admitted[busy.id]), 10)
+        self.assertEqual(len(admitted[other.id]), 5)
+        self.assertEqual(UsageCounter.objects.get(user=busy, service_type='rag_search').reserved, 10)
+
+    def test_update_usage_quota_is_not_lost(self):
+        """測試並行累加已用配額時不會互相覆寫"""
+        user = User.objects.create_user(username='quota', password='password123')
+
+        def target():
+            UserProfile.objects.get(user=user).update_usage_quota('rag_search')
+
+        self.run_concurrently([target] * self.THREADS)
+        self.assertEqual(UserProfile.objects.get(user=user).used_quota['rag_search'], self.THREADS)
+
+
+class EntitlementsCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='entitled',
+            email='entitled@example.com',
+            password='password123'
+        )
+
+    def profile_queries(self, queries):
+        return [query for query in queries.captured_queries if 'accounts_userprofile' in query['sql']]
+
+    def test_profile_read_once_across_checks(self):
+        """測試配額檢查與模型選擇共用一次配置檔讀取"""
+        with CaptureQueriesContext(connection) as queries:
+            QuotaManager.check_quota(self.user.id, ServiceType.RAG_SEARCH)
+            ModelSelector.select_transcription_provider(user_id=self.user.id, audio_length=1200)
+            ModelSelector.select_llm_provider(user_id=self.user.id)
+        self.assertEqual(len(self.profile_queries(queries)), 1)
+
+    def test_profile_save_invalidates(self):
+        """測試配置檔儲存後重新解析權益"""
+        self.assertEqual(get_entitlements(self.user.id).plan, 'free')
+        self.assertEqual(
+            ModelSelector.select_transcription_provider(user_id=self.user.id, audio_length=1200),
+            ModelProviderType.VOSK
+        )
+
+        profile = self.user.profile
+        profile.subscription_plan = 'premium'
+        profile.save()
+
+        self.assertEqual(get_entitlements(self.user.id).plan, 'premium')
+        self.assertEqual(
+            ModelSelector.select_transcription_provider(user_id=self.user.id, audio_length=1200),
+            ModelProviderType.WHISPER
+        )
+
+        profile.update_usage_quota('gemini_calls', 3)
+        self.assertEqual(get_entitlements(self.user.id).used_quota['gemini_calls'], 3)
+
+
+class UsageEventBufferTest(SimpleTestCase):
+    def test_flush_on_batch_size(self):
+        """測試累積達筆數門檻時批次寫入"""
+        batches = []
+        buffer = UsageEventBuffer(batches.append, batch_size=3, flush_interval=0)
+        for i in range(7):
+            buffer.add({'index': i})
+
+        self.assertEqual([len(batch) for batch in batches], [3, 3])
+        self.assertEqual(len(buffer), 1)
+        buffer.stop()
+        self.assertEqual([event['index'] for batch in batches for event in batch], list(range(7)))
+
+    def test_failed_batch_retried_within_bound(self):
+        """測試寫入失敗時事件保留待重試，超過上限時捨棄最舊的事件"""
+        written = []
+
+        def writer(batch):
+            if fail:
+                raise RuntimeError('database unavailable')
+            written.extend(batch)
+
+        fail = True
+        buffer = UsageEventBuffer(writer, batch_size=2, flush_interval=0, max_events=4)
+        with self.assertLogs('apps.accounts.usage_buffer', 'ERROR'):
+            for i in range(6):
+                buffer.add({'index': i})
+
+        self.assertEqual(len(buffer), 4)
+        self.assertEqual(buffer.dropped_count, 2)
+
+        fail = False
+        self.assertEqual(buffer.flush(), 4)
+        self.assertEqual([event['index'] for event in written], [2, 3, 4, 5])
+
+
+class UsageTrackingBufferTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='tracked', password='password123')
+        self.buffer = UsageEventBuffer(UsageTrackingService.write_usage_events, batch_size=100, flush_interval=0)
+        patcher = mock.patch('apps.accounts.services.usage_buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_tracked_view_writes_in_batches(self):
+        """測試被追蹤的視圖不直接寫入，批次寫入日誌、計數與已用配額"""
+        @track_usage('rag_search', operation='search')
+        def view(request, pk=None):
+            return 'ok'
+
+        request = RequestFactory().get('/')
+        request.user = self.user
+        for pk in range(5):
+            self.assertEqual(view(request, pk=pk), 'ok')
+
+        self.assertEqual(len(self.buffer), 5)
+        self.assertFalse(UsageLog.objects.filter(user=self.user).exists())
+
+        self.assertEqual(self.buffer.flush(), 5)
+        self.assertEqual(UsageLog.objects.filter(user=self.user, operation='search').count(), 5)
+        self.assertEqual(UsageCounter.get_count(self.user.id, 'rag_search'), 5)
+        self.assertEqual(UsageDailyRollup.objects.get(user=self.user, service_type='rag_search').count, 5)
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.used_quota['rag_search'], 5)
+
+    def test_delayed_flush_keeps_event_period(self):
+        """測試跨月份後才寫入的事件仍計入事件發生的月份與日期"""
+        @track_usage('rag_search', operation='search')
+        def view(request):
+            return 'ok'
+
+        request = RequestFactory().get('/')
+        request.user = self.user
+        happened_at = timezone.now() - timedelta(days=40)
+        with mock.patch('apps.accounts.services.timezone.now', return_value=happened_at):
+            view(request)
+        self.buffer.flush()
+
+        usage_log = UsageLog.objects.get(user=self.user)
+        self.assertEqual(usage_log.created_at, happened_at)
+        self.assertEqual(UsageCounter.objects.get(user=self.user).month, month_start(happened_at))
+        self.assertEqual(UsageDailyRollup.objects.get(user=self.user).date, local_date(happened_at))
+        self.assertEqual(UsageCounter.get_count(self.user.id, 'rag_search'), 0)
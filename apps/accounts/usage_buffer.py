@@ -0,0 +1,126 @@
+# apps/accounts/usage_buffer.py
+"""
+使用事件的程序內寫入緩衝區。
+
+被追蹤的視圖只把使用事件放入緩衝區，由寫入函式批次寫入資料庫：累積達 batch_size 筆時
+由當下的請求寫入，其餘由背景執行緒每 flush_interval 秒寫入，程序結束時（atexit 與
+Celery 工作程序關閉信號）寫入剩餘事件。寫入失敗的事件放回緩衝區等待下次重試，
+緩衝區超過 max_events 筆時捨棄最舊的事件並記錄錯誤，記憶體用量有上限。
+"""
+import atexit
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+UsageEvent = Dict[str, Any]
+
+
+class UsageEventBuffer:
+    """執行緒安全的使用事件緩衝區"""
+
+    def __init__(self, writer: Callable[[List[UsageEvent]], Any], batch_size: int = 100,
+                 flush_interval: float = 5.0, max_events: int = 10000):
+        """
+        參數:
+            writer: 批次寫入事件的函式，失敗時應拋出例外且不留下部分寫入
+            batch_size: 累積多少筆事件時立即寫入
+            flush_interval: 背景寫入的間隔（秒），0 表示不啟動背景執行緒
+            max_events: 緩衝區最多保留的事件數
+        """
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self.dropped_count = 0
+        self._events: deque = deque()
+        self._lock = threading.Lock()
+        # 同一時間只有一個執行緒寫入，避免同一批事件被重複寫入
+        self._flush_lock = threading.Lock()
+        self._started = False
+        self._flusher: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def add(self, event: UsageEvent) -> None:
+        """加入一筆事件，達到筆數門檻時立即寫入"""
+        with self._lock:
+            self._events.append(event)
+            self._drop_overflow()
+            should_flush = len(self._events) >= self.batch_size
+        self._ensure_started()
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        寫入緩衝區中的所有事件
+
+        返回:
+            成功寫入的事件數
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._events:
+                        break
+                    count = min(len(self._events), self.batch_size)
+                    batch = [self._events.popleft() for _ in range(count)]
+                try:
+                    self.writer(batch)
+                except Exception as e:
+                    logger.exception(f"使用事件批次寫入失敗，{len(batch)} 筆事件放回緩衝區等待重試: {str(e)}")
+                    with self._lock:
+                        self._events.extendleft(reversed(batch))
+                        self._drop_overflow()
+                    break
+                written += len(batch)
+        return written
+
+    def stop(self) -> None:
+        """停止背景執行緒並寫入剩餘事件（程序結束時呼叫）"""
+        self._stopped.set()
+        if self._events:
+            remaining = len(self._events)
+            written = self.flush()
+            if written < remaining:
+                logger.error(f"程序結束時仍有 {remaining - written} 筆使用事件未能寫入")
+
+    def _drop_overflow(self) -> None:
+        """超過上限時捨棄最舊的事件（呼叫端須持有 _lock）"""
+        overflow = len(self._events) - self.max_events
+        if overflow > 0:
+            for _ in range(overflow):
+                self._events.popleft()
+            self.dropped_count += overflow
+            logger.error(f"使用事件緩衝區已滿，捨棄 {overflow} 筆最舊的事件（累計 {self.dropped_count} 筆）")
+
+    def _ensure_started(self) -> None:
+        """第一次加入事件時註冊結束時的寫入，並啟動背景寫入執行緒"""
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        atexit.register(self.stop)
+        if self.flush_interval > 0:
+            self._flusher = threading.Thread(target=self._run_flusher, name="usage-event-flusher", daemon=True)
+            self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        while not self._stopped.wait(self.flush_interval):
+            if not self._events:
+                continue
+            try:
+                self.flush()
+            finally:
+                # 背景執行緒的資料庫連線不會經過請求結束時的清理
+                connection.close()
@@ -1,4 +1,5 @@
 # apps/accounts/views.py
+from django.conf import settings
 from django.contrib.auth.views import LoginView
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy
@@ -138,8 +139,12 @@ class ProfileView(LoginRequiredMixin, UpdateView):
 @login_required
 def usage_statistics(request):
     """顯示使用者的使用統計頁面"""
-    # 獲取天數參數，預設為 30 天
-    days = int(request.GET.get('days', 30))
+    # 獲取天數參數，預設為 30 天，限制在 1 ~ USAGE_STATISTICS_MAX_DAYS 天
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        days = 30
+    days = min(max(days, 1), getattr(settings, 'USAGE_STATISTICS_MAX_DAYS', 365))
     
     # 獲取使用摘要
     usage_summary = UsageTrackingService.get_usage_summary(request.user, days)
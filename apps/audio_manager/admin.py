@@ -4,7 +4,7 @@ from django.contrib import messages
 from django.db import transaction
 from django.shortcuts import render
 from django.http import HttpResponseRedirect
-from .models import AudioFile, Transcript, TranscriptSegment
+from .models import AudioFile, Transcript, TranscriptionChunk, TranscriptSegment
 
 
 @admin.register(AudioFile)
@@ -15,18 +15,19 @@ class AudioFileAdmin(admin.ModelAdmin):
                    'processing_status', 'created_at')
     list_filter = ('processing_status', 'format', 'created_at')
     search_fields = ('title', 'description', 'user__username')
-    readonly_fields = ('format', 'duration', 'file_size', 'sample_rate', 'channels', 
-                      'processing_status', 'processing_message', 'created_at', 'updated_at', 'processed_at')
+    readonly_fields = ('format', 'duration', 'file_size', 'sample_rate', 'channels', 'content_hash',
+                      'processing_status', 'processing_message', 'stage_timings',
+                      'created_at', 'updated_at', 'processed_at')
     
     fieldsets = (
         ('基本資訊', {
             'fields': ('title', 'description', 'user')
         }),
         ('檔案資訊', {
-            'fields': ('file', 'format', 'duration', 'file_size', 'sample_rate', 'channels')
+            'fields': ('file', 'format', 'duration', 'file_size', 'sample_rate', 'channels', 'content_hash')
         }),
         ('處理狀態', {
-            'fields': ('processing_status', 'processing_message', 'processing_method')
+            'fields': ('processing_status', 'processing_message', 'processing_method', 'stage_timings')
         }),
         ('時間資訊', {
             'fields': ('created_at', 'updated_at', 'processed_at')
@@ -44,18 +45,22 @@ class TranscriptSegmentInline(admin.TabularInline):
 @admin.register(Transcript)
 class TranscriptAdmin(admin.ModelAdmin):
     list_display = ('__str__', 'language', 'processing_method', 'word_count', 'is_processed', 'created_at')
-    list_filter = ('is_processed', 'processing_method', 'language', 'created_at')
+    list_filter = ('is_processed', 'is_speaker_identified', 'processing_method', 'language', 'created_at')
     search_fields = ('audio_file__title', 'full_text')
-    readonly_fields = ('word_count', 'created_at', 'updated_at')
+    readonly_fields = ('word_count', 'cache_key', 'processing_time', 'stage_timings', 'peak_memory_mb',
+                       'audio_seconds_per_second', 'created_at', 'updated_at')
     date_hierarchy = 'created_at'
     inlines = [TranscriptSegmentInline]
     
     fieldsets = (
         ('基本資訊', {
-            'fields': ('audio_file', 'language', 'processing_method', 'is_processed')
+            'fields': ('audio_file', 'language', 'processing_method', 'is_processed', 'is_speaker_identified')
         }),
         ('轉錄資訊', {
-            'fields': ('full_text', 'word_count', 'confidence_score', 'processing_time')
+            'fields': ('full_text', 'word_count', 'confidence_score', 'cache_key')
+        }),
+        ('處理效能', {
+            'fields': ('processing_time', 'stage_timings', 'peak_memory_mb', 'audio_seconds_per_second')
         }),
         ('時間資訊', {
             'fields': ('created_at', 'updated_at')
@@ -198,4 +203,14 @@ class TranscriptSegmentAdmin(admin.ModelAdmin):
 
     assign_speaker.short_description = "為選擇的片段指定講者"
     actions.append(assign_speaker)
-    
\ No newline at end of file
+    
+
+@admin.register(TranscriptionChunk)
+class TranscriptionChunkAdmin(admin.ModelAdmin):
+    """轉錄分段檢查點管理介面，用於查看長音訊轉錄的進度與失敗分段"""
+    
+    list_display = ('audio_file', 'index', 'start_time', 'end_time', 'status', 'attempts', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('audio_file__title',)
+    readonly_fields = ('audio_file', 'index', 'start_time', 'end_time', 'plan_key', 'result', 'attempts',
+                       'error', 'created_at', 'updated_at')
@@ -39,6 +39,8 @@ class AudioUploadForm(forms.ModelForm):
         if instance.file:
             instance.format = instance.get_file_extension()
             instance.file_size = instance.file.size
+            # 上傳處理器在接收資料時已計算內容雜湊值
+            instance.content_hash = getattr(self.cleaned_data.get('file'), 'content_hash', '') or ''
         if commit:
             instance.save()
         return instance
@@ -0,0 +1,304 @@
+# apps/audio_manager/live.py
+"""
+課堂即時字幕的 ASGI WebSocket 端點。
+
+瀏覽器以二進位訊框傳送 16-bit 單聲道 PCM，伺服器在共用執行緒池中以池化的 KaldiRecognizer
+辨識，並即時回傳 partial/final 字幕；final 片段分批寫入 Transcript/TranscriptSegment。
+辨識與資料庫存取都不在事件迴圈中執行，單一工作程序可同時服務多間教室。
+
+協定:
+    連線網址: /ws/live-caption/?title=<標題>&sample_rate=<採樣率>
+    客戶端 -> 伺服器: 二進位訊框為 PCM 資料；文字訊框 {"type": "stop"} 結束辨識
+    伺服器 -> 客戶端: {"type": "ready", "transcript_id", "audio_file_id"}、
+        {"type": "partial", "text"}、{"type": "final", "text", "start", "end"}、
+        {"type": "error", "message"}、{"type": "closed", "duration"}
+"""
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from core.audio.live_captioning import RecognizerPool, RecognizerPoolExhausted
+from core.audio.streaming import VoskStreamSession
+from utils.type_definitions import AudioSegment, StreamEvent
+
+logger = logging.getLogger(__name__)
+
+# WebSocket 關閉代碼
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_BAD_REQUEST = 4400
+CLOSE_TRY_AGAIN_LATER = 1013
+CLOSE_INTERNAL_ERROR = 1011
+
+# 允許的輸入採樣率範圍
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+# 辨識使用的共用執行緒池與識別器池（每個工作程序各一份）
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'LIVE_CAPTION_THREADS', 8),
+    thread_name_prefix='live-caption'
+)
+recognizer_pool = RecognizerPool(max_sessions=getattr(settings, 'LIVE_CAPTION_MAX_SESSIONS', 48))
+
+
+def database_sync_to_async(func):
+    """以 sync_to_async 包裝資料庫操作，前後清理逾時或失效的連線"""
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper)
+
+
+@database_sync_to_async
+def get_session_user_id(cookie_header: str) -> Optional[int]:
+    """從 Cookie 中的 Django session 取得已登入的使用者 ID"""
+    from django.contrib.auth import SESSION_KEY, get_user_model
+    from importlib import import_module
+
+    cookie = SimpleCookie()
+    cookie.load(cookie_header or '')
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+
+    session = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value)
+    user_id = session.get(SESSION_KEY)
+    if user_id is None:
+        return None
+
+    user = get_user_model().objects.filter(pk=user_id, is_active=True).first()
+    return user.pk if user else None
+
+
+@database_sync_to_async
+def create_live_transcript(user_id: int, title: str) -> Dict[str, int]:
+    """建立即時字幕對應的音訊檔案與轉錄記錄"""
+    from .models import AudioFile, Transcript
+
+    audio_file = AudioFile.objects.create(
+        title=title,
+        description='課堂即時字幕',
+        file='',
+        format='pcm',
+        processing_status='processing',
+        processing_message='即時字幕進行中',
+        processing_method='vosk-live',
+        user_id=user_id
+    )
+    transcript = Transcript.objects.create(
+        audio_file=audio_file,
+        full_text='',
+        processing_method='vosk',
+        is_processed=False
+    )
+    return {'audio_file_id': audio_file.id, 'transcript_id': transcript.id}
+
+
+@database_sync_to_async
+def save_live_segments(transcript_id: int, segments: List[AudioSegment]) -> int:
+    """批次寫入即時字幕的 final 片段"""
+    from .models import TranscriptSegment
+
+    TranscriptSegment.objects.bulk_create([
+        TranscriptSegment(
+            transcript_id=transcript_id,
+            start_time=segment["start"],
+            end_time=segment["end"],
+            text=segment["text"],
+            speaker_id=segment.get("speaker_id"),
+            confidence=segment.get("confidence", 1.0),
+            word_count=TranscriptSegment.count_words(segment["text"])
+        )
+        for segment in segments
+    ], batch_size=getattr(settings, 'TRANSCRIPT_SEGMENT_BATCH_SIZE', 1000))
+    return len(segments)
+
+
+@database_sync_to_async
+def finalize_live_transcript(audio_file_id: int, transcript_id: int, duration: float) -> None:
+    """結束即時字幕：由已保存的片段組成完整文本並更新處理狀態"""
+    from .models import AudioFile, Transcript
+
+    transcript = Transcript.objects.get(id=transcript_id)
+    texts = transcript.segments.order_by('start_time').values_list('text', flat=True)
+    transcript.full_text = ' '.join(texts)
+    transcript.word_count = 0
+    transcript.calculate_word_count()
+    transcript.is_processed = True
+    transcript.save()
+
+    audio_file = AudioFile.objects.get(id=audio_file_id)
+    AudioFile.objects.filter(id=audio_file_id).update(duration=duration)
+    audio_file.set_processing_status('completed', '即時字幕已結束')
+
+
+class LiveSegmentWriter:
+    """累積 final 片段，達到筆數或時間門檻時批次寫入資料庫"""
+
+    def __init__(self, transcript_id: int, batch_size: int, flush_interval: float):
+        self.transcript_id = transcript_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.saved_count = 0
+        self._buffer: List[AudioSegment] = []
+        self._last_flush = time.monotonic()
+
+    async def add(self, segment: AudioSegment) -> None:
+        self._buffer.append(segment)
+        if len(self._buffer) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        segments, self._buffer = self._buffer, []
+        self.saved_count += await save_live_segments(self.transcript_id, segments)
+
+
+def _event_message(event: StreamEvent) -> Dict[str, Any]:
+    """將辨識事件轉換為傳送給客戶端的訊息"""
+    message: Dict[str, Any] = {"type": event["type"], "text": event["text"]}
+    if event.get("segment"):
+        message["start"] = round(event["segment"]["start"], 3)
+        message["end"] = round(event["segment"]["end"], 3)
+    return message
+
+
+async def _acquire_recognizer(sample_rate: int):
+    """初始化即時字幕模型並從識別器池借出識別器（於執行緒池中執行）"""
+    from core.audio.transcriber import VoskTranscriber
+
+    def acquire():
+        transcriber = VoskTranscriber(model_name=getattr(settings, 'LIVE_CAPTION_MODEL', 'vosk-model-zh-cn-0.22'))
+        init_result = transcriber.initialize()
+        if not init_result["success"]:
+            raise RuntimeError(init_result.get("error", "Vosk轉錄器初始化失敗"))
+        return transcriber.model_path, recognizer_pool.acquire(transcriber.model_path, sample_rate)
+
+    return await asyncio.get_running_loop().run_in_executor(_executor, acquire)
+
+
+async def live_caption_application(scope, receive, send) -> None:
+    """即時字幕 WebSocket 的 ASGI 應用程式"""
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+
+    headers = {key.decode('latin-1'): value.decode('latin-1') for key, value in scope.get("headers", [])}
+    user_id = await get_session_user_id(headers.get('cookie', ''))
+    if user_id is None:
+        await send({"type": "websocket.close", "code": CLOSE_UNAUTHORIZED})
+        return
+
+    params = parse_qs(scope.get("query_string", b"").decode('utf-8'))
+    try:
+        sample_rate = int(params.get('sample_rate', ['16000'])[0])
+    except ValueError:
+        sample_rate = 0
+    if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+        await send({"type": "websocket.close", "code": CLOSE_BAD_REQUEST})
+        return
+    title = params.get('title', [''])[0][:255] or f"即時字幕 {time.strftime('%Y-%m-%d %H:%M')}"
+
+    try:
+        model_path, recognizer = await _acquire_recognizer(sample_rate)
+    except RecognizerPoolExhausted:
+        logger.warning("即時字幕連線數已達上限，拒絕新連線")
+        await send({"type": "websocket.close", "code": CLOSE_TRY_AGAIN_LATER})
+        return
+    except Exception as e:
+        logger.exception(f"即時字幕初始化失敗: {e}")
+        await send({"type": "websocket.close", "code": CLOSE_INTERNAL_ERROR})
+        return
+
+    session = VoskStreamSession(None, sample_rate, recognizer=recognizer)
+    connected = True
+    ids = None
+    writer = None
+    # 執行緒池中最近一次使用識別器的工作
+    pending: Optional[Future] = None
+
+    async def recognize(func, *args):
+        """在執行緒池中以識別器辨識，保留工作的 Future 供結束時確認識別器已不再使用"""
+        nonlocal pending
+        pending = _executor.submit(func, *args)
+        return await asyncio.wrap_future(pending)
+
+    async def send_json(payload: Dict[str, Any]) -> None:
+        if connected:
+            await send({"type": "websocket.send", "text": json.dumps(payload, ensure_ascii=False)})
+
+    async def handle_events(events: List[StreamEvent]) -> None:
+        for event in events:
+            await send_json(_event_message(event))
+            if event["type"] == "final" and event.get("segment"):
+                await writer.add(event["segment"])
+
+    try:
+        await send({"type": "websocket.accept"})
+        ids = await create_live_transcript(user_id, title)
+        writer = LiveSegmentWriter(
+            ids['transcript_id'],
+            batch_size=getattr(settings, 'LIVE_CAPTION_PERSIST_BATCH_SIZE', 20),
+            flush_interval=getattr(settings, 'LIVE_CAPTION_PERSIST_INTERVAL', 5.0)
+        )
+        await send_json({"type": "ready", **ids})
+        logger.info(f"即時字幕開始: 使用者 {user_id}, 轉錄記錄 {ids['transcript_id']}, 採樣率 {sample_rate}")
+
+        while True:
+            message = await receive()
+            if message["type"] == "websocket.disconnect":
+                connected = False
+                break
+
+            if message.get("bytes"):
+                # 辨識於執行緒池中進行，不阻塞事件迴圈
+                events = await recognize(session.accept_pcm, message["bytes"])
+                await handle_events(events)
+            elif message.get("text"):
+                try:
+                    command = json.loads(message["text"])
+                except ValueError:
+                    await send_json({"type": "error", "message": "無法解析的訊息"})
+                    continue
+                if command.get("type") == "stop":
+                    break
+
+        await handle_events(await recognize(session.finish))
+
+    except Exception as e:
+        logger.exception(f"即時字幕處理失敗: {e}")
+        await send_json({"type": "error", "message": "即時字幕處理失敗"})
+
+    finally:
+        def release_recognizer(_=None) -> None:
+            recognizer_pool.release(model_path, sample_rate, recognizer)
+
+        if pending is not None and not pending.done():
+            # 任務被取消時辨識工作可能仍在執行緒池中使用識別器，待其完成後才歸還
+            pending.add_done_callback(release_recognizer)
+        else:
+            release_recognizer()
+        if ids is not None:
+            try:
+                await writer.flush()
+                await finalize_live_transcript(ids['audio_file_id'], ids['transcript_id'], session.duration)
+                logger.info(f"即時字幕結束: 轉錄記錄 {ids['transcript_id']}, 共 {writer.saved_count} 個片段")
+            except Exception as e:
+                logger.exception(f"保存即時字幕結果失敗: {e}")
+        if connected:
+            await send_json({"type": "closed", "duration": round(session.duration, 3)})
+            await send({"type": "websocket.close", "code": 1000})
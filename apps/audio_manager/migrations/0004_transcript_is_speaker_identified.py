@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_manager', '0003_transcriptsegment_is_manually_edited_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcript',
+            name='is_speaker_identified',
+            field=models.BooleanField(default=False, help_text='是否已完成講者辨識', verbose_name='講者辨識完成'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_manager', '0004_transcript_is_speaker_identified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiofile',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='檔案內容的 SHA-256 雜湊值，用於比對重複上傳', max_length=64, verbose_name='內容雜湊值'),
+        ),
+        migrations.AddField(
+            model_name='transcript',
+            name='cache_key',
+            field=models.CharField(blank=True, db_index=True, help_text='由音訊內容雜湊值、轉錄引擎、模型與語言組成，用於重用相同音訊的轉錄結果', max_length=64, verbose_name='快取鍵'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_manager', '0005_audiofile_content_hash_transcript_cache_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiofile',
+            name='stage_timings',
+            field=models.JSONField(blank=True, default=dict, help_text='音訊檔案前置處理各階段的耗時(秒)，例如元數據探測', verbose_name='處理階段耗時'),
+        ),
+        migrations.AddField(
+            model_name='transcript',
+            name='audio_seconds_per_second',
+            field=models.FloatField(blank=True, help_text='每秒實際經過時間處理的音訊秒數', null=True, verbose_name='處理速度'),
+        ),
+        migrations.AddField(
+            model_name='transcript',
+            name='peak_memory_mb',
+            field=models.FloatField(blank=True, help_text='處理期間工作程序的峰值 RSS', null=True, verbose_name='峰值記憶體(MB)'),
+        ),
+        migrations.AddField(
+            model_name='transcript',
+            name='stage_timings',
+            field=models.JSONField(blank=True, default=dict, help_text='轉錄與講者辨識各階段的耗時(秒)，例如解碼、辨識、資料庫寫入', verbose_name='處理階段耗時'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_manager', '0006_audiofile_stage_timings_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptionChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField(verbose_name='分段序號')),
+                ('start_time', models.FloatField(help_text='此分段負責的時間範圍起點(秒)', verbose_name='開始時間(秒)')),
+                ('end_time', models.FloatField(blank=True, help_text='此分段負責的時間範圍終點(秒)，最後一個分段為空值表示至檔案結尾', null=True, verbose_name='結束時間(秒)')),
+                ('plan_key', models.CharField(help_text='轉錄引擎、模型、語言與分段長度的組合，改變時既有的檢查點失效', max_length=200, verbose_name='分段計劃')),
+                ('status', models.CharField(choices=[('pending', '等待處理'), ('completed', '已完成'), ('failed', '處理失敗')], default='pending', max_length=20, verbose_name='狀態')),
+                ('result', models.JSONField(blank=True, default=dict, help_text='分段的文本、片段（原始時間軸）、略過的靜音秒數與各階段耗時', verbose_name='辨識結果')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='嘗試次數')),
+                ('error', models.TextField(blank=True, verbose_name='錯誤訊息')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+                ('audio_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transcription_chunks', to='audio_manager.audiofile', verbose_name='音訊檔案')),
+            ],
+            options={
+                'verbose_name': '轉錄分段檢查點',
+                'verbose_name_plural': '轉錄分段檢查點',
+                'ordering': ['audio_file', 'index'],
+                'constraints': [models.UniqueConstraint(fields=('audio_file', 'index'), name='unique_transcription_chunk')],
+            },
+        ),
+    ]
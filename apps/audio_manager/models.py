@@ -3,8 +3,13 @@ from django.db import models
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 import os
+import re
 from datetime import timedelta
 
+# 計算字數時移除的標點符號與空白
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
 class AudioFile(models.Model):
     """音訊檔案模型，用於儲存和管理使用者上傳的課堂錄音"""
     
@@ -58,6 +63,13 @@ class AudioFile(models.Model):
         blank=True, 
         verbose_name=_('聲道數')
     )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        verbose_name=_('內容雜湊值'),
+        help_text=_('檔案內容的 SHA-256 雜湊值，用於比對重複上傳')
+    )
     
     # 處理狀態
     processing_status = models.CharField(
@@ -76,6 +88,12 @@ class AudioFile(models.Model):
         verbose_name=_('處理方法'),
         help_text=_('使用的轉錄引擎或模型')
     )
+    stage_timings = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_('處理階段耗時'),
+        help_text=_('音訊檔案前置處理各階段的耗時(秒)，例如元數據探測')
+    )
     
     # 關聯
     user = models.ForeignKey(
@@ -211,6 +229,11 @@ class Transcript(models.Model):
         verbose_name=_('處理完成'),
         help_text=_('是否已完成處理（包括講者辨識等）')
     )
+    is_speaker_identified = models.BooleanField(
+        default=False,
+        verbose_name=_('講者辨識完成'),
+        help_text=_('是否已完成講者辨識')
+    )
     word_count = models.PositiveIntegerField(
         default=0,
         verbose_name=_('字數'),
@@ -222,6 +245,31 @@ class Transcript(models.Model):
         verbose_name=_('處理時間(秒)'),
         help_text=_('轉錄處理所花費的時間(秒)')
     )
+    stage_timings = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_('處理階段耗時'),
+        help_text=_('轉錄與講者辨識各階段的耗時(秒)，例如解碼、辨識、資料庫寫入')
+    )
+    peak_memory_mb = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name=_('峰值記憶體(MB)'),
+        help_text=_('處理期間工作程序的峰值 RSS')
+    )
+    audio_seconds_per_second = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name=_('處理速度'),
+        help_text=_('每秒實際經過時間處理的音訊秒數')
+    )
+    cache_key = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        verbose_name=_('快取鍵'),
+        help_text=_('由音訊內容雜湊值、轉錄引擎、模型與語言組成，用於重用相同音訊的轉錄結果')
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name=_('建立時間')
@@ -251,6 +299,51 @@ class Transcript(models.Model):
         self.word_count = len(text)
         return self.word_count
     
+    @staticmethod
+    def build_cache_key(content_hash, processing_method, model_name, language):
+        """
+        建立轉錄快取鍵
+        
+        Args:
+            content_hash (str): 音訊檔案內容雜湊值
+            processing_method (str): 轉錄引擎類型
+            model_name (str): 轉錄模型名稱
+            language (str): 辨識語言
+        
+        Returns:
+            str: 64 字元的十六進位快取鍵
+        """
+        import hashlib
+        raw_key = "|".join([content_hash, processing_method, model_name or '', (language or '').lower()])
+        return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def find_cached(cls, cache_key, user_id, exclude_audio_file_id=None):
+        """
+        尋找同一使用者具有相同快取鍵且已完成處理的轉錄記錄
+        
+        只在同一使用者的檔案間共用，並略過含有人工編輯片段的記錄，
+        避免把其他使用者或人工修改後的內容當作辨識結果複製。
+        
+        Args:
+            cache_key (str): 快取鍵
+            user_id (int): 音訊檔案擁有者的使用者 ID
+            exclude_audio_file_id (int): 排除的音訊檔案 ID（通常是目前正在處理的檔案）
+        
+        Returns:
+            Transcript: 最新的符合記錄，找不到時返回 None
+        """
+        if not cache_key:
+            return None
+        queryset = cls.objects.filter(
+            cache_key=cache_key,
+            is_processed=True,
+            audio_file__user_id=user_id
+        ).exclude(segments__is_manually_edited=True)
+        if exclude_audio_file_id is not None:
+            queryset = queryset.exclude(audio_file_id=exclude_audio_file_id)
+        return queryset.order_by('-created_at').first()
+    
     def get_segments(self):
         """獲取所有文本片段，依時間排序"""
         return self.segments.all().order_by('start_time')
@@ -409,13 +502,18 @@ class TranscriptSegment(models.Model):
             'is_manually_edited': self.is_manually_edited
         }
     
+    @staticmethod
+    def count_words(text):
+        """計算文本字數（針對中文特別處理，移除標點符號和空白再計算字數）"""
+        if not text:
+            return 0
+        text = PUNCTUATION_PATTERN.sub('', text)
+        text = WHITESPACE_PATTERN.sub('', text)
+        return len(text)
+    
     def update_word_count(self):
         """更新片段字數"""
-        # 針對中文特別處理，移除標點符號和空白再計算字數
-        import re
-        text = re.sub(r'[^\w\s]', '', self.text)
-        text = re.sub(r'\s+', '', text)
-        self.word_count = len(text)
+        self.word_count = self.count_words(self.text)
         return self.word_count
     
     def merge_with(self, other_segment):
@@ -546,6 +644,79 @@ class TranscriptSegment(models.Model):
         
         return created_segments
 
+    @classmethod
+    def replace_transcript_segments(cls, transcript, segments, batch_size=None):
+        """
+        以批次寫入取代轉錄文本的所有片段
+        
+        先以單一 DELETE 移除既有片段，再於記憶體中計算字數並以 bulk_create 分批寫入，
+        避免逐筆 INSERT 與 save() 的額外開銷。應在交易內呼叫。
+        
+        Args:
+            transcript (Transcript): 轉錄對象
+            segments (list): 轉錄結果片段列表，每個元素應包含:
+                - start: 開始時間
+                - end: 結束時間
+                - text: 文本內容
+                - speaker_id: (可選) 講者ID，未提供時輪流指定 speaker_0/speaker_1
+                - confidence: (可選) 信心分數
+            batch_size (int): 每批寫入的筆數，預設使用 TRANSCRIPT_SEGMENT_BATCH_SIZE 設定
+        
+        Returns:
+            int: 寫入的片段數量
+        """
+        if batch_size is None:
+            batch_size = getattr(settings, 'TRANSCRIPT_SEGMENT_BATCH_SIZE', 1000)
+        
+        cls.objects.filter(transcript=transcript).delete()
+        
+        transcript_segments = [
+            cls(
+                transcript=transcript,
+                start_time=segment["start"],
+                end_time=segment["end"],
+                text=segment["text"],
+                speaker_id=segment.get("speaker_id") or f"speaker_{i % 2}",  # 簡單輪換講者
+                speaker_name=None,
+                confidence=segment.get("confidence", 1.0),
+                word_count=cls.count_words(segment["text"])
+            )
+            for i, segment in enumerate(segments)
+        ]
+        
+        cls.objects.bulk_create(transcript_segments, batch_size=batch_size)
+        return len(transcript_segments)
+
+    @classmethod
+    def clone_transcript_segments(cls, source, target, batch_size=None):
+        """
+        將來源轉錄文本的所有片段複製到目標轉錄文本
+        
+        只複製辨識結果與講者 ID，不複製講者名稱與人工編輯標記。
+        以單一 DELETE 移除目標的既有片段，再以 bulk_create 分批寫入。應在交易內呼叫。
+        
+        Args:
+            source (Transcript): 來源轉錄對象
+            target (Transcript): 目標轉錄對象
+            batch_size (int): 每批寫入的筆數，預設使用 TRANSCRIPT_SEGMENT_BATCH_SIZE 設定
+        
+        Returns:
+            int: 寫入的片段數量
+        """
+        if batch_size is None:
+            batch_size = getattr(settings, 'TRANSCRIPT_SEGMENT_BATCH_SIZE', 1000)
+        
+        cls.objects.filter(transcript=target).delete()
+        
+        fields = ['start_time', 'end_time', 'text', 'speaker_id', 'confidence', 'word_count']
+        cloned_segments = [
+            cls(transcript=target, **values)
+            for values in cls.objects.filter(transcript=source).order_by('start_time').values(*fields).iterator()
+        ]
+        
+        cls.objects.bulk_create(cloned_segments, batch_size=batch_size)
+        return len(cloned_segments)
+
     @classmethod
     def export_to_srt(cls, transcript_id):
         """
@@ -615,4 +786,116 @@ class TranscriptSegment(models.Model):
         for speaker_id in speaker_texts:
             speaker_texts[speaker_id]['text'] = ' '.join(speaker_texts[speaker_id]['text'])
         
-        return speaker_texts
\ No newline at end of file
+        return speaker_texts
+
+class TranscriptionChunk(models.Model):
+    """
+    長音訊分段轉錄的進度檢查點
+    
+    轉錄任務將音訊依時間切分為多個分段，各分段的辨識結果完成後立即寫入此表；
+    重試或工作程序中斷後只需重新辨識尚未完成的分段。所有分段合併為轉錄記錄後即刪除。
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', '等待處理'),
+        ('completed', '已完成'),
+        ('failed', '處理失敗'),
+    ]
+    
+    audio_file = models.ForeignKey(
+        AudioFile,
+        on_delete=models.CASCADE,
+        related_name='transcription_chunks',
+        verbose_name=_('音訊檔案')
+    )
+    index = models.PositiveIntegerField(
+        verbose_name=_('分段序號')
+    )
+    start_time = models.FloatField(
+        verbose_name=_('開始時間(秒)'),
+        help_text=_('此分段負責的時間範圍起點(秒)')
+    )
+    end_time = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name=_('結束時間(秒)'),
+        help_text=_('此分段負責的時間範圍終點(秒)，最後一個分段為空值表示至檔案結尾')
+    )
+    plan_key = models.CharField(
+        max_length=200,
+        verbose_name=_('分段計劃'),
+        help_text=_('轉錄引擎、模型、語言與分段長度的組合，改變時既有的檢查點失效')
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name=_('狀態')
+    )
+    result = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_('辨識結果'),
+        help_text=_('分段的文本、片段（原始時間軸）、略過的靜音秒數與各階段耗時')
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('嘗試次數')
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name=_('錯誤訊息')
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('建立時間'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('更新時間'))
+    
+    class Meta:
+        verbose_name = _('轉錄分段檢查點')
+        verbose_name_plural = _('轉錄分段檢查點')
+        ordering = ['audio_file', 'index']
+        constraints = [
+            models.UniqueConstraint(fields=['audio_file', 'index'], name='unique_transcription_chunk'),
+        ]
+    
+    def __str__(self):
+        return f"{self.audio_file_id} #{self.index} ({self.get_status_display()})"
+    
+    @property
+    def is_last(self):
+        """是否為最後一個分段（轉錄至檔案結尾）"""
+        return self.end_time is None
+    
+    @classmethod
+    def plan(cls, audio_file, plan_key, chunk_seconds):
+        """
+        建立或取得音訊檔案的分段計劃
+        
+        計劃與既有檢查點相同時沿用（保留已完成的分段），不同時刪除舊檢查點後重新建立。
+        
+        Args:
+            audio_file (AudioFile): 音訊檔案
+            plan_key (str): 分段計劃識別字串
+            chunk_seconds (float): 每個分段的長度（秒）
+        
+        Returns:
+            list: 依序號排序的 TranscriptionChunk 列表
+        """
+        existing = list(cls.objects.filter(audio_file=audio_file).order_by('index'))
+        if existing and all(chunk.plan_key == plan_key for chunk in existing):
+            return existing
+        
+        cls.objects.filter(audio_file=audio_file).delete()
+        
+        duration = audio_file.duration or 0
+        chunk_count = max(1, int(-(-duration // chunk_seconds)))
+        chunks = [
+            cls(
+                audio_file=audio_file,
+                index=index,
+                start_time=index * chunk_seconds,
+                end_time=(index + 1) * chunk_seconds if index < chunk_count - 1 else None,
+                plan_key=plan_key
+            )
+            for index in range(chunk_count)
+        ]
+        return cls.objects.bulk_create(chunks)
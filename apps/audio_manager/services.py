@@ -0,0 +1,83 @@
+# apps/audio_manager/services.py
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import AudioFile, Transcript
+from utils.metrics import render_gauge, render_summary
+
+
+class PipelineMetricsService:
+    """彙整音訊處理效能指標，輸出為 Prometheus 文字格式"""
+
+    @staticmethod
+    def collect(window=None):
+        """
+        收集最近處理完成的音訊檔案與轉錄記錄的效能數據
+
+        參數:
+            window: 取樣的最近記錄數，若為None則使用 PIPELINE_METRICS_WINDOW 設定
+
+        返回:
+            包含各階段耗時、峰值記憶體與處理速度數值列表的字典
+        """
+        window = window or getattr(settings, 'PIPELINE_METRICS_WINDOW', 500)
+        stage_seconds = defaultdict(list)
+        peak_memory = []
+        speed = []
+
+        transcripts = Transcript.objects.filter(
+            processing_time__isnull=False
+        ).order_by('-updated_at').values_list(
+            'stage_timings', 'peak_memory_mb', 'audio_seconds_per_second'
+        )[:window]
+        for stage_timings, peak_memory_mb, audio_seconds_per_second in transcripts:
+            for stage, seconds in (stage_timings or {}).items():
+                stage_seconds[stage].append(seconds)
+            if peak_memory_mb is not None:
+                peak_memory.append(peak_memory_mb)
+            if audio_seconds_per_second is not None:
+                speed.append(audio_seconds_per_second)
+
+        audio_files = AudioFile.objects.filter(
+            stage_timings__has_key='metadata_probe'
+        ).order_by('-updated_at').values_list('stage_timings', flat=True)[:window]
+        for stage_timings in audio_files:
+            for stage, seconds in stage_timings.items():
+                stage_seconds[stage].append(seconds)
+
+        return {
+            'window': window,
+            'transcript_count': len(transcripts),
+            'stage_seconds': dict(stage_seconds),
+            'peak_memory_mb': peak_memory,
+            'audio_seconds_per_second': speed,
+        }
+
+    @classmethod
+    def render_prometheus(cls, window=None):
+        """以 Prometheus 文字格式輸出最近記錄的效能指標"""
+        metrics = cls.collect(window)
+        lines = []
+        lines += render_gauge(
+            'audio_pipeline_sampled_transcripts',
+            '計算指標所取樣的轉錄記錄數',
+            metrics['transcript_count']
+        )
+        lines += render_summary(
+            'audio_pipeline_stage_seconds',
+            '音訊處理各階段耗時（秒），取樣最近處理的記錄',
+            metrics['stage_seconds'],
+            label='stage'
+        )
+        lines += render_summary(
+            'audio_pipeline_peak_rss_megabytes',
+            '轉錄與講者辨識任務的峰值 RSS（MB）',
+            {'': metrics['peak_memory_mb']}
+        )
+        lines += render_summary(
+            'audio_pipeline_audio_seconds_per_second',
+            '每秒實際經過時間處理的音訊秒數',
+            {'': metrics['audio_seconds_per_second']}
+        )
+        return '\n'.join(lines) + '\n'
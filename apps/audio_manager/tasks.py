@@ -1,19 +1,24 @@
 # apps/audio_manager/tasks.py
-from celery import shared_task
+from celery import chord, shared_task
+from celery.exceptions import Retry, SoftTimeLimitExceeded
 from django.utils import timezone
 from django.conf import settings
 from django.db import transaction
-from .models import AudioFile, Transcript, TranscriptSegment
+from django.db.models import F
+from .models import AudioFile, Transcript, TranscriptionChunk, TranscriptSegment
 import logging
 import os
-import tempfile
 import time
 from pathlib import Path
 from datetime import timedelta
 
+from core.audio.chunking import stitch_chunk_segments
+from core.audio.metadata import probe_audio_metadata
 from core.audio.transcriber import TranscriberFactory
 from core.audio.speaker_recognition import BaseSpeakerRecognizer
 from core.payment.quota import QuotaManager, ServiceType
+from utils.file_handlers import compute_content_hash
+from utils.metrics import StageTimer, peak_rss_mb, reset_peak_rss
 from utils.type_definitions import TranscriptionResult
 
 # 設置日誌記錄器
@@ -55,7 +60,11 @@ def process_audio_file(audio_file_id):
             return {'success': False, 'message': '權限錯誤: 無法讀取音訊檔案'}
         
         # 處理音訊元數據（多種方法嘗試）
-        metadata_result = process_audio_metadata(audio_file)
+        timer = StageTimer()
+        with timer.stage('metadata_probe'):
+            metadata_result = process_audio_metadata(audio_file)
+        audio_file.stage_timings = timer.as_dict()
+        AudioFile.objects.filter(id=audio_file_id).update(stage_timings=audio_file.stage_timings)
         
         # 如果音訊元數據處理失敗，仍然要確保設定基本值
         if not metadata_result and not audio_file.duration:
@@ -100,6 +109,10 @@ def transcribe_audio_file(self, audio_file_id):
     """
     轉錄音訊檔案並存儲結果
     
+    音訊依 TRANSCRIPTION_CHUNK_SECONDS 切分為分段，以 chord 平行轉錄各分段（transcribe_chunk），
+    全部完成後由 finalize_transcription 合併寫入資料庫。各分段的結果以 TranscriptionChunk 保存為檢查點，
+    重試或工作程序中斷後只重新轉錄未完成的分段。只有一個分段的音訊直接在此任務中完成。
+    
     參數:
         audio_file_id: 音訊檔案的 ID
     
@@ -108,6 +121,9 @@ def transcribe_audio_file(self, audio_file_id):
     """
     logger.info(f"開始轉錄音訊檔案，ID: {audio_file_id}")
     
+    # 量測本次任務的峰值記憶體（單一分段時在此任務中轉錄）
+    reset_peak_rss()
+    
     try:
         # 獲取音訊檔案記錄
         audio_file = AudioFile.objects.get(id=audio_file_id)
@@ -116,13 +132,14 @@ def transcribe_audio_file(self, audio_file_id):
         # 更新處理狀態
         audio_file.set_processing_status('processing', '開始音訊轉錄')
         
-        # 檢查配額
+        # 檢查並保留配額（重試時沿用同一檔案的保留），完成時提交、最終失敗時釋放
         user_id = audio_file.user_id
         audio_duration = audio_file.duration or 0
         
-        quota_check = QuotaManager.check_quota(
+        quota_check = QuotaManager.reserve_quota(
             user_id=user_id, 
             service_type=ServiceType.AUDIO_TRANSCRIPTION,
+            resource_id=audio_file_id,
             duration=audio_duration,
             file_size=audio_file.file_size
         )
@@ -140,97 +157,81 @@ def transcribe_audio_file(self, audio_file_id):
         # 建立轉錄器實例
         transcriber = TranscriberFactory.create_transcriber(transcriber_type)
         
-        # 初始化轉錄器
-        init_result = transcriber.initialize()
-        if not init_result["success"]:
-            raise Exception(f"轉錄器初始化失敗: {init_result.get('error', '未知錯誤')}")
-        
         # 取得檔案路徑
         file_path = audio_file.file.path
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"檔案不存在: {file_path}")
         
-        # 執行轉錄
         language = 'zh-TW'  # 預設使用繁體中文，可從用戶配置獲取
-        logger.info(f"開始轉錄，檔案: {file_path}, 語言: {language}")
         
-        transcription_start_time = time.time()
-        result = transcriber.transcribe_file(Path(file_path), language=language)
-        transcription_time = time.time() - transcription_start_time
-        
-        logger.info(f"轉錄完成，耗時: {transcription_time:.2f}秒")
-        
-        if not result["success"]:
-            raise Exception(f"轉錄失敗: {result.get('error', '未知錯誤')}")
-        
-        # 保存轉錄結果到資料庫
-        with transaction.atomic():
-            transcription_result = result["data"]
-            
-            # 檢查是否已存在轉錄記錄
-            existing_transcript = Transcript.objects.filter(audio_file_id=audio_file_id).first()
-            if existing_transcript:
-                logger.info(f"找到現有轉錄記錄，更新內容")
-                transcript = existing_transcript
-                # 刪除現有片段
-                transcript.segments.all().delete()
-            else:
-                logger.info(f"建立新的轉錄記錄")
-                transcript = Transcript(
-                    audio_file_id=audio_file_id,
-                    is_processed=False,
-                    processing_method=transcriber_type
+        # 相同內容、引擎、模型與語言的音訊已轉錄過時，直接複製既有結果
+        cache_key = get_transcription_cache_key(audio_file, transcriber_type, transcriber.get_model_identifier(), language)
+        cached_transcript = Transcript.find_cached(cache_key, user_id, exclude_audio_file_id=audio_file_id)
+        if cached_transcript:
+            logger.info(f"找到相同內容的轉錄結果（轉錄記錄 ID: {cached_transcript.id}），直接複製")
+            with transaction.atomic():
+                transcript = clone_cached_transcript(audio_file, cached_transcript, cache_key, transcriber_type)
+                QuotaManager.commit_quota(
+                    user_id=user_id,
+                    service_type=ServiceType.AUDIO_TRANSCRIPTION,
+                    reservation_id=quota_check[2],
+                    operation="轉錄音訊（快取）",
+                    resource_id=audio_file_id,
+                    model_name=transcriber_type,
+                    duration=audio_duration
                 )
             
-            # 更新轉錄記錄
-            transcript.full_text = transcription_result["text"]
-            transcript.language = transcription_result["language"]
-            transcript.duration = transcription_result["duration"] or audio_file.duration
-            transcript.is_processed = True
-            transcript.processed_at = timezone.now()
-            transcript.save()
-            
-            # 保存片段
-            segments = transcription_result.get("segments", [])
-            for i, segment in enumerate(segments):
-                TranscriptSegment.objects.create(
-                    transcript=transcript,
-                    start_time=segment["start"],
-                    end_time=segment["end"],
-                    text=segment["text"],
-                    speaker_id=segment.get("speaker_id") or f"speaker_{i % 2}",  # 簡單輪換講者
-                    speaker_name=None,
-                    confidence=segment.get("confidence", 1.0)
-                )
+            audio_file.set_processing_status('completed', '轉錄完成（使用相同音訊的既有結果）')
             
-            logger.info(f"已保存 {len(segments)} 個轉錄片段")
+            if not transcript.is_speaker_identified and getattr(settings, 'ENABLE_SPEAKER_RECOGNITION', True):
+                identify_speakers.delay(audio_file_id)
             
-            # 記錄配額使用情況
-            QuotaManager.log_usage(
-                user_id=user_id,
-                service_type=ServiceType.AUDIO_TRANSCRIPTION,
-                operation="轉錄音訊",
-                resource_id=audio_file_id,
-                model_name=transcriber_type,
-                duration=audio_duration
-            )
-        
-        # 更新音訊檔案處理狀態
-        audio_file.set_processing_status('completed', '轉錄完成')
-        audio_file.processed_at = timezone.now()
-        audio_file.save(update_fields=['processing_status', 'processing_message', 'processed_at'])
-        
-        # 啟動講者辨識任務（如果需要）
-        if getattr(settings, 'ENABLE_SPEAKER_RECOGNITION', True):
-            identify_speakers.delay(audio_file_id)
-        
-        logger.info(f"轉錄任務完成，音訊檔案 ID: {audio_file_id}")
-        return {'success': True, 'message': '轉錄成功完成'}
+            return {'success': True, 'message': '轉錄成功完成（使用快取結果）', 'cached': True}
+        
+        # 依時間切分為分段，沿用既有的檢查點（重試時已完成的分段不會重新轉錄）
+        chunk_seconds = getattr(settings, 'TRANSCRIPTION_CHUNK_SECONDS', 600)
+        plan_key = f"{transcriber_type}:{transcriber.get_model_identifier()}:{language}:{chunk_seconds:g}"
+        chunks = TranscriptionChunk.plan(audio_file, plan_key, chunk_seconds)
+        pending = [chunk for chunk in chunks if chunk.status != 'completed']
+        logger.info(f"轉錄分段: 共 {len(chunks)} 個，待處理 {len(pending)} 個")
+        
+        if len(chunks) == 1:
+            # 只有一個分段時不經過 chord 排程，直接在此任務中轉錄並合併
+            if pending:
+                init_result = transcriber.initialize()
+                if not init_result["success"]:
+                    raise Exception(f"轉錄器初始化失敗: {init_result.get('error', '未知錯誤')}")
+                transcribe_chunk_range(audio_file, pending[0], transcriber, language)
+            return finalize_transcript(audio_file_id, transcriber_type, cache_key)
+        
+        # 先更新狀態再送出，避免分段很快完成時覆寫合併後的完成狀態
+        audio_file.set_processing_status('processing', f'分段轉錄中（待處理 {len(pending)}/{len(chunks)} 個分段）')
+        finalize = finalize_transcription.si(audio_file_id, transcriber_type, cache_key)
+        if pending:
+            chord(
+                transcribe_chunk.si(audio_file_id, chunk.index, transcriber_type, language)
+                for chunk in pending
+            )(finalize)
+        else:
+            finalize.delay()
+        
+        return {
+            'success': True,
+            'message': f'已排程 {len(pending)} 個分段轉錄',
+            'chunks': len(chunks),
+            'pending_chunks': len(pending)
+        }
         
     except AudioFile.DoesNotExist:
         logger.error(f"找不到音訊檔案，ID: {audio_file_id}")
         return {'success': False, 'message': f'找不到音訊檔案，ID: {audio_file_id}'}
         
+    except SoftTimeLimitExceeded:
+        # 超過佇列的時間限制，重試也會再次逾時，直接標記失敗
+        logger.error(f"轉錄音訊檔案逾時，ID: {audio_file_id}")
+        fail_transcription(audio_file_id, '轉錄失敗: 處理時間超過限制')
+        return {'success': False, 'message': '轉錄失敗: 處理時間超過限制'}
+        
     except Exception as e:
         logger.exception(f"轉錄音訊檔案時發生錯誤，ID: {audio_file_id}: {str(e)}")
         
@@ -247,11 +248,10 @@ def transcribe_audio_file(self, audio_file_id):
                 # 引發重試
                 raise self.retry(exc=e, countdown=self.default_retry_delay)
             else:
-                audio_file.set_processing_status('failed', f'轉錄失敗: {str(e)}')
-                audio_file.save()
+                fail_transcription(audio_file_id, f'轉錄失敗: {str(e)}')
                 
         except Exception as inner_e:
-            if not isinstance(inner_e, self.retry): 
+            if not isinstance(inner_e, Retry):
                 logger.exception(f"嘗試更新失敗狀態時發生錯誤: {str(inner_e)}")
             else:
                 # 重新引發 retry 異常
@@ -260,6 +260,83 @@ def transcribe_audio_file(self, audio_file_id):
         return {'success': False, 'message': f'轉錄失敗: {str(e)}'}
 
 
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def transcribe_chunk(self, audio_file_id, index, transcriber_type, language):
+    """
+    轉錄單一分段並保存檢查點
+    
+    已完成的分段（重複投遞或重新排程時）直接略過。重試次數用盡時拋出例外，
+    chord 不會執行合併任務，再次執行 transcribe_audio_file 時只會重新排程未完成的分段。
+    
+    參數:
+        audio_file_id: 音訊檔案的 ID
+        index: 分段序號
+        transcriber_type: 轉錄器類型
+        language: 音訊語言代碼
+    """
+    reset_peak_rss()
+    
+    try:
+        chunk = TranscriptionChunk.objects.select_related('audio_file').get(audio_file_id=audio_file_id, index=index)
+    except TranscriptionChunk.DoesNotExist:
+        # 分段計劃已被取代，或所有分段已合併完成
+        logger.warning(f"找不到轉錄分段，音訊檔案 ID: {audio_file_id}, 分段: {index}")
+        return {'success': False, 'index': index, 'message': '找不到轉錄分段'}
+    
+    if chunk.status == 'completed':
+        return {'success': True, 'index': index, 'checkpoint': True}
+    
+    TranscriptionChunk.objects.filter(id=chunk.id).update(attempts=F('attempts') + 1)
+    try:
+        transcriber = TranscriberFactory.create_transcriber(transcriber_type)
+        init_result = transcriber.initialize()
+        if not init_result["success"]:
+            raise Exception(f"轉錄器初始化失敗: {init_result.get('error', '未知錯誤')}")
+        
+        transcribe_chunk_range(chunk.audio_file, chunk, transcriber, language)
+        return {'success': True, 'index': index}
+    
+    except Exception as e:
+        logger.exception(f"轉錄分段失敗，音訊檔案 ID: {audio_file_id}, 分段: {index}: {str(e)}")
+        TranscriptionChunk.objects.filter(id=chunk.id).update(status='failed', error=str(e))
+        
+        # 逾時重試也會再次逾時，不重試
+        retries_left = self.max_retries - self.request.retries
+        if retries_left > 0 and not isinstance(e, SoftTimeLimitExceeded):
+            raise self.retry(exc=e, countdown=self.default_retry_delay)
+        
+        fail_transcription(audio_file_id, f'轉錄失敗（分段 {index + 1}）: {str(e)}')
+        raise
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def finalize_transcription(self, audio_file_id, transcriber_type, cache_key):
+    """
+    所有分段完成後合併為轉錄記錄（chord 的回呼任務）
+    
+    參數:
+        audio_file_id: 音訊檔案的 ID
+        transcriber_type: 轉錄器類型
+        cache_key: 轉錄結果的快取鍵
+    """
+    try:
+        return finalize_transcript(audio_file_id, transcriber_type, cache_key)
+    
+    except AudioFile.DoesNotExist:
+        logger.error(f"找不到音訊檔案，ID: {audio_file_id}")
+        return {'success': False, 'message': f'找不到音訊檔案，ID: {audio_file_id}'}
+    
+    except Exception as e:
+        logger.exception(f"合併轉錄結果時發生錯誤，ID: {audio_file_id}: {str(e)}")
+        
+        retries_left = self.max_retries - self.request.retries
+        if retries_left > 0:
+            raise self.retry(exc=e, countdown=self.default_retry_delay)
+        
+        fail_transcription(audio_file_id, f'轉錄失敗: {str(e)}')
+        return {'success': False, 'message': f'轉錄失敗: {str(e)}'}
+
+
 @shared_task(bind=True, max_retries=2, default_retry_delay=30)
 def identify_speakers(self, audio_file_id):
     """
@@ -273,6 +350,9 @@ def identify_speakers(self, audio_file_id):
     """
     logger.info(f"開始講者辨識，音訊檔案 ID: {audio_file_id}")
     
+    reset_peak_rss()
+    timer = StageTimer()
+    
     try:
         # 獲取音訊檔案記錄和轉錄記錄
         audio_file = AudioFile.objects.get(id=audio_file_id)
@@ -289,11 +369,12 @@ def identify_speakers(self, audio_file_id):
             logger.warning(f"找不到轉錄片段，無法執行講者辨識，ID: {audio_file_id}")
             return {'success': False, 'message': '找不到轉錄片段，無法執行講者辨識'}
         
-        # 檢查配額
+        # 檢查並保留配額
         user_id = audio_file.user_id
-        quota_check = QuotaManager.check_quota(
+        quota_check = QuotaManager.reserve_quota(
             user_id=user_id, 
             service_type=ServiceType.SPEAKER_IDENTIFICATION,
+            resource_id=audio_file_id,
             duration=audio_file.duration
         )
         
@@ -314,6 +395,7 @@ def identify_speakers(self, audio_file_id):
         audio_segments = []
         for segment in segments:
             audio_segments.append({
+                "segment_id": segment["id"],
                 "start": segment["start_time"],
                 "end": segment["end_time"],
                 "text": segment["text"],
@@ -323,33 +405,43 @@ def identify_speakers(self, audio_file_id):
         
         # 執行講者辨識
         file_path = audio_file.file.path
-        result = recognizer.identify_speakers(Path(file_path), audio_segments)
+        with timer.stage('speaker_identification'):
+            result = recognizer.identify_speakers(Path(file_path), audio_segments)
         
         if not result["success"]:
             raise Exception(f"講者辨識失敗: {result.get('error', '未知錯誤')}")
         
-        # 更新轉錄片段的講者信息
+        # 依片段主鍵批次更新講者信息
         identified_segments = result["data"]
-        with transaction.atomic():
-            for segment in identified_segments:
-                TranscriptSegment.objects.filter(
-                    transcript=transcript,
-                    start_time=segment["start"],
-                    end_time=segment["end"]
-                ).update(speaker_id=segment["speaker_id"])
+        updated_segments = [
+            TranscriptSegment(id=segment["segment_id"], speaker_id=segment["speaker_id"])
+            for segment in identified_segments
+            if segment.get("segment_id") is not None
+        ]
+        with transaction.atomic(), timer.stage('speaker_db_write'):
+            TranscriptSegment.objects.bulk_update(
+                updated_segments,
+                ['speaker_id'],
+                batch_size=getattr(settings, 'TRANSCRIPT_SEGMENT_BATCH_SIZE', 1000)
+            )
+            logger.info(f"已批次更新 {len(updated_segments)} 個片段的講者信息")
             
             # 更新轉錄記錄
             transcript.is_speaker_identified = True
             transcript.save(update_fields=['is_speaker_identified'])
         
         # 記錄配額使用情況
-        QuotaManager.log_usage(
-            user_id=user_id,
-            service_type=ServiceType.SPEAKER_IDENTIFICATION,
-            operation="講者辨識",
-            resource_id=audio_file_id,
-            duration=audio_file.duration
-        )
+        with timer.stage('speaker_quota_log'):
+            QuotaManager.commit_quota(
+                user_id=user_id,
+                service_type=ServiceType.SPEAKER_IDENTIFICATION,
+                reservation_id=quota_check[2],
+                operation="講者辨識",
+                resource_id=audio_file_id,
+                duration=audio_file.duration
+            )
+        
+        save_pipeline_metrics(transcript, timer)
         
         logger.info(f"講者辨識任務完成，音訊檔案 ID: {audio_file_id}")
         return {'success': True, 'message': '講者辨識成功完成'}
@@ -358,6 +450,11 @@ def identify_speakers(self, audio_file_id):
         logger.error(f"找不到資料庫記錄，ID: {audio_file_id}, 錯誤: {str(e)}")
         return {'success': False, 'message': f'找不到資料庫記錄: {str(e)}'}
         
+    except SoftTimeLimitExceeded:
+        logger.error(f"講者辨識逾時，音訊檔案 ID: {audio_file_id}")
+        release_speaker_quota(audio_file_id)
+        return {'success': False, 'message': '講者辨識失敗: 處理時間超過限制'}
+        
     except Exception as e:
         logger.exception(f"講者辨識時發生錯誤，ID: {audio_file_id}: {str(e)}")
         
@@ -366,16 +463,38 @@ def identify_speakers(self, audio_file_id):
         if retries_left > 0:
             logger.info(f"講者辨識失敗，將在 {self.default_retry_delay} 秒後重試 (剩餘 {retries_left} 次)")
             raise self.retry(exc=e, countdown=self.default_retry_delay)
-            
+        
+        release_speaker_quota(audio_file_id)
         return {'success': False, 'message': f'講者辨識失敗: {str(e)}'}
 
 
+def fail_transcription(audio_file_id, message):
+    """將音訊檔案標記為轉錄失敗，並釋放保留的轉錄配額"""
+    audio_file = AudioFile.objects.get(id=audio_file_id)
+    audio_file.set_processing_status('failed', message)
+    QuotaManager.release_quota(
+        user_id=audio_file.user_id,
+        service_type=ServiceType.AUDIO_TRANSCRIPTION,
+        resource_id=audio_file_id
+    )
+
+
+def release_speaker_quota(audio_file_id):
+    """講者辨識最終失敗時釋放保留的配額"""
+    user_id = AudioFile.objects.filter(id=audio_file_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        QuotaManager.release_quota(
+            user_id=user_id,
+            service_type=ServiceType.SPEAKER_IDENTIFICATION,
+            resource_id=audio_file_id
+        )
+
+
 def process_audio_metadata(audio_file):
     """
     處理音訊元數據：獲取時長、採樣率、聲道數等
-    使用多種方法嘗試獲取元數據，確保可以獲取時長等重要信息
-    
-    針對 Windows 環境進行了優化，避免文件鎖定問題。
+    僅讀取容器標頭（mutagen，失敗時改用 ffprobe），讀取量與檔案大小無關，
+    無法取得的欄位使用預設值。
     """
     logger.info(f"開始處理音訊元數據: {audio_file.file.name}")
     
@@ -408,75 +527,20 @@ def process_audio_metadata(audio_file):
         # 使用 ORM 更新格式
         AudioFile.objects.filter(id=audio_file.id).update(format=format_lower)
     
-    # 建立一個臨時檔案副本，避免文件鎖定問題
+    # 只讀取容器標頭取得音訊資訊，不複製也不解碼整個檔案
     duration = None
     sample_rate = None
     channels = None
     
-    try:
-        # 嘗試使用 pydub 獲取音訊資訊（它對 Windows 相對友好）
-        # 複製到臨時文件避免鎖定問題
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{format_lower}') as temp_file:
-            temp_path = Path(temp_file.name)
-            
-            # 使用二進制模式複製文件
-            with open(file_path, 'rb') as src_file:
-                temp_file.write(src_file.read())
-        
-        # 使用 pydub 處理臨時文件
-        try:
-            from pydub import AudioSegment
-            logger.info(f"使用 pydub 嘗試讀取臨時檔案: {temp_path}")
-            
-            # 根據不同格式讀取音訊
-            if format_lower == 'mp3':
-                audio = AudioSegment.from_mp3(temp_path)
-            elif format_lower == 'wav':
-                audio = AudioSegment.from_wav(temp_path)
-            elif format_lower == 'ogg':
-                audio = AudioSegment.from_ogg(temp_path)
-            elif format_lower in ['m4a', 'mp4']:
-                audio = AudioSegment.from_file(temp_path, format='mp4')
-            elif format_lower == 'flac':
-                audio = AudioSegment.from_file(temp_path, format='flac')
-            else:
-                # 嘗試自動檢測格式
-                audio = AudioSegment.from_file(temp_path)
-            
-            # 獲取音訊資訊
-            duration = len(audio) / 1000  # 毫秒轉秒
-            sample_rate = audio.frame_rate
-            channels = audio.channels
-            
-            logger.info(f"使用 pydub 獲取資訊: 時長={duration}秒, 採樣率={sample_rate}Hz, 聲道數={channels}")
-        except Exception as e:
-            logger.warning(f"使用 pydub 獲取音訊資訊失敗: {e}")
-            
-            # 如果 pydub 失敗，嘗試使用 mutagen
-            try:
-                import mutagen
-                logger.info(f"使用 mutagen 嘗試讀取臨時檔案")
-                
-                audio_meta = mutagen.File(temp_path)
-                if audio_meta and hasattr(audio_meta, 'info'):
-                    if hasattr(audio_meta.info, 'length'):
-                        duration = audio_meta.info.length
-                    if hasattr(audio_meta.info, 'sample_rate'):
-                        sample_rate = audio_meta.info.sample_rate
-                    if hasattr(audio_meta.info, 'channels'):
-                        channels = audio_meta.info.channels
-                        
-                    logger.info(f"使用 mutagen 獲取資訊: 時長={duration}秒, 採樣率={sample_rate}Hz, 聲道數={channels}")
-            except Exception as e:
-                logger.warning(f"使用 mutagen 獲取音訊資訊失敗: {e}")
-        
-        # 刪除臨時檔案
-        try:
-            temp_path.unlink()
-        except Exception as e:
-            logger.warning(f"刪除臨時檔案失敗: {e}")
-    except Exception as e:
-        logger.error(f"創建臨時檔案副本失敗: {e}")
+    probe_result = probe_audio_metadata(file_path)
+    if probe_result["success"]:
+        metadata = probe_result["data"]
+        duration = metadata["duration"]
+        sample_rate = metadata["sample_rate"]
+        channels = metadata["channels"]
+        logger.info(f"從檔案標頭獲取資訊: 時長={duration}秒, 採樣率={sample_rate}Hz, 聲道數={channels}")
+    else:
+        logger.warning(f"從檔案標頭獲取音訊資訊失敗: {probe_result.get('error', '未知錯誤')}")
     
     # 如果所有方法都失敗，設定預設值
     if duration is None:
@@ -505,6 +569,267 @@ def process_audio_metadata(audio_file):
         return False
 
 
+def transcribe_chunk_range(audio_file, chunk, transcriber, language):
+    """
+    轉錄一個分段並將結果保存為檢查點
+    
+    分段前後各多解碼 TRANSCRIPTION_CHUNK_OVERLAP_SECONDS 提供辨識上下文，檢查點保存完整的解碼結果；
+    重疊範圍內重複辨識的詞由 finalize_transcript 依詞層級時間戳記去除。
+    
+    參數:
+        audio_file: AudioFile 實例
+        chunk: TranscriptionChunk 實例
+        transcriber: 已初始化的轉錄器
+        language: 音訊語言代碼
+    """
+    file_path = Path(audio_file.file.path)
+    whole_file = chunk.index == 0 and chunk.is_last
+    
+    started = time.perf_counter()
+    if whole_file:
+        result = transcriber.transcribe_file(file_path, language=language)
+    else:
+        overlap = getattr(settings, 'TRANSCRIPTION_CHUNK_OVERLAP_SECONDS', 15)
+        decode_start = max(0.0, chunk.start_time - overlap)
+        decode_duration = None if chunk.is_last else chunk.end_time + overlap - decode_start
+        result = transcriber.transcribe_file(file_path, language=language, start=decode_start, duration=decode_duration)
+    processing_time = time.perf_counter() - started
+    
+    if not result["success"]:
+        raise Exception(f"轉錄失敗: {result.get('error', '未知錯誤')}")
+    
+    data = result["data"]
+    duration = data["duration"]
+    if not whole_file:
+        duration = (decode_start + data["duration"] - chunk.start_time) if chunk.is_last else chunk.end_time - chunk.start_time
+    
+    chunk.result = {
+        "text": data["text"],
+        "segments": data.get("segments", []),
+        "language": data["language"],
+        "duration": duration,
+        "skipped_seconds": data.get("skipped_seconds", 0.0),
+        # 轉錄器未回報各階段耗時時整段計入辨識
+        "stage_timings": data.get("stage_timings") or {"recognition": processing_time},
+        "processing_time": processing_time,
+        "peak_memory_mb": round(peak_rss_mb(), 1),
+    }
+    chunk.status = 'completed'
+    chunk.error = ''
+    chunk.save(update_fields=['result', 'status', 'error', 'updated_at'])
+    logger.info(f"分段 {chunk.index} 轉錄完成，耗時: {processing_time:.2f}秒，片段數: {len(chunk.result['segments'])}")
+
+
+def finalize_transcript(audio_file_id, transcriber_type, cache_key):
+    """
+    合併所有已完成分段的結果，寫入轉錄記錄與片段後刪除檢查點
+    
+    參數:
+        audio_file_id: 音訊檔案的 ID
+        transcriber_type: 轉錄器類型
+        cache_key: 轉錄結果的快取鍵
+    
+    返回:
+        包含成功/失敗信息的字典
+    """
+    timer = StageTimer()
+    audio_file = AudioFile.objects.get(id=audio_file_id)
+    chunks = list(TranscriptionChunk.objects.filter(audio_file_id=audio_file_id).order_by('index'))
+    if not chunks:
+        # 重複執行：檢查點已在前一次合併時刪除
+        logger.info(f"轉錄結果已合併，音訊檔案 ID: {audio_file_id}")
+        return {'success': True, 'message': '轉錄結果已合併'}
+    
+    incomplete = [chunk.index for chunk in chunks if chunk.status != 'completed']
+    if incomplete:
+        raise Exception(f"尚有 {len(incomplete)} 個分段未完成轉錄: {incomplete}")
+    
+    results = [chunk.result for chunk in chunks]
+    for chunk_result in results:
+        timer.update(chunk_result["stage_timings"])
+    transcription_time = sum(chunk_result["processing_time"] for chunk_result in results)
+    skipped_seconds = sum(chunk_result["skipped_seconds"] for chunk_result in results)
+    audio_duration = audio_file.duration or 0
+    if skipped_seconds:
+        logger.info(f"辨識前略過 {skipped_seconds:.1f} 秒靜音")
+    
+    with transaction.atomic():
+        with timer.stage('db_write'):
+            # 檢查是否已存在轉錄記錄
+            existing_transcript = Transcript.objects.filter(audio_file_id=audio_file_id).first()
+            if existing_transcript:
+                logger.info(f"找到現有轉錄記錄，更新內容")
+                transcript = existing_transcript
+            else:
+                logger.info(f"建立新的轉錄記錄")
+                transcript = Transcript(
+                    audio_file_id=audio_file_id,
+                    is_processed=False,
+                    processing_method=transcriber_type
+                )
+            
+            # 合併各分段的片段：只有一個分段時直接使用，多個分段時去除重疊範圍內重複辨識的詞
+            if len(chunks) == 1:
+                segments = results[0]["segments"]
+                full_text = results[0]["text"]
+            else:
+                segments = stitch_chunk_segments([
+                    {
+                        "own_start": chunk.start_time,
+                        "own_end": float("inf") if chunk.is_last else chunk.end_time,
+                        "segments": chunk.result["segments"]
+                    }
+                    for chunk in chunks
+                ])
+                full_text = " ".join(segment["text"] for segment in segments)
+            
+            # 更新轉錄記錄
+            transcript.full_text = full_text
+            transcript.language = results[0]["language"]
+            transcript.duration = sum(chunk_result["duration"] for chunk_result in results) or audio_file.duration
+            transcript.is_processed = True
+            transcript.processed_at = timezone.now()
+            transcript.cache_key = cache_key
+            transcript.save()
+            
+            # 批次保存片段（取代現有片段）
+            saved_count = TranscriptSegment.replace_transcript_segments(transcript, segments)
+            logger.info(f"已保存 {saved_count} 個轉錄片段")
+            
+            TranscriptionChunk.objects.filter(audio_file_id=audio_file_id).delete()
+        
+        # 記錄配額使用情況
+        with timer.stage('quota_log'):
+            QuotaManager.commit_quota(
+                user_id=audio_file.user_id,
+                service_type=ServiceType.AUDIO_TRANSCRIPTION,
+                operation="轉錄音訊",
+                resource_id=audio_file_id,
+                model_name=transcriber_type,
+                duration=audio_duration,
+                skipped_duration=skipped_seconds
+            )
+    
+    # 保存處理效能指標（須在啟動講者辨識前完成，講者辨識會合併自己的階段耗時）
+    audio_seconds = transcript.duration or audio_duration
+    save_pipeline_metrics(
+        transcript,
+        timer,
+        merge=False,
+        peak_memory=max(chunk_result.get("peak_memory_mb", 0.0) for chunk_result in results),
+        processing_time=round(transcription_time + timer.elapsed, 3),
+        audio_seconds_per_second=round(audio_seconds / transcription_time, 3) if transcription_time > 0 else None
+    )
+    
+    # 更新音訊檔案處理狀態
+    audio_file.set_processing_status('completed', '轉錄完成')
+    audio_file.processed_at = timezone.now()
+    audio_file.save(update_fields=['processing_status', 'processing_message', 'processed_at'])
+    
+    # 啟動講者辨識任務（如果需要）
+    if getattr(settings, 'ENABLE_SPEAKER_RECOGNITION', True):
+        identify_speakers.delay(audio_file_id)
+    
+    logger.info(f"轉錄任務完成，音訊檔案 ID: {audio_file_id}，共 {len(chunks)} 個分段")
+    return {
+        'success': True,
+        'message': '轉錄成功完成',
+        'skipped_seconds': skipped_seconds,
+        'stage_timings': timer.as_dict()
+    }
+
+
+def save_pipeline_metrics(transcript, timer, merge=True, peak_memory=None, **fields):
+    """
+    將階段耗時與峰值記憶體寫入轉錄記錄
+    
+    以 update() 寫入，不會覆寫其他任務同時更新的欄位。
+    
+    參數:
+        transcript: Transcript 實例
+        timer: 本次任務的 StageTimer
+        merge: 是否與記錄中既有的階段耗時合併（講者辨識合併至轉錄階段耗時；重新轉錄時取代）
+        peak_memory: 在其他工作程序量測的峰值記憶體（MB），例如各分段轉錄任務中的最大值
+        **fields: 其他要一併更新的欄位，例如 processing_time
+    """
+    stage_timings = timer.as_dict()
+    peak_memory = round(max(peak_rss_mb(), peak_memory or 0.0), 1)
+    if merge:
+        stage_timings = {**(transcript.stage_timings or {}), **stage_timings}
+        peak_memory = max(transcript.peak_memory_mb or 0.0, peak_memory)
+    
+    Transcript.objects.filter(id=transcript.id).update(
+        stage_timings=stage_timings,
+        peak_memory_mb=peak_memory,
+        **fields
+    )
+    
+    timings_display = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in timer.timings.items())
+    logger.info(f"處理階段耗時（轉錄記錄 {transcript.id}）: {timings_display}, 峰值記憶體 {peak_memory:.0f} MB")
+
+
+def get_transcription_cache_key(audio_file, transcriber_type, model_name, language):
+    """
+    取得音訊檔案的轉錄快取鍵
+    
+    上傳時未計算內容雜湊值的舊檔案會在此補算並保存。
+    
+    參數:
+        audio_file: AudioFile 實例
+        transcriber_type: 轉錄器類型
+        model_name: 轉錄模型名稱
+        language: 辨識語言
+        
+    返回:
+        快取鍵字串，停用快取或無法計算雜湊值時返回空字串
+    """
+    if not getattr(settings, 'TRANSCRIPTION_CACHE_ENABLED', True):
+        return ''
+    
+    if not audio_file.content_hash:
+        try:
+            audio_file.content_hash = compute_content_hash(audio_file.file.path)
+            AudioFile.objects.filter(id=audio_file.id).update(content_hash=audio_file.content_hash)
+        except Exception as e:
+            logger.warning(f"計算音訊內容雜湊值失敗，略過轉錄快取: {e}")
+            return ''
+    
+    return Transcript.build_cache_key(audio_file.content_hash, transcriber_type, model_name, language)
+
+
+def clone_cached_transcript(audio_file, source, cache_key, transcriber_type):
+    """
+    將既有轉錄結果複製為音訊檔案的轉錄記錄（應在交易內呼叫）
+    
+    參數:
+        audio_file: 目標 AudioFile 實例
+        source: 來源 Transcript 實例
+        cache_key: 快取鍵
+        transcriber_type: 轉錄器類型
+        
+    返回:
+        目標 Transcript 實例
+    """
+    transcript = Transcript.objects.filter(audio_file_id=audio_file.id).first() or Transcript(audio_file=audio_file)
+    # 完整文本由辨識片段重建，不沿用來源記錄可能被修改過的文本
+    texts = source.segments.order_by('start_time').values_list('text', flat=True)
+    transcript.full_text = ' '.join(texts)
+    transcript.word_count = 0
+    transcript.calculate_word_count()
+    transcript.language = source.language
+    transcript.processing_method = transcriber_type
+    transcript.confidence_score = source.confidence_score
+    transcript.is_processed = True
+    transcript.is_speaker_identified = source.is_speaker_identified
+    transcript.processing_time = 0
+    transcript.cache_key = cache_key
+    transcript.save()
+    
+    cloned_count = TranscriptSegment.clone_transcript_segments(source, transcript)
+    logger.info(f"已從轉錄記錄 {source.id} 複製 {cloned_count} 個片段")
+    return transcript
+
+
 def select_transcriber_type(user_id, audio_duration):
     """
     根據用戶配置和音訊長度選擇合適的轉錄器類型
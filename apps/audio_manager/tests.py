@@ -1,8 +1,10 @@
-from django.test import TestCase
+from django.test import TestCase, SimpleTestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
 from .models import AudioFile, Transcript, TranscriptSegment
 import tempfile
 from django.core.files.uploadedfile import SimpleUploadedFile
+from unittest import mock, skipUnless
+import shutil
 
 User = get_user_model()
 
@@ -223,4 +225,1204 @@ class TranscriptSegmentTest(TestCase):
         self.assertGreater(len(right.text), 0)
         
         # 確認片段數增加了 1
-        self.assertEqual(TranscriptSegment.objects.count(), 4)
\ No newline at end of file
+        self.assertEqual(TranscriptSegment.objects.count(), 4)
+
+class VoskModelPoolTest(SimpleTestCase):
+    def setUp(self):
+        from core.audio.model_pool import VoskModelPool
+        self.pool = VoskModelPool
+        self.pool.clear()
+        self.original_budget = self.pool.memory_budget
+        self.pool.memory_budget = 250
+
+        model_patcher = mock.patch('core.audio.model_pool.Model', side_effect=lambda path: object())
+        size_patcher = mock.patch.object(VoskModelPool, '_estimate_model_size', return_value=100)
+        self.model_cls = model_patcher.start()
+        size_patcher.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def tearDown(self):
+        self.pool.clear()
+        self.pool.memory_budget = self.original_budget
+
+    def test_model_loaded_once(self):
+        first = self.pool.get_model('/models/a')
+        second = self.pool.get_model('/models/a')
+        self.assertIs(first, second)
+        self.assertEqual(self.model_cls.call_count, 1)
+
+    def test_lru_eviction_within_budget(self):
+        self.pool.get_model('/models/a')
+        self.pool.get_model('/models/b')
+        self.pool.get_model('/models/a')  # a 成為最近使用
+        self.pool.get_model('/models/c')  # 超出預算，移除 b
+
+        self.assertTrue(self.pool.is_loaded('/models/a'))
+        self.assertFalse(self.pool.is_loaded('/models/b'))
+        self.assertTrue(self.pool.is_loaded('/models/c'))
+        self.assertLessEqual(self.pool.memory_usage(), 250)
+
+
+class PCMWindowingTest(SimpleTestCase):
+    def setUp(self):
+        import numpy as np
+        self.sample_rate = 8000
+        rng = np.random.default_rng(0)
+        # 每 7 秒的聲音後接 1 秒靜音，共 80 秒
+        pattern = np.concatenate([
+            rng.integers(-8000, 8000, self.sample_rate * 7),
+            np.zeros(self.sample_rate, dtype=np.int64)
+        ])
+        self.samples = np.tile(pattern, 10).astype(np.int16)
+        self.pcm = self.samples.tobytes()
+
+    def test_windows_cover_stream_and_cut_at_silence(self):
+        from core.audio.chunking import iter_pcm_windows
+        chunks = (self.pcm[i:i + 3000] for i in range(0, len(self.pcm), 3000))
+        windows = list(iter_pcm_windows(chunks, self.sample_rate, window_seconds=10, overlap_seconds=0.5, search_seconds=3))
+
+        self.assertGreater(len(windows), 1)
+        self.assertEqual(windows[0].own_start, 0)
+        self.assertEqual(windows[-1].own_end, float("inf"))
+        for previous, current in zip(windows, windows[1:]):
+            self.assertEqual(previous.own_end, current.own_start)
+            # 切點應落在靜音區間
+            cut_sample = int(previous.own_end * self.sample_rate)
+            self.assertEqual(self.samples[cut_sample], 0)
+        for window in windows:
+            offset = window.start_sample * 2
+            self.assertEqual(window.pcm, self.pcm[offset:offset + len(window.pcm)])
+
+    def test_stitch_drops_duplicated_overlap_words(self):
+        from core.audio.chunking import stitch_window_utterances
+        windows = [
+            {"own_start": 0.0, "own_end": 10.0, "utterances": [{"words": [
+                {"word": "今天", "start": 8.0, "end": 8.5},
+                {"word": "上課", "start": 9.0, "end": 9.5},
+                {"word": "內容", "start": 10.1, "end": 10.6},
+            ]}]},
+            {"own_start": 10.0, "own_end": float("inf"), "utterances": [{"words": [
+                {"word": "上課", "start": 9.0, "end": 9.5},
+                {"word": "內容", "start": 10.1, "end": 10.6},
+            ]}]},
+        ]
+        segments = stitch_window_utterances(windows)
+        self.assertEqual([segment["text"] for segment in segments], ["今天 上課", "內容"])
+        self.assertEqual(segments[1]["start"], 10.1)
+
+
+class VoiceActivityDetectionTest(SimpleTestCase):
+    def test_long_silence_skipped_and_timeline_mapped(self):
+        import numpy as np
+        from core.audio.vad import SilenceSkipper
+
+        sample_rate = 16000
+        t = np.arange(2 * sample_rate) / sample_rate
+        tone = (8000 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+        silence = np.zeros(sample_rate, dtype=np.int16)
+        # 5 秒靜音、2 秒語音、10 秒靜音、2 秒語音、1 秒靜音（短於門檻，保留）
+        pcm = np.concatenate([np.tile(silence, 5), tone, np.tile(silence, 10), tone, silence]).tobytes()
+
+        skipper = SilenceSkipper(sample_rate, min_silence_seconds=2.0, padding_seconds=0.3)
+        chunks = [pcm[i:i + 3333] for i in range(0, len(pcm), 3333)]
+        output = b''.join(skipper.filter(chunks))
+
+        self.assertEqual(skipper.input_samples, len(pcm) // 2)
+        self.assertEqual(len(output) // 2, skipper.output_samples)
+        self.assertAlmostEqual(skipper.skipped_seconds, 20 - 0.3 - 2 - 0.6 - 2 - 1, delta=0.1)
+        self.assertEqual(skipper.timeline.gap_count, 1)
+
+        # 輸出中兩段語音的起點換算回原始時間
+        samples = np.frombuffer(output, dtype=np.int16)
+        voiced = np.flatnonzero(np.abs(samples) > 0) / sample_rate
+        second_start = voiced[np.argmax(np.diff(voiced)) + 1]
+        self.assertAlmostEqual(skipper.timeline.to_original(voiced[0]), 5.0, delta=0.01)
+        self.assertAlmostEqual(skipper.timeline.to_original(second_start), 17.0, delta=0.01)
+
+    def test_disabled_vad_passes_stream_through(self):
+        from core.audio.transcriber import WhisperTranscriber
+
+        transcriber = WhisperTranscriber(api_key='test-key', vad_enabled=False)
+        chunks = [b'\x00\x00' * 100]
+        self.assertEqual(transcriber._skip_silence(chunks, 16000), (chunks, None))
+
+
+class SegmentMFCCExtractorTest(SimpleTestCase):
+    def test_segment_means_match_per_segment_mfcc(self):
+        import librosa
+        import numpy as np
+        from core.audio.features import extract_segment_means
+
+        sample_rate = 16000
+        rng = np.random.default_rng(0)
+        t = np.arange(sample_rate * 20) / sample_rate
+        signal = (0.3 * np.sin(2 * np.pi * (200 + 100 * np.sin(t / 3)) * t)
+                  + 0.05 * rng.standard_normal(len(t))).astype(np.float32)
+        ranges = [(int(start * sample_rate), int(end * sample_rate), index)
+                  for index, (start, end) in enumerate([(0.0, 1.2), (1.5, 4.0), (3.7, 9.3), (12.25, 13.0), (18.9, 25.0)])]
+
+        blocks = (signal[i:i + sample_rate * 3] for i in range(0, len(signal), sample_rate * 3))
+        features = extract_segment_means(blocks, sample_rate, ranges, min_samples=sample_rate // 2)
+
+        self.assertEqual(sorted(features), [0, 1, 2, 3, 4])
+        for start, end, index in ranges:
+            expected = librosa.feature.mfcc(y=signal[start:end], sr=sample_rate, n_mfcc=13).mean(axis=1)
+            error = np.abs(features[index] - expected).max() / np.linalg.norm(expected)
+            self.assertLess(error, 0.1)
+
+    def test_segment_means_independent_of_block_size(self):
+        import numpy as np
+        from core.audio.features import extract_segment_means
+
+        sample_rate = 16000
+        rng = np.random.default_rng(1)
+        signal = (0.2 * rng.standard_normal(sample_rate * 12)).astype(np.float32)
+        ranges = [(0, 16000, 0), (20000, 70000, 1), (90000, 191000, 2)]
+
+        results = []
+        for block_size in (1000, 4096, sample_rate * 10):
+            blocks = (signal[i:i + block_size] for i in range(0, len(signal), block_size))
+            results.append(extract_segment_means(blocks, sample_rate, ranges))
+
+        for features in results[1:]:
+            self.assertEqual(sorted(features), sorted(results[0]))
+            for index in features:
+                np.testing.assert_allclose(features[index], results[0][index], rtol=1e-4, atol=1e-3)
+
+
+@skipUnless(shutil.which('ffmpeg'), '需要 ffmpeg')
+class SpeakerFeatureStreamingTest(SimpleTestCase):
+    def test_streamed_features_match_librosa_on_same_spans(self):
+        import wave
+        import librosa
+        import numpy as np
+        from core.audio.speaker_recognition import SimpleSpeakerRecognizer
+
+        sample_rate = 16000
+        rng = np.random.default_rng(0)
+        t = np.arange(sample_rate * 45) / sample_rate
+        # 兩種音高交替出現，模擬兩位講者
+        pitch = np.where((t // 5) % 2 == 0, 180.0, 320.0)
+        signal = 0.3 * np.sin(2 * np.pi * np.cumsum(pitch) / sample_rate) + 0.02 * rng.standard_normal(len(t))
+        samples = (signal * 32767).astype(np.int16)
+
+        segments = [
+            {"start": 0.0, "end": 4.5, "text": "一"},
+            {"start": 5.0, "end": 9.8, "text": "二"},
+            {"start": 10.0, "end": 10.2, "text": "太短"},
+            {"start": 10.5, "end": 44.0, "text": "超過分析上限"},
+            {"start": 44.5, "end": 50.0, "text": "超出音訊結尾"},
+        ]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            audio_path = f'{temp_dir}/lecture.wav'
+            with wave.open(audio_path, 'wb') as wf:
+                wf.setnchannels(1)
+                wf.setsampwidth(2)
+                wf.setframerate(sample_rate)
+                wf.writeframes(samples.tobytes())
+
+            recognizer = SimpleSpeakerRecognizer()
+            features, indices = recognizer._extract_segment_features(audio_path, segments)
+
+        self.assertEqual(indices, [0, 1, 3, 4])
+        y = samples.astype(np.float32) / 32768.0
+        max_samples = int(SimpleSpeakerRecognizer.MAX_ANALYSIS_SECONDS * sample_rate)
+        for feature, index in zip(features, indices):
+            start = int(segments[index]["start"] * sample_rate)
+            end = min(int(segments[index]["end"] * sample_rate), start + max_samples, len(y))
+            expected = librosa.feature.mfcc(y=y[start:end], sr=sample_rate, n_mfcc=13).mean(axis=1)
+            error = np.abs(feature - expected).max() / np.linalg.norm(expected)
+            self.assertLess(error, 0.1)
+
+class SpeakerAssignmentTest(SimpleTestCase):
+    def test_unlabeled_segments_take_nearest_speaker(self):
+        from core.audio.speaker_recognition import SimpleSpeakerRecognizer
+        segments = [{"start": i * 2.0, "end": i * 2.0 + 1.0, "text": str(i), "speaker_id": None, "confidence": 1.0}
+                    for i in range(6)]
+
+        result = SimpleSpeakerRecognizer()._assign_speakers(segments, [4, 0], ["speaker_1", "speaker_0"])
+
+        self.assertEqual([s["text"] for s in result], ["0", "1", "2", "3", "4", "5"])
+        self.assertEqual(
+            [s["speaker_id"] for s in result],
+            ["speaker_0", "speaker_0", "speaker_0", "speaker_1", "speaker_1", "speaker_1"]
+        )
+
+
+class SpeakerClusteringStrategyTest(SimpleTestCase):
+    def test_two_stage_recovers_speakers(self):
+        import numpy as np
+        from core.audio.clustering import TwoStageClusteringStrategy
+        rng = np.random.default_rng(0)
+        speakers = np.repeat(rng.integers(0, 3, 300), 10)
+        centers = rng.normal(0, 10, (3, 13))
+        features = centers[speakers] + rng.normal(0, 1, (len(speakers), 13))
+
+        labels = TwoStageClusteringStrategy().fit_predict(features, 3)
+
+        # 標籤編號可能不同，但分群結果應一致
+        pairs = set(zip(speakers.tolist(), labels.tolist()))
+        self.assertEqual(len(pairs), 3)
+        self.assertEqual(len({label for _, label in pairs}), 3)
+
+    def test_strategy_selected_by_segment_count(self):
+        from core.audio import clustering
+        from core.audio.speaker_recognition import SimpleSpeakerRecognizer
+        with mock.patch.object(clustering, "TWO_STAGE_MIN_SEGMENTS", 100):
+            recognizer = SimpleSpeakerRecognizer()
+            self.assertIsInstance(recognizer.get_clustering_strategy(99), clustering.AgglomerativeStrategy)
+            self.assertIsInstance(recognizer.get_clustering_strategy(100), clustering.TwoStageClusteringStrategy)
+
+            fixed = clustering.AgglomerativeStrategy()
+            self.assertIs(SimpleSpeakerRecognizer(clustering_strategy=fixed).get_clustering_strategy(100), fixed)
+
+
+def write_test_wav(path, seconds, sample_rate=16000, silence_every=None, silent_ranges=()):
+    """產生測試用 WAV 檔案（正弦波，可每隔數秒插入 0.5 秒靜音，或指定靜音區間）"""
+    import wave
+    import numpy as np
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    samples = 8000 * np.sin(2 * np.pi * 440 * t)
+    if silence_every:
+        samples[(t % silence_every) > silence_every - 0.5] = 0
+    for start, end in silent_ranges:
+        samples[(t >= start) & (t < end)] = 0
+    with wave.open(str(path), 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(samples.astype(np.int16).tobytes())
+
+
+class FakeWhisperServer:
+    """在背景執行緒提供 /audio/transcriptions 的本機假 API 伺服器"""
+
+    def __init__(self, fail_first=0):
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.requests = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                with server.lock:
+                    server.requests.append({'headers': dict(self.headers), 'size': len(body)})
+                    attempt = len(server.requests)
+                if attempt <= fail_first:
+                    payload, status = b'{"error": "busy"}', 503
+                else:
+                    payload = json.dumps({
+                        "text": f"chunk{attempt}", "language": "chinese",
+                        "segments": [{"start": 0.5, "end": 1.5, "text": f"chunk{attempt}"}]
+                    }).encode('utf-8')
+                    status = 200
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}/v1'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@skipUnless(shutil.which('ffmpeg'), '需要 ffmpeg')
+class WhisperChunkedUploadTest(SimpleTestCase):
+    def test_chunks_uploaded_with_retry_and_offsets(self):
+        from pathlib import Path
+        from core.audio.transcriber import WhisperTranscriber
+
+        with tempfile.TemporaryDirectory() as temp_dir, FakeWhisperServer(fail_first=1) as server:
+            audio_path = Path(temp_dir) / 'lecture.wav'
+            write_test_wav(audio_path, 25, silence_every=4)
+            transcriber = WhisperTranscriber(api_key='test-key', api_base=server.url, max_chunk_seconds=10,
+                                             max_concurrency=2, retry_backoff=0)
+            transcriber.initialized = True
+            result = transcriber.transcribe_file(audio_path, language='zh')
+
+        self.assertTrue(result['success'], result.get('error'))
+        data = result['data']
+        self.assertEqual(len(data['segments']), 3)
+        # 失敗的第一個請求重試後成功，共 4 個請求
+        self.assertEqual(len(server.requests), 4)
+        self.assertTrue(all(r['headers']['Authorization'] == 'Bearer test-key' for r in server.requests))
+        starts = [segment['start'] for segment in data['segments']]
+        self.assertEqual(starts, sorted(starts))
+        self.assertAlmostEqual(starts[0], 0.5)
+        # 切點落在靜音區間（每 4 秒的最後 0.5 秒）
+        for start in starts[1:]:
+            self.assertAlmostEqual((start - 0.5) % 4, 3.75, delta=0.3)
+        self.assertAlmostEqual(data['duration'], 25, places=1)
+
+    def test_long_silence_not_uploaded(self):
+        from pathlib import Path
+        from core.audio.transcriber import WhisperTranscriber
+
+        with tempfile.TemporaryDirectory() as temp_dir, FakeWhisperServer() as server:
+            audio_path = Path(temp_dir) / 'lecture.wav'
+            write_test_wav(audio_path, 40, silent_ranges=[(0, 10), (15, 35)])
+            transcriber = WhisperTranscriber(api_key='test-key', api_base=server.url, vad_enabled=True)
+            transcriber.initialized = True
+            result = transcriber.transcribe_file(audio_path, language='zh')
+
+        self.assertTrue(result['success'], result.get('error'))
+        data = result['data']
+        self.assertAlmostEqual(data['duration'], 40, places=1)
+        self.assertAlmostEqual(data['skipped_seconds'], 30 - 0.9, delta=0.1)
+        # 片段時間換算回原始時間軸：上傳音訊從 9.7 秒（保留 0.3 秒前導）開始
+        self.assertAlmostEqual(data['segments'][0]['start'], 10.2, delta=0.05)
+
+
+class WhisperHTTPClientTest(SimpleTestCase):
+    def setUp(self):
+        from core.audio.whisper_client import WhisperHTTPClient
+        WhisperHTTPClient.reset_instance()
+        self.addCleanup(WhisperHTTPClient.reset_instance)
+
+    def test_transcribers_share_keep_alive_connection(self):
+        from core.audio.transcriber import WhisperTranscriber
+
+        with FakeWhisperServer() as server:
+            first = WhisperTranscriber(api_key='test-key', api_base=server.url)
+            second = WhisperTranscriber(api_key='test-key', api_base=server.url)
+            self.assertIs(first.client, second.client)
+            for transcriber in (first, second, first, second):
+                response = transcriber.client.post(f"{server.url}/audio/transcriptions", data={"model": "whisper-1"})
+                self.assertEqual(response.status_code, 200)
+
+        metrics = first.client.get_metrics()
+        self.assertEqual(metrics["requests"], 4)
+        self.assertEqual(metrics["new_connections"], 1)
+        self.assertAlmostEqual(metrics["connection_reuse_rate"], 0.75)
+        self.assertGreater(metrics["latency_ms"]["p99"], 0)
+        self.assertLessEqual(metrics["latency_ms"]["p50"], metrics["latency_ms"]["p99"])
+
+    def test_chunk_upload_stops_at_deadline(self):
+        """測試請求逾時不超過剩餘期限，剩餘時間不足以重試時拋出 TimeoutError"""
+        import time
+        import requests
+        from core.audio.transcriber import WhisperTranscriber
+
+        transcriber = WhisperTranscriber(api_key='test-key', api_base='http://127.0.0.1:9/v1', retry_backoff=1.0)
+        timeouts = []
+
+        def hung_request(*args, timeout=None, **kwargs):
+            timeouts.append(timeout)
+            raise requests.ReadTimeout('read timed out')
+
+        with mock.patch('core.audio.transcriber.encode_pcm', return_value=b'mp3'), \
+                mock.patch.object(transcriber.client, 'post', side_effect=hung_request):
+            started = time.monotonic()
+            with self.assertRaises(TimeoutError):
+                transcriber._transcribe_chunk(b'\x00\x00', 'zh', deadline=started + 0.5)
+
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(len(timeouts), 1)
+        self.assertLessEqual(max(timeouts[0]), 0.5)
+
+        with self.assertRaises(TimeoutError):
+            transcriber._remaining_timeout(time.monotonic() - 1)
+
+class StreamingTranscriptionTest(SimpleTestCase):
+    def test_vosk_session_emits_partial_and_final_events(self):
+        import json
+        from core.audio.streaming import VoskStreamSession
+
+        class FakeRecognizer:
+            """每收到 4 個區塊視為一句結束"""
+            def __init__(self, model, sample_rate):
+                self.count = 0
+
+            def SetWords(self, enabled):
+                pass
+
+            def AcceptWaveform(self, data):
+                self.count += 1
+                return self.count % 4 == 0
+
+            def PartialResult(self):
+                return json.dumps({"partial": "今天" if self.count % 4 < 3 else "今天 上課"})
+
+            def Result(self):
+                return json.dumps({"text": "今天 上課", "result": [
+                    {"word": "今天", "start": 0.2, "end": 0.6}, {"word": "上課", "start": 0.7, "end": 1.1}
+                ]})
+
+            def FinalResult(self):
+                return json.dumps({"text": ""})
+
+        with mock.patch('core.audio.streaming.KaldiRecognizer', FakeRecognizer):
+            session = VoskStreamSession(model=None, sample_rate=16000, offset=10.0)
+            events = []
+            for _ in range(4):
+                events.extend(session.accept_pcm(b'\x00\x00' * 1600))
+            events.extend(session.finish())
+
+        self.assertEqual([event["type"] for event in events], ["partial", "partial", "final"])
+        self.assertEqual([event["text"] for event in events], ["今天", "今天 上課", "今天 上課"])
+        self.assertAlmostEqual(events[-1]["segment"]["start"], 10.2)
+        self.assertAlmostEqual(events[-1]["segment"]["end"], 11.1)
+        self.assertAlmostEqual(session.duration, 0.4)
+
+    def test_async_bridge_preserves_order_and_errors(self):
+        import asyncio
+        from core.audio.streaming import bridge_async_stream
+
+        async def chunks():
+            for i in range(50):
+                await asyncio.sleep(0)
+                yield bytes([i])
+
+        def lengths(sync_chunks):
+            for chunk in sync_chunks:
+                yield chunk[0]
+
+        def failing(sync_chunks):
+            next(iter(sync_chunks))
+            raise ValueError("解碼失敗")
+
+        async def collect(stream_fn):
+            return [item async for item in bridge_async_stream(chunks(), stream_fn, max_buffered_chunks=2)]
+
+        self.assertEqual(asyncio.run(collect(lengths)), list(range(50)))
+        with self.assertRaises(ValueError):
+            asyncio.run(collect(failing))
+
+    def test_async_bridge_bounds_buffered_results(self):
+        import asyncio
+        from core.audio.streaming import bridge_async_stream
+
+        produced = []
+
+        async def chunks():
+            yield b'\x00'
+
+        def many(sync_chunks):
+            for _ in sync_chunks:
+                pass
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        async def consume_slowly():
+            stream = bridge_async_stream(chunks(), many, max_buffered_results=4)
+            first = await stream.__anext__()
+            await asyncio.sleep(0.3)
+            backlog = len(produced)
+            return first, backlog, [item async for item in stream]
+
+        first, backlog, rest = asyncio.run(consume_slowly())
+        # 已取出 1 筆、佇列中 4 筆，另有 1 筆等待放入
+        self.assertLessEqual(backlog, 6)
+        self.assertEqual([first] + rest, list(range(100)))
+
+    @skipUnless(shutil.which('ffmpeg'), '需要 ffmpeg')
+    def test_whisper_stream_decodes_without_temp_file(self):
+        import io
+        from core.audio.transcriber import WhisperTranscriber
+
+        with tempfile.TemporaryDirectory() as temp_dir, FakeWhisperServer() as server:
+            audio_path = f'{temp_dir}/lecture.wav'
+            write_test_wav(audio_path, 5)
+            with open(audio_path, 'rb') as f:
+                audio_stream = io.BytesIO(f.read())
+
+            transcriber = WhisperTranscriber(api_key='test-key', api_base=server.url)
+            transcriber.initialized = True
+            with mock.patch('tempfile.NamedTemporaryFile', side_effect=AssertionError('不應寫入臨時檔案')):
+                result = transcriber.transcribe_stream(audio_stream, 'wav', language='zh')
+
+        self.assertTrue(result['success'], result.get('error'))
+        self.assertEqual(result['data']['text'], 'chunk1')
+        self.assertAlmostEqual(result['data']['duration'], 5, places=1)
+
+
+class LiveCaptionWebSocketTest(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='teacher', password='pass1234')
+
+    def _communicator(self, cookie=''):
+        from asgiref.testing import ApplicationCommunicator
+        from apps.audio_manager.live import live_caption_application
+
+        scope = {
+            'type': 'websocket',
+            'path': '/ws/live-caption/',
+            'query_string': 'title=第一堂&sample_rate=16000'.encode('utf-8'),
+            'headers': [(b'cookie', cookie.encode('latin-1'))],
+        }
+        return ApplicationCommunicator(live_caption_application, scope)
+
+    def test_rejects_anonymous_connection(self):
+        from asgiref.sync import async_to_sync
+
+        async def run():
+            communicator = self._communicator()
+            await communicator.send_input({'type': 'websocket.connect'})
+            return await communicator.receive_output(timeout=5)
+
+        message = async_to_sync(run)()
+        self.assertEqual(message, {'type': 'websocket.close', 'code': 4401})
+
+    @override_settings(LIVE_CAPTION_PERSIST_BATCH_SIZE=2, LIVE_CAPTION_PERSIST_INTERVAL=60)
+    def test_streams_captions_and_persists_segments(self):
+        import json
+        from asgiref.sync import async_to_sync
+
+        class FakeRecognizer:
+            """每收到 2 個區塊視為一句結束"""
+            count = 0
+
+            def SetWords(self, enabled):
+                pass
+
+            def AcceptWaveform(self, data):
+                self.count += 1
+                return self.count % 2 == 0
+
+            def PartialResult(self):
+                return json.dumps({"partial": f"第 {self.count // 2} 句"})
+
+            def Result(self):
+                start = self.count // 2 - 1.0
+                return json.dumps({"text": f"第 {self.count // 2} 句", "result": [
+                    {"word": "第", "start": start, "end": start + 0.5}
+                ]})
+
+            def FinalResult(self):
+                return json.dumps({"text": ""})
+
+        self.client.force_login(self.user)
+        cookie = f"sessionid={self.client.cookies['sessionid'].value}"
+
+        async def run():
+            communicator = self._communicator(cookie)
+            await communicator.send_input({'type': 'websocket.connect'})
+            messages = [await communicator.receive_output(timeout=5)]
+            messages.append(json.loads((await communicator.receive_output(timeout=5))['text']))
+            for _ in range(6):
+                await communicator.send_input({'type': 'websocket.receive', 'bytes': b'\x00\x00' * 8000})
+            await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps({'type': 'stop'})})
+            while True:
+                output = await communicator.receive_output(timeout=5)
+                if output['type'] == 'websocket.close':
+                    break
+                messages.append(json.loads(output['text']))
+            await communicator.wait(timeout=5)
+            return messages
+
+        pool = mock.Mock()
+        with mock.patch('apps.audio_manager.live._acquire_recognizer',
+                        mock.AsyncMock(return_value=('model', FakeRecognizer()))), \
+                mock.patch('apps.audio_manager.live.recognizer_pool', pool):
+            messages = async_to_sync(run)()
+
+        self.assertEqual(messages[0], {'type': 'websocket.accept'})
+        self.assertEqual(messages[1]['type'], 'ready')
+        self.assertEqual(
+            [message['type'] for message in messages[2:]],
+            ['partial', 'final', 'partial', 'final', 'partial', 'final', 'closed']
+        )
+        self.assertEqual(messages[3], {'type': 'final', 'text': '第 1 句', 'start': 0.0, 'end': 0.5})
+        pool.release.assert_called_once()
+
+        transcript = Transcript.objects.get(id=messages[1]['transcript_id'])
+        self.assertTrue(transcript.is_processed)
+        self.assertEqual(transcript.full_text, '第 1 句 第 2 句 第 3 句')
+        self.assertEqual(transcript.segments.count(), 3)
+        self.assertEqual(transcript.audio_file.title, '第一堂')
+        self.assertEqual(transcript.audio_file.processing_status, 'completed')
+        self.assertAlmostEqual(transcript.audio_file.duration, 3.0)
+
+    def test_cancelled_session_releases_recognizer_after_pending_work(self):
+        """測試連線任務被取消時，等執行緒池中的辨識完成後才歸還識別器"""
+        import asyncio
+        import json
+        import threading
+        from asgiref.sync import async_to_sync
+
+        entered = threading.Event()
+        unblock = threading.Event()
+        released = threading.Event()
+
+        class BlockingRecognizer:
+            def SetWords(self, enabled):
+                pass
+
+            def AcceptWaveform(self, data):
+                entered.set()
+                unblock.wait(5)
+                return False
+
+            def PartialResult(self):
+                return json.dumps({"partial": ""})
+
+        self.client.force_login(self.user)
+        cookie = f"sessionid={self.client.cookies['sessionid'].value}"
+        pool = mock.Mock()
+        pool.release.side_effect = lambda *args: released.set()
+
+        async def run():
+            communicator = self._communicator(cookie)
+            await communicator.send_input({'type': 'websocket.connect'})
+            await communicator.receive_output(timeout=5)
+            await communicator.receive_output(timeout=5)
+            await communicator.send_input({'type': 'websocket.receive', 'bytes': b'\x00\x00' * 8000})
+            await asyncio.to_thread(entered.wait, 5)
+
+            communicator.stop()
+            try:
+                await communicator.wait(timeout=5)
+            except asyncio.CancelledError:
+                pass
+            released_while_busy = released.is_set()
+            unblock.set()
+            await asyncio.to_thread(released.wait, 5)
+            return released_while_busy
+
+        with mock.patch('apps.audio_manager.live._acquire_recognizer',
+                        mock.AsyncMock(return_value=('model', BlockingRecognizer()))), \
+                mock.patch('apps.audio_manager.live.recognizer_pool', pool):
+            released_while_busy = async_to_sync(run)()
+
+        self.assertFalse(released_while_busy)
+        pool.release.assert_called_once()
+
+    def test_detail_page_renders_live_transcript(self):
+        """測試未保存原始音訊的即時字幕記錄可開啟詳細頁面"""
+        from asgiref.sync import async_to_sync
+        from apps.audio_manager.live import create_live_transcript
+
+        ids = async_to_sync(create_live_transcript)(self.user.id, '即時字幕')
+        self.client.force_login(self.user)
+
+        response = self.client.get(f"/audio/{ids['audio_file_id']}/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '未保存原始音訊')
+        self.assertNotContains(response, '下載原始檔案')
+
+
+class AudioMetadataProbeTest(SimpleTestCase):
+    def test_probe_reads_wav_header(self):
+        import wave
+        from core.audio.metadata import probe_audio_metadata
+
+        with tempfile.NamedTemporaryFile(suffix='.wav') as temp_file:
+            with wave.open(temp_file.name, 'wb') as wf:
+                wf.setnchannels(2)
+                wf.setsampwidth(2)
+                wf.setframerate(22050)
+                wf.writeframes(b'\x00\x00' * 2 * 22050 * 3)
+
+            result = probe_audio_metadata(temp_file.name)
+
+        self.assertTrue(result['success'])
+        self.assertAlmostEqual(result['data']['duration'], 3.0)
+        self.assertEqual(result['data']['sample_rate'], 22050)
+        self.assertEqual(result['data']['channels'], 2)
+
+    def test_probe_missing_file(self):
+        from core.audio.metadata import probe_audio_metadata
+        self.assertFalse(probe_audio_metadata('/nonexistent/audio.mp3')['success'])
+
+
+@skipUnless(shutil.which('ffmpeg'), '需要 ffmpeg')
+class FFmpegPCMDecoderTest(SimpleTestCase):
+    def setUp(self):
+        import numpy as np
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        self.audio_path = f'{temp_dir}/lecture.wav'
+        write_test_wav(self.audio_path, 6)
+        with open(self.audio_path, 'rb') as f:
+            self.wav_bytes = f.read()
+        self.samples = np.frombuffer(self.wav_bytes[44:], dtype=np.int16)
+
+    def decode_in_thread(self, decoder):
+        """在背景執行緒解碼，逾時未結束時視為卡住"""
+        import threading
+        outcome = {}
+
+        def run():
+            try:
+                outcome['pcm'] = b''.join(decoder)
+            except Exception as e:
+                outcome['error'] = e
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(timeout=30)
+        self.assertFalse(thread.is_alive(), '解碼未結束')
+        return outcome
+
+    def test_windowed_decode_from_path(self):
+        import numpy as np
+        from core.audio.decoder import FFmpegPCMDecoder
+
+        decoder = FFmpegPCMDecoder(self.audio_path, sample_rate=16000, chunk_size=3000, start=1.5, duration=2.0)
+        chunks = list(decoder)
+
+        self.assertTrue(all(len(chunk) <= 3000 for chunk in chunks))
+        pcm = np.frombuffer(b''.join(chunks), dtype=np.int16)
+        self.assertEqual(len(pcm), 2 * 16000)
+        np.testing.assert_array_equal(pcm, self.samples[24000:56000])
+        self.assertAlmostEqual(decoder.decoded_duration, 2.0)
+
+    def test_stdin_sources_match_path_output(self):
+        import io
+        from core.audio.decoder import FFmpegPCMDecoder
+
+        expected = b''.join(FFmpegPCMDecoder(self.audio_path))
+        from_stream = self.decode_in_thread(FFmpegPCMDecoder(io.BytesIO(self.wav_bytes), chunk_size=4096))
+        chunks = (self.wav_bytes[i:i + 1000] for i in range(0, len(self.wav_bytes), 1000))
+        from_chunks = self.decode_in_thread(FFmpegPCMDecoder(chunks))
+
+        self.assertEqual(from_stream.get('pcm'), expected)
+        self.assertEqual(from_chunks.get('pcm'), expected)
+
+    def test_failed_decode_raises_instead_of_hanging(self):
+        import itertools
+        from core.audio.decoder import FFmpegPCMDecoder
+
+        # 無法辨識的輸入且永不結束：ffmpeg 失敗結束後，寫入執行緒也必須停止
+        garbage = itertools.repeat(b'not audio ' * 1000)
+        outcome = self.decode_in_thread(FFmpegPCMDecoder(garbage, input_format='wav'))
+
+        self.assertIsInstance(outcome.get('error'), RuntimeError)
+        self.assertIn('ffmpeg 解碼失敗', str(outcome['error']))
+
+class ReplaceTranscriptSegmentsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.audio_file = AudioFile.objects.create(title='測試音訊', file='test_audio.wav', user=self.user)
+        self.transcript = Transcript.objects.create(
+            audio_file=self.audio_file,
+            full_text="舊的內容",
+            processing_method="vosk"
+        )
+        TranscriptSegment.objects.create(transcript=self.transcript, start_time=0.0, end_time=1.0, text="舊的內容")
+
+    def test_replaces_existing_segments_in_batches(self):
+        segments = [
+            {"start": i * 1.0, "end": i * 1.0 + 0.8, "text": f"第{i}段，內容。"}
+            for i in range(25)
+        ]
+        saved = TranscriptSegment.replace_transcript_segments(self.transcript, segments, batch_size=10)
+
+        self.assertEqual(saved, 25)
+        stored = list(self.transcript.segments.order_by('start_time'))
+        self.assertEqual(len(stored), 25)
+        self.assertNotIn("舊的內容", [segment.text for segment in stored])
+        self.assertEqual(stored[0].word_count, TranscriptSegment.count_words("第0段，內容。"))
+        self.assertEqual([segment.speaker_id for segment in stored[:2]], ["speaker_0", "speaker_1"])
+
+
+class IdentifySpeakersTaskTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.audio_file = AudioFile.objects.create(title='測試音訊', file='test_audio.wav', user=self.user, duration=60)
+        self.transcript = Transcript.objects.create(
+            audio_file=self.audio_file,
+            full_text="測試",
+            processing_method="vosk",
+            is_processed=True
+        )
+        TranscriptSegment.replace_transcript_segments(
+            self.transcript,
+            [{"start": i * 1.0, "end": i * 1.0 + 0.9, "text": f"片段{i}"} for i in range(50)]
+        )
+
+    def test_speaker_labels_applied_by_primary_key(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .tasks import identify_speakers
+
+        class FakeRecognizer:
+            def initialize(self):
+                return {"success": True}
+
+            def identify_speakers(self, audio_file, segments):
+                labeled = []
+                for segment in segments:
+                    segment = segment.copy()
+                    segment["speaker_id"] = "speaker_9" if segment["start"] >= 25 else "speaker_8"
+                    labeled.append(segment)
+                return {"success": True, "data": labeled}
+
+        with mock.patch('apps.audio_manager.tasks.get_speaker_recognizer', return_value=FakeRecognizer()), \
+                mock.patch('apps.audio_manager.tasks.QuotaManager.reserve_quota', return_value=(True, '', None)), \
+                mock.patch('apps.audio_manager.tasks.QuotaManager.commit_quota'):
+            with CaptureQueriesContext(connection) as queries:
+                result = identify_speakers.apply(args=(self.audio_file.id,)).get()
+
+        self.assertTrue(result['success'])
+        segment_updates = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE') and 'transcriptsegment' in query['sql']
+        ]
+        self.assertEqual(len(segment_updates), 1)
+        self.assertEqual(self.transcript.segments.filter(speaker_id="speaker_9").count(), 25)
+        self.transcript.refresh_from_db()
+        self.assertTrue(self.transcript.is_speaker_identified)
+
+
+class TranscriptionCacheTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        content_hash = 'a' * 64
+        source_audio = AudioFile.objects.create(title='原始錄音', file='lecture.wav', user=self.user,
+                                                duration=60, content_hash=content_hash)
+        self.source = Transcript.objects.create(
+            audio_file=source_audio,
+            full_text="第一段 第二段",
+            processing_method="vosk",
+            is_processed=True,
+            is_speaker_identified=True,
+            cache_key=Transcript.build_cache_key(content_hash, 'vosk', 'vosk-model-zh-cn-0.22', 'zh-TW')
+        )
+        TranscriptSegment.replace_transcript_segments(self.source, [
+            {"start": 0.0, "end": 1.0, "text": "第一段", "speaker_id": "speaker_1"},
+            {"start": 1.0, "end": 2.0, "text": "第二段", "speaker_id": "speaker_0"},
+        ])
+        self.audio_file = AudioFile.objects.create(title='重複上傳', file='lecture_copy.wav', user=self.user,
+                                                   duration=60, content_hash=content_hash)
+
+    def test_upload_handler_hashes_received_chunks(self):
+        import hashlib
+        from django.core.files.uploadhandler import StopFutureHandlers
+        from utils.file_handlers import HashingMemoryFileUploadHandler
+
+        data = b'RIFF' + bytes(range(256)) * 100
+        handler = HashingMemoryFileUploadHandler()
+        handler.handle_raw_input(None, {}, len(data), 'boundary')
+        try:
+            handler.new_file('file', 'lecture.wav', 'audio/wav', len(data))
+        except StopFutureHandlers:
+            pass  # 記憶體處理器啟用時會阻止後續處理器接收檔案
+        for start in range(0, len(data), 1000):
+            handler.receive_data_chunk(data[start:start + 1000], start)
+        uploaded = handler.file_complete(len(data))
+
+        self.assertEqual(uploaded.content_hash, hashlib.sha256(data).hexdigest())
+
+    def test_duplicate_upload_clones_cached_transcript(self):
+        from .tasks import transcribe_audio_file
+
+        with mock.patch('apps.audio_manager.tasks.QuotaManager.reserve_quota', return_value=(True, '', None)), \
+                mock.patch('apps.audio_manager.tasks.QuotaManager.commit_quota'), \
+                mock.patch('apps.audio_manager.tasks.select_transcriber_type', return_value='vosk'), \
+                mock.patch('apps.audio_manager.tasks.os.path.exists', return_value=True), \
+                mock.patch('core.audio.transcriber.VoskTranscriber.transcribe_file') as transcribe_file, \
+                mock.patch('apps.audio_manager.tasks.identify_speakers.delay') as identify_delay:
+            result = transcribe_audio_file.apply(args=(self.audio_file.id,)).get()
+
+        self.assertTrue(result['success'])
+        self.assertTrue(result['cached'])
+        transcribe_file.assert_not_called()
+        identify_delay.assert_not_called()
+
+        transcript = Transcript.objects.get(audio_file=self.audio_file)
+        self.assertEqual(transcript.full_text, self.source.full_text)
+        self.assertEqual(transcript.cache_key, self.source.cache_key)
+        self.assertEqual(
+            list(transcript.segments.order_by('start_time').values_list('text', 'speaker_id')),
+            [("第一段", "speaker_1"), ("第二段", "speaker_0")]
+        )
+        self.audio_file.refresh_from_db()
+        self.assertEqual(self.audio_file.processing_status, 'completed')
+
+    def test_edited_transcript_not_shared_with_other_users(self):
+        """測試人工修改過的轉錄結果不會被其他使用者或後續上傳複製"""
+        other_user = User.objects.create_user(username='otheruser', password='password123')
+        other_audio = AudioFile.objects.create(title='他人上傳', file='lecture_other.wav', user=other_user,
+                                               duration=60, content_hash=self.audio_file.content_hash)
+        segment = self.source.segments.get(start_time=0.0)
+        segment.text = "王老師的修正"
+        segment.speaker_name = "王老師"
+        segment.is_manually_edited = True
+        segment.save()
+        self.source.full_text = "王老師的修正 第二段"
+        self.source.save()
+
+        self.assertIsNone(Transcript.find_cached(self.source.cache_key, other_user.id,
+                                                 exclude_audio_file_id=other_audio.id))
+        self.assertIsNone(Transcript.find_cached(self.source.cache_key, self.user.id,
+                                                 exclude_audio_file_id=self.audio_file.id))
+
+    def test_clone_copies_machine_output_only(self):
+        """測試複製時不帶入講者名稱與修改過的完整文本"""
+        from .tasks import clone_cached_transcript
+
+        self.source.segments.filter(start_time=0.0).update(speaker_name="王老師")
+        self.source.full_text = "管理後台修改的文本"
+        self.source.save()
+
+        cached = Transcript.find_cached(self.source.cache_key, self.user.id, exclude_audio_file_id=self.audio_file.id)
+        self.assertEqual(cached, self.source)
+        transcript = clone_cached_transcript(self.audio_file, cached, self.source.cache_key, 'vosk')
+
+        self.assertEqual(transcript.full_text, "第一段 第二段")
+        self.assertFalse(transcript.segments.exclude(speaker_name=None).exists())
+        self.assertFalse(transcript.segments.filter(is_manually_edited=True).exists())
+
+
+class PipelineMetricsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.audio_file = AudioFile.objects.create(title='測試音訊', file='lecture.wav', user=self.user, duration=120)
+
+    @override_settings(TRANSCRIPTION_CACHE_ENABLED=False, ENABLE_SPEAKER_RECOGNITION=False)
+    def test_transcription_records_stage_timings(self):
+        from .tasks import transcribe_audio_file
+
+        transcription = {
+            "success": True,
+            "data": {
+                "text": "第一段", "language": "zh-TW", "duration": 120.0, "skipped_seconds": 0.0,
+                "segments": [{"start": 0.0, "end": 1.0, "text": "第一段"}],
+                "stage_timings": {"decode": 0.5, "vad": 0.1, "recognition": 2.0},
+            },
+        }
+        with mock.patch('apps.audio_manager.tasks.QuotaManager.reserve_quota', return_value=(True, '', None)), \
+                mock.patch('apps.audio_manager.tasks.QuotaManager.commit_quota'), \
+                mock.patch('apps.audio_manager.tasks.select_transcriber_type', return_value='vosk'), \
+                mock.patch('apps.audio_manager.tasks.os.path.exists', return_value=True), \
+                mock.patch('core.audio.transcriber.VoskTranscriber.initialize', return_value={"success": True}), \
+                mock.patch('core.audio.transcriber.VoskTranscriber.transcribe_file', return_value=transcription):
+            result = transcribe_audio_file.apply(args=(self.audio_file.id,)).get()
+
+        self.assertTrue(result['success'])
+        transcript = Transcript.objects.get(audio_file=self.audio_file)
+        self.assertEqual(
+            set(transcript.stage_timings),
+            {'decode', 'vad', 'recognition', 'db_write', 'quota_log'}
+        )
+        self.assertEqual(transcript.stage_timings['recognition'], 2.0)
+        self.assertIsNotNone(transcript.processing_time)
+        self.assertGreater(transcript.peak_memory_mb, 0)
+        self.assertGreater(transcript.audio_seconds_per_second, 0)
+
+    def test_metrics_endpoint_local_only(self):
+        Transcript.objects.create(
+            audio_file=self.audio_file, full_text="測試", processing_method="vosk", is_processed=True,
+            processing_time=3.0, stage_timings={"decode": 0.5, "recognition": 2.0},
+            peak_memory_mb=512.0, audio_seconds_per_second=40.0
+        )
+        AudioFile.objects.filter(id=self.audio_file.id).update(stage_timings={"metadata_probe": 0.01})
+
+        response = self.client.get('/audio/metrics/')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode('utf-8')
+        self.assertIn('audio_pipeline_stage_seconds_count{stage="decode"} 1', body)
+        self.assertIn('audio_pipeline_stage_seconds{stage="metadata_probe",quantile="0.5"} 0.01', body)
+        self.assertIn('audio_pipeline_peak_rss_megabytes_sum 512', body)
+        self.assertIn('audio_pipeline_audio_seconds_per_second{quantile="0.5"} 40', body)
+
+        self.assertEqual(self.client.get('/audio/metrics/', REMOTE_ADDR='10.0.0.8').status_code, 404)
+        self.assertEqual(self.client.get('/audio/metrics/', HTTP_X_FORWARDED_FOR='203.0.113.5').status_code, 404)
+
+
+class TaskRoutingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+
+    def route(self, task_name, duration, plan='free'):
+        from teaching_platform.celery import route_audio_task
+
+        self.user.profile.subscription_plan = plan
+        self.user.profile.save()
+        audio_file = AudioFile.objects.create(title='測試音訊', file='lecture.wav', user=self.user, duration=duration)
+        return route_audio_task(task_name, (audio_file.id,), {}, {})
+
+    def test_routes_by_workload(self):
+        from teaching_platform.celery import PROCESS_AUDIO_TASK, SPEAKER_TASK, TRANSCRIBE_TASK
+
+        self.assertEqual(self.route(PROCESS_AUDIO_TASK, 3600), {'queue': 'metadata'})
+        with mock.patch('apps.audio_manager.tasks.select_transcriber_type', return_value='vosk'):
+            self.assertEqual(self.route(TRANSCRIBE_TASK, 60), {'queue': 'short'})
+            self.assertEqual(self.route(TRANSCRIBE_TASK, 3 * 3600), {'queue': 'transcription'})
+        with mock.patch('apps.audio_manager.tasks.select_transcriber_type', return_value='whisper'):
+            self.assertEqual(self.route(TRANSCRIBE_TASK, 3600), {'queue': 'whisper'})
+        self.assertEqual(self.route(SPEAKER_TASK, 3 * 3600), {'queue': 'speaker'})
+        self.assertIsNone(self.route('teaching_platform.celery.debug_task', 60))
+
+    def test_chunk_task_routes_on_chosen_transcriber(self):
+        """測試分段任務依已選定的轉錄器路由，不以分段長度重新選擇"""
+        from teaching_platform.celery import CHUNK_TASK, route_audio_task
+
+        audio_file = AudioFile.objects.create(title='長錄音', file='lecture.wav', user=self.user, duration=1800)
+        # 免費方案：整個檔案（30 分鐘）選擇 Vosk，但 600 秒的分段本身會被選為 Whisper
+        with mock.patch('apps.audio_manager.tasks.select_transcriber_type',
+                        side_effect=lambda user_id, duration: 'vosk' if duration > 600 else 'whisper') as select:
+            self.assertEqual(route_audio_task(CHUNK_TASK, (audio_file.id, 1, 'vosk', 'zh-TW'), {}, {}),
+                             {'queue': 'transcription'})
+            self.assertEqual(route_audio_task(CHUNK_TASK, (audio_file.id,), {'transcriber_type': 'vosk'}, {}),
+                             {'queue': 'transcription'})
+        select.assert_not_called()
+
+    def test_premium_plan_uses_priority_lane(self):
+        from teaching_platform.celery import SPEAKER_TASK, TRANSCRIBE_TASK
+
+        self.assertEqual(self.route(TRANSCRIBE_TASK, 3 * 3600, plan='premium'), {'queue': 'priority'})
+        self.assertEqual(self.route(SPEAKER_TASK, 60, plan='premium'), {'queue': 'priority'})
+
+    def test_worker_profile_respects_command_line(self):
+        from types import SimpleNamespace
+        from teaching_platform import celery as celery_config
+
+        conf = SimpleNamespace()
+        options = {'queues': ['whisper'], 'concurrency': 4, 'time_limit': None, 'soft_time_limit': None}
+        with mock.patch.object(celery_config, 'worker_queues', set()), \
+                mock.patch('teaching_platform.celery.platform.system', return_value='Linux'):
+            celery_config.apply_worker_profile(conf=conf, options=options)
+
+        self.assertFalse(hasattr(conf, 'worker_concurrency'))
+        self.assertEqual(conf.task_soft_time_limit, celery_config.WORKER_PROFILES['whisper']['soft_time_limit'])
+        self.assertEqual(conf.task_time_limit, celery_config.WORKER_PROFILES['whisper']['time_limit'])
+
+
+@override_settings(
+    TRANSCRIPTION_CACHE_ENABLED=False, ENABLE_SPEAKER_RECOGNITION=False,
+    TRANSCRIPTION_CHUNK_SECONDS=600, TRANSCRIPTION_CHUNK_OVERLAP_SECONDS=15
+)
+class ChunkedTranscriptionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.audio_file = AudioFile.objects.create(title='測試音訊', file='lecture.wav', user=self.user, duration=1500)
+
+    @staticmethod
+    def fake_transcribe(audio_file, language=None, start=0.0, duration=None):
+        # 每個解碼範圍的開頭（重疊區）、中段與結尾各一個片段
+        end = start + (duration or 1500 - start)
+        segments = [
+            {"start": start + 1, "end": start + 3, "text": f"開頭{start:g}"},
+            {"start": start + 100, "end": start + 102, "text": f"中段{start:g}"},
+            {"start": end - 5, "end": end - 1, "text": f"結尾{start:g}"},
+        ]
+        return {"success": True, "data": {
+            "text": " ".join(segment["text"] for segment in segments), "segments": segments,
+            "language": language, "duration": end - start, "skipped_seconds": 0.0,
+            "stage_timings": {"decode": 0.1, "recognition": 1.0},
+        }}
+
+    def run_pipeline(self):
+        from teaching_platform.celery import app
+        from .tasks import transcribe_audio_file
+
+        # 以 eager 模式同步執行 chord 內的分段與合併任務
+        always_eager = app.conf.task_always_eager
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', always_eager)
+        with mock.patch('apps.audio_manager.tasks.QuotaManager.reserve_quota', return_value=(True, '', None)), \
+                mock.patch('apps.audio_manager.tasks.QuotaManager.commit_quota'), \
+                mock.patch('apps.audio_manager.tasks.select_transcriber_type', return_value='vosk'), \
+                mock.patch('apps.audio_manager.tasks.os.path.exists', return_value=True), \
+                mock.patch('core.audio.transcriber.VoskTranscriber.initialize', return_value={"success": True}), \
+                mock.patch('core.audio.transcriber.VoskTranscriber.transcribe_file', side_effect=self.fake_transcribe) as transcribe:
+            result = transcribe_audio_file.apply(args=(self.audio_file.id,)).get()
+        return result, transcribe
+
+    def test_only_unfinished_chunks_are_transcribed(self):
+        from .models import TranscriptionChunk
+
+        result, transcribe = self.run_pipeline()
+        self.assertTrue(result['success'])
+        self.assertEqual(transcribe.call_count, 3)
+        self.assertFalse(TranscriptionChunk.objects.filter(audio_file=self.audio_file).exists())
+
+        transcript = Transcript.objects.get(audio_file=self.audio_file)
+        texts = list(transcript.segments.order_by('start_time').values_list('text', flat=True))
+        # 重疊區內的片段只由中點所在的分段保留
+        self.assertEqual(texts, ['開頭0', '中段0', '中段585', '中段1185', '結尾1185'])
+
+        # 模擬分段 0 與 2 已完成、分段 1 在工作程序中斷時失敗
+        plan_key = 'vosk:vosk-model-zh-cn-0.22:zh-TW:600'
+        chunks = TranscriptionChunk.plan(self.audio_file, plan_key, 600)
+        self.assertEqual([(chunk.start_time, chunk.end_time) for chunk in chunks], [(0, 600), (600, 1200), (1200, None)])
+        for index, start in ((0, 10.0), (2, 1300.0)):
+            completed = {"text": "已完成", "segments": [{"start": start, "end": start + 2, "text": "已完成"}],
+                         "language": "zh-TW", "duration": 600, "skipped_seconds": 0.0,
+                         "stage_timings": {"recognition": 1.0}, "processing_time": 1.0}
+            TranscriptionChunk.objects.filter(audio_file=self.audio_file, index=index).update(status='completed', result=completed)
+        TranscriptionChunk.objects.filter(audio_file=self.audio_file, index=1).update(status='failed', error='worker lost')
+
+        result, transcribe = self.run_pipeline()
+        self.assertTrue(result['success'])
+        transcribe.assert_called_once()
+        self.assertEqual(transcribe.call_args.kwargs['start'], 585)
+        self.assertEqual(transcribe.call_args.kwargs['duration'], 630)
+        transcript.refresh_from_db()
+        self.assertEqual(transcript.full_text, '已完成 中段585 已完成')
+
+    def test_boundary_spanning_segments_not_duplicated(self):
+        """測試兩側分段各自辨識出跨越交界的片段時，依詞的時間戳記合併，不重複也不遺漏"""
+        self.audio_file.duration = 1100
+        self.audio_file.save()
+
+        def words(*items):
+            return [{"word": word, "start": start, "end": end} for word, start, end in items]
+
+        def segment(items):
+            return {"start": items[0]["start"], "end": items[-1]["end"],
+                    "text": " ".join(word["word"] for word in items), "words": items}
+
+        # 兩側的斷句位置不同，且都延伸到交界（600 秒）另一側
+        decoded = {
+            0.0: [segment(words(("今天", 590.0, 594.0), ("我們", 596.0, 599.0), ("上課", 601.0, 604.0), ("內容", 606.0, 610.0)))],
+            585.0: [
+                segment(words(("今天", 590.2, 594.1), ("我們", 596.1, 599.2), ("上課", 600.6, 603.9))),
+                segment(words(("內容", 606.1, 609.8), ("開始", 610.5, 611.0))),
+            ],
+        }
+
+        def fake_transcribe(audio_file, language=None, start=0.0, duration=None):
+            segments = decoded[start]
+            return {"success": True, "data": {
+                "text": " ".join(item["text"] for item in segments), "segments": segments,
+                "language": language, "duration": duration or 1100 - start, "skipped_seconds": 0.0,
+                "stage_timings": {"recognition": 1.0},
+            }}
+
+        self.fake_transcribe = fake_transcribe
+        result, transcribe = self.run_pipeline()
+
+        self.assertTrue(result['success'])
+        self.assertEqual(transcribe.call_count, 2)
+        transcript = Transcript.objects.get(audio_file=self.audio_file)
+        self.assertEqual(transcript.full_text, '今天 我們 上課 內容 開始')
+        self.assertEqual(
+            list(transcript.segments.order_by('start_time').values_list('text', 'start_time')),
+            [('今天 我們', 590.0), ('上課', 600.6), ('內容 開始', 606.1)]
+        )
+
+    def test_changed_plan_discards_checkpoints(self):
+        from .models import TranscriptionChunk
+
+        chunks = TranscriptionChunk.plan(self.audio_file, 'vosk:a:zh-TW:600', 600)
+        TranscriptionChunk.objects.filter(id=chunks[0].id).update(status='completed')
+
+        chunks = TranscriptionChunk.plan(self.audio_file, 'whisper:b:zh-TW:600', 600)
+        self.assertEqual({chunk.status for chunk in chunks}, {'pending'})
+        self.assertEqual(TranscriptionChunk.objects.filter(audio_file=self.audio_file).count(), 3)
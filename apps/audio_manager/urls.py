@@ -13,4 +13,5 @@ urlpatterns = [
     path('transcript/<int:transcript_id>/download/', views.download_transcript, name='download_transcript'),
     path('transcript/<int:transcript_id>/download-srt/', views.download_srt, name='download_srt'),
     path('transcript/<int:transcript_id>/download-vtt/', views.download_vtt, name='download_vtt'),
+    path('metrics/', views.pipeline_metrics, name='pipeline_metrics'),
 ]
\ No newline at end of file
@@ -309,4 +309,20 @@ def download_vtt(request, transcript_id):
     response = HttpResponse(vtt_content, content_type='text/vtt; charset=utf-8')
     response['Content-Disposition'] = f'attachment; filename="{safe_filename}"'
     
-    return response
\ No newline at end of file
+    return response
+
+@require_GET
+def pipeline_metrics(request):
+    """Prometheus 抓取端點，輸出音訊處理各階段耗時、峰值記憶體與處理速度（僅限本機存取）"""
+    from django.conf import settings
+    from .services import PipelineMetricsService
+    
+    # 經由反向代理轉送的請求一律拒絕，避免代理與應用程式同機時被視為本機請求
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    if request.META.get('REMOTE_ADDR') not in allowed_ips or 'HTTP_X_FORWARDED_FOR' in request.META:
+        raise Http404
+    
+    return HttpResponse(
+        PipelineMetricsService.render_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,6 @@
+"""
+效能基準測試。
+
+各腳本可在專案根目錄以 ``python -m benchmarks.<模組名稱>`` 離線執行。
+``run_suite`` 以合成樣本執行整個音訊處理流程的基準測試，並與儲存的基準結果比較。
+"""
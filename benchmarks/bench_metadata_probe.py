@@ -0,0 +1,130 @@
+"""
+音訊元數據探測效能基準。
+
+比較舊流程（完整複製檔案後以 pydub 解碼）與標頭探測（probe_audio_metadata）
+在大型檔案上的耗時與峰值記憶體。
+
+使用方式:
+    python -m benchmarks.bench_metadata_probe --size-mb 500 --format wav
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def create_fixture(path: Path, size_mb: int, sample_rate: int = 44100, channels: int = 2) -> None:
+    """以串流方式產生指定大小的 16-bit PCM WAV 檔案"""
+    rng = np.random.default_rng(0)
+    block = (rng.standard_normal(sample_rate * channels) * 3000).astype(np.int16).tobytes()
+    target_bytes = size_mb * 1024 * 1024
+
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        written = 0
+        while written < target_bytes:
+            wf.writeframes(block)
+            written += len(block)
+
+
+def legacy_metadata(path: str) -> dict:
+    """舊流程：將整個檔案複製到臨時檔案，再以 pydub 完整解碼"""
+    from pydub import AudioSegment
+
+    suffix = Path(path).suffix
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        temp_path = temp_file.name
+        with open(path, "rb") as src_file:
+            temp_file.write(src_file.read())
+    try:
+        audio = AudioSegment.from_file(temp_path)
+        return {"duration": len(audio) / 1000, "sample_rate": audio.frame_rate, "channels": audio.channels}
+    finally:
+        os.unlink(temp_path)
+
+
+def header_probe_metadata(path: str) -> dict:
+    """新流程：只讀取容器標頭"""
+    from core.audio.metadata import probe_audio_metadata
+
+    return probe_audio_metadata(path)["data"]
+
+
+def _measure(func_name: str, path: str, queue: multiprocessing.Queue) -> None:
+    """在獨立子程序中執行，回報耗時與峰值 RSS"""
+    func = globals()[func_name]
+    start = time.perf_counter()
+    result = func(path)
+    elapsed = time.perf_counter() - start
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, peak_rss_kb, result))
+
+
+def run_isolated(func_name: str, path: str) -> tuple:
+    """以子程序執行測量，避免不同流程互相影響峰值記憶體"""
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure, args=(func_name, path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="音訊元數據探測效能基準")
+    parser.add_argument("--size-mb", type=int, default=500, help="測試檔案大小（MB）")
+    parser.add_argument("--format", choices=["wav", "mp3", "flac"], default="wav", help="測試檔案格式")
+    parser.add_argument("--repeat", type=int, default=3, help="每種流程的重複次數")
+    parser.add_argument("--skip-legacy", action="store_true", help="不執行舊流程")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_metadata_"))
+    try:
+        fixture = work_dir / "fixture.wav"
+        print(f"產生 {args.size_mb} MB 測試檔案...")
+        create_fixture(fixture, args.size_mb)
+
+        if args.format != "wav":
+            encoded = work_dir / f"fixture.{args.format}"
+            subprocess.run(
+                [os.environ.get("FFMPEG_BINARY", "ffmpeg"), "-loglevel", "error", "-y", "-i", str(fixture), str(encoded)],
+                check=True
+            )
+            fixture.unlink()
+            fixture = encoded
+
+        print(f"測試檔案: {fixture.name}, {fixture.stat().st_size / (1024 * 1024):.1f} MB")
+
+        variants = ["header_probe_metadata"] if args.skip_legacy else ["legacy_metadata", "header_probe_metadata"]
+        for variant in variants:
+            timings = []
+            peak_rss_kb = 0
+            result = None
+            for _ in range(args.repeat):
+                elapsed, rss_kb, result = run_isolated(variant, str(fixture))
+                timings.append(elapsed)
+                peak_rss_kb = max(peak_rss_kb, rss_kb)
+            print(
+                f"{variant:<24} 最佳 {min(timings) * 1000:10.1f} ms  "
+                f"平均 {sum(timings) / len(timings) * 1000:10.1f} ms  "
+                f"峰值 RSS {peak_rss_kb / 1024:8.1f} MB  結果 {result}"
+            )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
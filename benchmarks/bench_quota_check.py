@@ -0,0 +1,110 @@
+"""
+配額檢查效能基準。
+
+在大量使用日誌下比較舊流程（每次對本月 UsageLog 做 COUNT）與月度計數單點查詢的每次耗時，
+並量測 UsageCounter.rebuild 從日誌重算計數所需時間。日誌平均分散在 --users 位使用者、
+五種服務與最近 --months 個月。
+需要可連線的資料庫（使用專案設定的後端，測試資料庫會自動建立與刪除）。
+
+使用方式:
+    python -m benchmarks.bench_quota_check --rows 10000000 --users 1000 --checks 2000
+"""
+import argparse
+import datetime
+import random
+import time
+
+from benchmarks.django_env import benchmark_database
+
+
+def populate(user_ids: list, rows: int, months: int, batch_size: int) -> None:
+    """批次寫入模擬的使用日誌"""
+    from django.utils import timezone
+    from apps.accounts.models import UsageLog
+
+    rng = random.Random(0)
+    services = [choice for choice, _ in UsageLog.SERVICE_TYPES]
+    now = timezone.now()
+    span = datetime.timedelta(days=30 * months).total_seconds()
+
+    written = 0
+    while written < rows:
+        count = min(batch_size, rows - written)
+        UsageLog.objects.bulk_create([
+            UsageLog(
+                user_id=rng.choice(user_ids),
+                service_type=rng.choice(services),
+                operation="bench",
+                tokens_used=rng.randint(0, 2000),
+                audio_duration=rng.uniform(60, 3600),
+                created_at=now - datetime.timedelta(seconds=rng.uniform(0, span))
+            )
+            for _ in range(count)
+        ])
+        written += count
+        print(f"\r已寫入 {written}/{rows} 筆日誌", end="", flush=True)
+    print()
+
+
+def legacy_count(user_id: int, service_type: str) -> int:
+    """舊流程：對本月的使用日誌計數"""
+    from django.utils import timezone
+    from apps.accounts.models import UsageLog
+
+    now = timezone.localtime()
+    month_begin = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return UsageLog.objects.filter(
+        user_id=user_id,
+        service_type=service_type,
+        created_at__gte=month_begin
+    ).count()
+
+
+def time_per_call(user_ids: list, checks: int, run) -> float:
+    """以固定順序呼叫 checks 次，返回平均每次耗時（毫秒）"""
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for _ in range(checks):
+        run(rng.choice(user_ids))
+    return (time.perf_counter() - start) / checks * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="配額檢查效能基準")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="使用日誌筆數")
+    parser.add_argument("--users", type=int, default=1000, help="使用者人數")
+    parser.add_argument("--months", type=int, default=12, help="日誌分散的月數")
+    parser.add_argument("--checks", type=int, default=2000, help="每種流程的查詢次數")
+    parser.add_argument("--batch-size", type=int, default=10000, help="寫入日誌的每批筆數")
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from django.contrib.auth import get_user_model
+        from apps.accounts.models import UsageCounter, UserProfile
+        from core.payment.quota import QuotaManager, ServiceType
+
+        User = get_user_model()
+        User.objects.bulk_create([User(username=f"bench{i}") for i in range(args.users)])
+        user_ids = list(User.objects.values_list("id", flat=True))
+        # bulk_create 不會觸發建立配置檔的信號
+        UserProfile.objects.bulk_create([UserProfile(user_id=user_id) for user_id in user_ids])
+
+        populate(user_ids, args.rows, args.months, args.batch_size)
+
+        start = time.perf_counter()
+        counters = UsageCounter.rebuild()
+        print(f"rebuild（所有月份）  {counters} 筆計數  {time.perf_counter() - start:8.2f} 秒")
+
+        service = ServiceType.RAG_SEARCH.value
+        variants = [
+            ("COUNT(UsageLog)", lambda user_id: legacy_count(user_id, service)),
+            ("UsageCounter", lambda user_id: UsageCounter.get_count(user_id, service)),
+            ("check_quota", lambda user_id: QuotaManager.check_quota(user_id, ServiceType.RAG_SEARCH)),
+        ]
+        for name, run in variants:
+            per_call = time_per_call(user_ids, args.checks, run)
+            print(f"{name:<16} {args.checks} 次  {per_call:8.3f} 毫秒/次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+轉錄片段寫入效能基準。
+
+比較逐筆 TranscriptSegment.objects.create 與 replace_transcript_segments 批次寫入的每秒筆數。
+需要可連線的資料庫（使用專案設定的後端，測試資料庫會自動建立與刪除）。
+
+使用方式:
+    python -m benchmarks.bench_segment_persistence --segments 10000 --batch-size 1000
+"""
+import argparse
+import time
+
+from benchmarks.django_env import benchmark_database
+
+
+def make_segments(count: int) -> list:
+    """產生模擬的轉錄片段"""
+    return [
+        {
+            "start": i * 2.0,
+            "end": i * 2.0 + 1.8,
+            "text": f"這是第 {i} 個測試片段，用於量測寫入效能。",
+            "speaker_id": None,
+            "confidence": 1.0
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_save(transcript, segments) -> None:
+    """舊流程：刪除後逐筆建立"""
+    from django.db import transaction
+    from apps.audio_manager.models import TranscriptSegment
+
+    with transaction.atomic():
+        transcript.segments.all().delete()
+        for i, segment in enumerate(segments):
+            TranscriptSegment.objects.create(
+                transcript=transcript,
+                start_time=segment["start"],
+                end_time=segment["end"],
+                text=segment["text"],
+                speaker_id=segment.get("speaker_id") or f"speaker_{i % 2}",
+                speaker_name=None,
+                confidence=segment.get("confidence", 1.0)
+            )
+
+
+def bulk_save(transcript, segments, batch_size: int) -> None:
+    """新流程：單一 DELETE 後批次寫入"""
+    from django.db import transaction
+    from apps.audio_manager.models import TranscriptSegment
+
+    with transaction.atomic():
+        TranscriptSegment.replace_transcript_segments(transcript, segments, batch_size=batch_size)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="轉錄片段寫入效能基準")
+    parser.add_argument("--segments", type=int, default=10000, help="片段數量")
+    parser.add_argument("--batch-size", type=int, default=1000, help="批次寫入的每批筆數")
+    parser.add_argument("--skip-legacy", action="store_true", help="不執行逐筆寫入流程")
+    args = parser.parse_args()
+
+    with benchmark_database():
+        from django.contrib.auth import get_user_model
+        from apps.audio_manager.models import AudioFile, Transcript
+
+        user = get_user_model().objects.create_user(username="bench", password="bench-password")
+        audio_file = AudioFile.objects.create(title="bench", file="bench.wav", user=user)
+        transcript = Transcript.objects.create(audio_file=audio_file, full_text="", processing_method="vosk")
+        segments = make_segments(args.segments)
+
+        variants = [("bulk_create", lambda: bulk_save(transcript, segments, args.batch_size))]
+        if not args.skip_legacy:
+            variants.insert(0, ("逐筆 create", lambda: legacy_save(transcript, segments)))
+
+        for name, run in variants:
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            assert transcript.segments.count() == args.segments
+            print(f"{name:<12} {args.segments} 筆  {elapsed:8.2f} 秒  {args.segments / elapsed:12.0f} 筆/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+講者標籤分配效能基準。
+
+以合成片段量測聚類後的講者分配（含未提取特徵片段的最近講者搜尋）耗時，
+不需要音訊檔案或資料庫。
+
+使用方式:
+    python -m benchmarks.bench_speaker_assignment --segments 20000 --unlabeled-ratio 0.3
+"""
+import argparse
+import random
+import time
+
+from core.audio.speaker_recognition import SimpleSpeakerRecognizer
+
+
+def make_segments(count: int) -> list:
+    """產生模擬的轉錄片段"""
+    return [
+        {
+            "start": i * 2.0,
+            "end": i * 2.0 + 1.8,
+            "text": f"片段 {i}",
+            "speaker_id": None,
+            "confidence": 1.0
+        }
+        for i in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="講者標籤分配效能基準")
+    parser.add_argument("--segments", type=int, default=20000, help="片段數量")
+    parser.add_argument("--unlabeled-ratio", type=float, default=0.3, help="未能提取特徵的片段比例")
+    parser.add_argument("--speakers", type=int, default=4, help="講者數量")
+    parser.add_argument("--seed", type=int, default=0, help="亂數種子")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    segments = make_segments(args.segments)
+    labeled_indices = sorted(rng.sample(range(args.segments), int(args.segments * (1 - args.unlabeled_ratio))))
+    speaker_ids = [f"speaker_{rng.randrange(args.speakers)}" for _ in labeled_indices]
+
+    recognizer = SimpleSpeakerRecognizer()
+    started = time.perf_counter()
+    result = recognizer._assign_speakers(segments, labeled_indices, speaker_ids)
+    elapsed = time.perf_counter() - started
+
+    assert len(result) == len(segments)
+    print(f"片段數: {args.segments}，已標記: {len(labeled_indices)}，"
+          f"未標記: {args.segments - len(labeled_indices)}")
+    print(f"講者分配耗時: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
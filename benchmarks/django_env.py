@@ -0,0 +1,32 @@
+"""
+基準測試用的 Django 環境工具。
+
+在設定的資料庫後端上建立獨立的測試資料庫，結束後自動刪除，不影響正式資料。
+"""
+import contextlib
+import os
+import sys
+from pathlib import Path
+from typing import Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@contextlib.contextmanager
+def benchmark_database(verbosity: int = 0) -> Iterator[None]:
+    """初始化 Django 並建立暫時的測試資料庫"""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "teaching_platform.settings")
+
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
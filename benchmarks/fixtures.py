@@ -0,0 +1,184 @@
+"""
+基準測試用的合成音訊樣本。
+
+以固定亂數種子合成多位講者輪流發言的類語音訊號（各講者基頻不同的諧波 + 約每秒 4 個音節的振幅包絡），
+並可選擇加入下課、分組討論等長靜音。相同的參數一定產生相同的檔案與對應的標準答案片段，
+檔案以串流方式寫入磁碟，產生 3 小時樣本時的記憶體用量與時長無關。
+"""
+import random
+import tempfile
+import wave
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from utils.type_definitions import AudioSegment
+
+# 合成方式改變時遞增，讓快取的舊樣本失效
+FIXTURE_VERSION = 1
+
+SAMPLE_RATE = 16000
+
+# 樣本長度名稱對應的秒數
+FIXTURE_SIZES: Dict[str, float] = {"1m": 60.0, "30m": 1800.0, "3h": 10800.0}
+
+# 樣本種類: speech 為連續發言，pauses 額外加入長靜音
+FIXTURE_VARIANTS = ("speech", "pauses")
+
+# 各講者的基頻（Hz），讓講者辨識可區分不同講者
+SPEAKER_PITCHES = (115.0, 205.0, 290.0, 165.0)
+
+# 背景噪音振幅（int16），約 -61 dBFS，低於 VAD 的靜音門檻
+NOISE_AMPLITUDE = 30.0
+
+DEFAULT_FIXTURE_DIR = Path(tempfile.gettempdir()) / "teaching_platform_bench_fixtures"
+
+
+@dataclass(frozen=True)
+class FixtureSpec:
+    """合成樣本的參數"""
+    size: str
+    variant: str = "speech"
+    speakers: int = 3
+    seed: int = 0
+
+    @property
+    def duration(self) -> float:
+        return FIXTURE_SIZES[self.size]
+
+    @property
+    def long_pauses(self) -> bool:
+        return self.variant == "pauses"
+
+    @property
+    def name(self) -> str:
+        return f"{self.variant}_{self.size}_{self.speakers}spk"
+
+    @property
+    def filename(self) -> str:
+        return f"{self.name}_seed{self.seed}_v{FIXTURE_VERSION}.wav"
+
+
+def build_schedule(spec: FixtureSpec) -> List[AudioSegment]:
+    """
+    產生樣本中各句語音的時間表，同時作為講者辨識、字幕與寫入測試的標準答案片段
+
+    參數:
+        spec: 樣本參數
+
+    返回:
+        依時間排序的片段列表，speaker_id 為實際發言的講者
+    """
+    rng = random.Random(spec.seed)
+    end_limit = spec.duration - 0.5
+    segments: List[AudioSegment] = []
+    current = 0.5
+    speaker = 0
+
+    while current < end_limit:
+        # 同一位講者連續說 1~4 句
+        for _ in range(rng.randint(1, 4)):
+            length = rng.uniform(2.0, 7.0)
+            end = min(current + length, end_limit)
+            if end - current < 1.0:
+                break
+            segments.append({
+                "start": round(current, 3),
+                "end": round(end, 3),
+                "text": f"第 {len(segments) + 1} 句，講者 {speaker + 1} 的合成語音",
+                "speaker_id": f"speaker_{speaker}",
+                "confidence": 1.0
+            })
+            current = end + rng.uniform(0.3, 0.8)
+
+        # 換人發言前的停頓，pauses 樣本偶爾出現長靜音
+        current += rng.uniform(0.5, 1.5)
+        if spec.long_pauses and rng.random() < 0.08:
+            current += rng.uniform(20.0, 120.0)
+        if spec.speakers > 1:
+            speaker = rng.choice([s for s in range(spec.speakers) if s != speaker])
+
+    return segments
+
+
+def _synthesize_voice(rng: np.random.Generator, sample_count: int, pitch: float) -> np.ndarray:
+    """合成一句類語音訊號（浮點，振幅約在 ±0.35）"""
+    t = np.arange(sample_count) / SAMPLE_RATE
+    # 緩慢變化的音高與約每秒 4 個音節的振幅起伏
+    f0 = pitch * (1.0 + 0.04 * np.sin(2 * np.pi * rng.uniform(0.3, 0.9) * t + rng.uniform(0, 2 * np.pi)))
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    signal = np.zeros(sample_count)
+    for harmonic, amplitude in enumerate((1.0, 0.6, 0.35, 0.2, 0.1), start=1):
+        signal += amplitude * np.sin(harmonic * phase)
+    syllables = 0.5 * (1 - np.cos(2 * np.pi * rng.uniform(3.5, 4.5) * t))
+    # 句首句尾淡入淡出，避免爆音
+    fade = min(sample_count // 2, int(0.05 * SAMPLE_RATE))
+    ramp = np.ones(sample_count)
+    if fade:
+        ramp[:fade] = np.linspace(0, 1, fade)
+        ramp[-fade:] = np.linspace(1, 0, fade)
+    return signal * syllables * ramp * 0.15
+
+
+def _iter_pcm_blocks(spec: FixtureSpec, segments: List[AudioSegment], block_seconds: float = 10.0) -> Iterator[bytes]:
+    """依時間表逐塊產生 16-bit PCM"""
+    rng = np.random.default_rng(spec.seed)
+    total_samples = int(spec.duration * SAMPLE_RATE)
+    block_samples = int(block_seconds * SAMPLE_RATE)
+    position = 0
+
+    def noise(count: int) -> np.ndarray:
+        return rng.standard_normal(count) * NOISE_AMPLITUDE
+
+    def to_pcm(samples: np.ndarray) -> bytes:
+        return np.clip(samples, -32768, 32767).astype(np.int16).tobytes()
+
+    for segment in segments:
+        start = int(segment["start"] * SAMPLE_RATE)
+        end = int(segment["end"] * SAMPLE_RATE)
+        while position < start:
+            count = min(block_samples, start - position)
+            yield to_pcm(noise(count))
+            position += count
+
+        pitch = SPEAKER_PITCHES[int(segment["speaker_id"].rsplit("_", 1)[1]) % len(SPEAKER_PITCHES)]
+        voice = _synthesize_voice(rng, end - start, pitch) * 32767
+        yield to_pcm(voice + noise(end - start))
+        position = end
+
+    while position < total_samples:
+        count = min(block_samples, total_samples - position)
+        yield to_pcm(noise(count))
+        position += count
+
+
+def write_fixture(spec: FixtureSpec, path: Path) -> List[AudioSegment]:
+    """
+    將合成樣本以串流方式寫為 16kHz 單聲道 WAV
+
+    返回:
+        樣本的標準答案片段
+    """
+    segments = build_schedule(spec)
+    temp_path = path.with_suffix(".partial")
+    with wave.open(str(temp_path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        for block in _iter_pcm_blocks(spec, segments):
+            wf.writeframes(block)
+    # 寫入完成才改名，中斷時不會留下不完整的快取
+    temp_path.replace(path)
+    return segments
+
+
+def ensure_fixture(spec: FixtureSpec, fixture_dir: Path = DEFAULT_FIXTURE_DIR) -> Path:
+    """取得樣本檔案路徑，快取目錄中不存在時才合成"""
+    fixture_dir = Path(fixture_dir)
+    fixture_dir.mkdir(parents=True, exist_ok=True)
+    path = fixture_dir / spec.filename
+    if not path.exists():
+        write_fixture(spec, path)
+    return path
@@ -0,0 +1,118 @@
+"""
+課堂即時字幕負載產生器。
+
+同時開啟多個 WebSocket 連線，將 WAV 檔案解碼為 PCM 後以實際播放速度送出，
+量測每則字幕訊息相對於最近送出音訊訊框的延遲，用於評估單一 ASGI 工作程序
+可同時服務的教室數量。
+
+使用方式:
+    uvicorn teaching_platform.asgi:application --workers 1
+    python -m benchmarks.live_caption_load --url ws://127.0.0.1:8000/ws/live-caption/ \\
+        --connections 40 --cookie "sessionid=<已登入的 session>" lecture1.wav lecture2.wav
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+import websockets
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.audio.decoder import FFmpegPCMDecoder  # noqa: E402
+from utils.metrics import percentile  # noqa: E402
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+
+def load_pcm(path: str) -> bytes:
+    """將音訊檔案解碼為 16kHz 單聲道 PCM"""
+    return b"".join(FFmpegPCMDecoder(path, sample_rate=SAMPLE_RATE))
+
+
+async def run_connection(url: str, pcm: bytes, frame_ms: int, cookie: str, stats: Dict) -> None:
+    """以實際播放速度送出一段 PCM，並記錄字幕延遲"""
+    frame_bytes = SAMPLE_RATE * SAMPLE_WIDTH * frame_ms // 1000
+    last_sent = {"time": time.perf_counter()}
+    headers = {"Cookie": cookie} if cookie else None
+
+    try:
+        async with websockets.connect(url, additional_headers=headers, max_size=None) as socket:
+            async def receive_captions():
+                async for raw in socket:
+                    message = json.loads(raw)
+                    if message["type"] in ("partial", "final"):
+                        stats["latencies"].append(time.perf_counter() - last_sent["time"])
+                        stats[message["type"]] += 1
+                    elif message["type"] == "error":
+                        stats["errors"] += 1
+
+            receiver = asyncio.create_task(receive_captions())
+            started = time.perf_counter()
+            for index, offset in enumerate(range(0, len(pcm), frame_bytes)):
+                # 依播放時間排程，避免累積誤差
+                delay = started + index * frame_ms / 1000 - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await socket.send(pcm[offset:offset + frame_bytes])
+                last_sent["time"] = time.perf_counter()
+
+            await socket.send(json.dumps({"type": "stop"}))
+            await receiver
+            stats["completed"] += 1
+    except Exception as e:
+        stats["failed"] += 1
+        print(f"連線失敗: {e}", file=sys.stderr)
+
+
+async def run_load(args) -> Dict:
+    pcm_sources = [load_pcm(path) for path in args.wav]
+    if args.seconds:
+        limit = int(args.seconds * SAMPLE_RATE) * SAMPLE_WIDTH
+        pcm_sources = [pcm[:limit] for pcm in pcm_sources]
+
+    stats = {"latencies": [], "partial": 0, "final": 0, "errors": 0, "completed": 0, "failed": 0}
+    tasks = []
+    for index in range(args.connections):
+        tasks.append(asyncio.create_task(run_connection(
+            args.url, pcm_sources[index % len(pcm_sources)], args.frame_ms, args.cookie, stats
+        )))
+        # 錯開連線時間，模擬各教室陸續開始上課
+        await asyncio.sleep(args.ramp / max(1, args.connections))
+    await asyncio.gather(*tasks)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="課堂即時字幕負載測試")
+    parser.add_argument("wav", nargs="+", help="要重播的音訊檔案，連線依序輪流使用")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws/live-caption/?sample_rate=16000")
+    parser.add_argument("--connections", type=int, default=10, help="同時連線數")
+    parser.add_argument("--frame-ms", type=int, default=100, help="每個音訊訊框的長度（毫秒）")
+    parser.add_argument("--seconds", type=float, default=0, help="每個連線最多重播的秒數，0 表示完整檔案")
+    parser.add_argument("--ramp", type=float, default=5.0, help="所有連線建立完成所需的秒數")
+    parser.add_argument("--cookie", default="", help="已登入使用者的 Cookie 標頭")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    stats = asyncio.run(run_load(args))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(stats["latencies"])
+    print(f"連線數: {args.connections}（完成 {stats['completed']}，失敗 {stats['failed']}）")
+    print(f"總耗時: {elapsed:.1f} 秒")
+    print(f"字幕訊息: partial {stats['partial']} 則, final {stats['final']} 則, 錯誤 {stats['errors']} 則")
+    print(
+        "字幕延遲 p50/p95/p99: "
+        f"{percentile(latencies, 0.5) * 1000:.0f}/"
+        f"{percentile(latencies, 0.95) * 1000:.0f}/"
+        f"{percentile(latencies, 0.99) * 1000:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
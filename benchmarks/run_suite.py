@@ -0,0 +1,364 @@
+"""
+音訊處理流程基準測試套件。
+
+以 benchmarks.fixtures 合成的固定樣本（1 分鐘、30 分鐘、3 小時；連續發言與含長靜音；多位講者）
+量測元數據探測、格式轉換、Vosk 轉錄、講者辨識、SRT 產生與片段寫入的處理速度與峰值記憶體，
+並與儲存的基準結果比較，處理速度下降或峰值記憶體上升超過容許比例時以非零狀態碼結束。
+
+每個測試項目在獨立的子程序（spawn）中執行，峰值記憶體只反映該項目本身。
+需要資料庫的項目會在設定的後端上建立暫時的測試資料庫。
+
+使用方式:
+    python -m benchmarks.run_suite --sizes 1m,30m --save-baseline
+    python -m benchmarks.run_suite --sizes 1m,30m --vosk-model models/vosk/vosk-model-small-cn-0.22
+    python -m benchmarks.run_suite --cases speakers,srt --sizes 3h --variants pauses --tolerance 0.15
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fixtures import (  # noqa: E402
+    DEFAULT_FIXTURE_DIR, FIXTURE_SIZES, FIXTURE_VARIANTS, FixtureSpec, build_schedule, ensure_fixture
+)
+from utils.metrics import peak_rss_mb, reset_peak_rss  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+DEFAULT_VOSK_MODEL = Path(__file__).resolve().parent.parent / "models" / "vosk" / "vosk-model-small-cn-0.22"
+
+
+class BenchmarkSkipped(Exception):
+    """測試項目在目前環境無法執行（例如缺少模型）"""
+
+
+class Measurement:
+    """量測單一測試項目的耗時與峰值記憶體，只計算 measure() 區塊內的部分"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.peak_rss_mb = 0.0
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        # 重設峰值記錄，排除匯入模組與建立測試資料庫等準備工作
+        reset_peak_rss()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.peak_rss_mb = max(self.peak_rss_mb, peak_rss_mb())
+
+
+def _check(result: dict) -> None:
+    """ServiceResult 失敗時中止該項目"""
+    if not result["success"]:
+        raise RuntimeError(result.get("error", "未知錯誤"))
+
+
+def _plain_segments(segments: List[dict]) -> List[dict]:
+    """移除標準答案中的講者標籤，模擬轉錄器輸出的片段"""
+    return [{**segment, "speaker_id": None} for segment in segments]
+
+
+def bench_metadata(path: Path, spec: FixtureSpec, segments: List[dict], options: dict, measurement: Measurement) -> Tuple[float, str, dict]:
+    """process_audio_metadata：探測容器標頭並寫回 AudioFile"""
+    from benchmarks.django_env import benchmark_database
+
+    with benchmark_database():
+        from django.contrib.auth import get_user_model
+        from django.test import override_settings
+        from apps.audio_manager.models import AudioFile
+        from apps.audio_manager.tasks import process_audio_metadata
+
+        user = get_user_model().objects.create_user(username="bench", password="bench-password")
+        with override_settings(MEDIA_ROOT=str(path.parent)):
+            audio_file = AudioFile.objects.create(title="bench", file=path.name, format="wav", user=user)
+            with measurement.measure():
+                assert process_audio_metadata(audio_file)
+
+    return spec.duration, "音訊秒", {}
+
+
+def bench_convert(path: Path, spec: FixtureSpec, segments: List[dict], options: dict, measurement: Measurement) -> Tuple[float, str, dict]:
+    """AudioConverter.convert_format：WAV 轉為 16kHz 單聲道 MP3"""
+    from core.audio.converter import AudioConverter
+
+    output_dir = Path(tempfile.mkdtemp(prefix="bench_convert_"))
+    try:
+        with measurement.measure():
+            _check(AudioConverter.convert_format(path, "mp3", output_dir / "output.mp3", sample_rate=16000, channels=1))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return spec.duration, "音訊秒", {}
+
+
+def bench_vosk(path: Path, spec: FixtureSpec, segments: List[dict], options: dict, measurement: Measurement) -> Tuple[float, str, dict]:
+    """VoskTranscriber.transcribe_file：以小型模型轉錄（含 VAD 與解碼）"""
+    model_path = options["vosk_model"]
+    if not os.path.isdir(model_path):
+        # 不自動下載，基準測試必須可離線執行
+        raise BenchmarkSkipped(f"找不到 Vosk 模型: {model_path}")
+
+    from core.audio.transcriber import VoskTranscriber
+
+    transcriber = VoskTranscriber(model_path=model_path)
+    _check(transcriber.initialize())
+    with measurement.measure():
+        result = transcriber.transcribe_file(path)
+    _check(result)
+
+    return spec.duration, "音訊秒", {
+        "segments": len(result["data"]["segments"]),
+        "skipped_seconds": round(result["data"].get("skipped_seconds", 0.0), 1),
+    }
+
+
+def bench_speakers(path: Path, spec: FixtureSpec, segments: List[dict], options: dict, measurement: Measurement) -> Tuple[float, str, dict]:
+    """SimpleSpeakerRecognizer.identify_speakers：以標準答案片段進行講者辨識"""
+    from core.audio.speaker_recognition import SimpleSpeakerRecognizer
+
+    recognizer = SimpleSpeakerRecognizer()
+    _check(recognizer.initialize())
+    with measurement.measure():
+        result = recognizer.identify_speakers(path, _plain_segments(segments))
+    _check(result)
+
+    speakers = {segment.get("speaker_id") for segment in result["data"]}
+    return spec.duration, "音訊秒", {"speakers": len(speakers)}
+
+
+def bench_srt(path: Path, spec: FixtureSpec, segments: List[dict], options: dict, measurement: Measurement) -> Tuple[float, str, dict]:
+    """SRTGenerator.generate_from_segments：產生含講者標籤的字幕"""
+    from core.audio.srt import SRTGenerator
+
+    # 單次產生耗時很短，重複多次以降低計時誤差
+    rounds = 20
+    with measurement.measure():
+        for _ in range(rounds):
+            content = SRTGenerator.generate_from_segments(segments, include_speaker=True)
+
+    return len(segments) * rounds, "片段", {"srt_bytes": len(content.encode("utf-8"))}
+
+
+def bench_persistence(path: Path, spec: FixtureSpec, segments: List[dict], options: dict, measurement: Measurement) -> Tuple[float, str, dict]:
+    """TranscriptSegment.replace_transcript_segments：批次寫入轉錄片段"""
+    from benchmarks.bench_segment_persistence import bulk_save
+    from benchmarks.django_env import benchmark_database
+
+    with benchmark_database():
+        from django.contrib.auth import get_user_model
+        from apps.audio_manager.models import AudioFile, Transcript
+
+        user = get_user_model().objects.create_user(username="bench", password="bench-password")
+        audio_file = AudioFile.objects.create(title="bench", file=path.name, user=user)
+        transcript = Transcript.objects.create(audio_file=audio_file, full_text="", processing_method="vosk")
+        with measurement.measure():
+            bulk_save(transcript, segments, options["batch_size"])
+        assert transcript.segments.count() == len(segments)
+
+    return len(segments), "片段", {}
+
+
+CASES: Dict[str, Callable] = {
+    "metadata": bench_metadata,
+    "convert": bench_convert,
+    "vosk": bench_vosk,
+    "speakers": bench_speakers,
+    "srt": bench_srt,
+    "persistence": bench_persistence,
+}
+
+
+def _run_case(case: str, path: str, spec: FixtureSpec, options: dict, queue) -> None:
+    """在子程序中執行單一測試項目並回報結果"""
+    try:
+        measurement = Measurement()
+        amount, unit, extra = CASES[case](Path(path), spec, build_schedule(spec), options, measurement)
+        queue.put({
+            "seconds": measurement.seconds,
+            "throughput": amount / measurement.seconds if measurement.seconds else 0.0,
+            "unit": unit,
+            "peak_rss_mb": measurement.peak_rss_mb,
+            **extra,
+        })
+    except BenchmarkSkipped as e:
+        queue.put({"skipped": str(e)})
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_isolated(case: str, path: Path, spec: FixtureSpec, options: dict) -> dict:
+    """以全新的子程序執行測試項目，避免前一個項目影響峰值記憶體"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run_case, args=(case, str(path), spec, options, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def run_case(case: str, path: Path, spec: FixtureSpec, options: dict, repeat: int) -> dict:
+    """
+    重複執行測試項目，取最快的處理速度與最高的峰值記憶體
+
+    返回:
+        包含 throughput、unit、seconds、peak_rss_mb 的結果；略過或失敗時包含 skipped 或 error
+    """
+    best = None
+    peak = 0.0
+    for _ in range(repeat):
+        result = run_isolated(case, path, spec, options)
+        if "skipped" in result or "error" in result:
+            return result
+        peak = max(peak, result["peak_rss_mb"])
+        if best is None or result["throughput"] > best["throughput"]:
+            best = result
+    return {**best, "peak_rss_mb": peak}
+
+
+def compare_with_baseline(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """
+    與基準結果比較
+
+    參數:
+        results: 本次結果，鍵為「項目/樣本」
+        baseline: 基準結果，格式與 results 相同
+        tolerance: 容許的變化比例，例如 0.1 表示處理速度下降或記憶體上升 10% 以內不算退步
+
+    返回:
+        退步項目的說明列表
+    """
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if not reference or "throughput" not in result:
+            continue
+        if result["throughput"] < reference["throughput"] * (1 - tolerance):
+            change = result["throughput"] / reference["throughput"] - 1
+            regressions.append(
+                f"{key}: 處理速度 {result['throughput']:.1f} {result['unit']}/秒，"
+                f"基準 {reference['throughput']:.1f}（{change:+.1%}）"
+            )
+        if result["peak_rss_mb"] > reference["peak_rss_mb"] * (1 + tolerance):
+            change = result["peak_rss_mb"] / reference["peak_rss_mb"] - 1
+            regressions.append(
+                f"{key}: 峰值記憶體 {result['peak_rss_mb']:.1f} MB，"
+                f"基準 {reference['peak_rss_mb']:.1f} MB（{change:+.1%}）"
+            )
+    return regressions
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, dict]]:
+    """讀取基準結果，檔案不存在時返回 None"""
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def save_baseline(path: Path, results: Dict[str, dict], baseline: Optional[Dict[str, dict]]) -> None:
+    """儲存基準結果，未執行的項目保留原本的基準"""
+    merged = dict(baseline or {})
+    merged.update({key: result for key, result in results.items() if "throughput" in result})
+    payload = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": merged,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="音訊處理流程基準測試套件")
+    parser.add_argument("--cases", default=",".join(CASES), help=f"要執行的項目，以逗號分隔（{', '.join(CASES)}）")
+    parser.add_argument("--sizes", default="1m", help=f"樣本長度，以逗號分隔（{', '.join(FIXTURE_SIZES)}）")
+    parser.add_argument("--variants", default=",".join(FIXTURE_VARIANTS), help="樣本種類，以逗號分隔（speech: 連續發言，pauses: 含長靜音）")
+    parser.add_argument("--speakers", type=int, default=3, help="樣本中的講者數")
+    parser.add_argument("--repeat", type=int, default=3, help="每個項目的重複次數")
+    parser.add_argument("--vosk-model", default=str(DEFAULT_VOSK_MODEL), help="Vosk 小型模型目錄，不存在時略過轉錄項目")
+    parser.add_argument("--batch-size", type=int, default=1000, help="片段寫入的每批筆數")
+    parser.add_argument("--fixture-dir", default=str(DEFAULT_FIXTURE_DIR), help="合成樣本的快取目錄")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="基準結果檔案")
+    parser.add_argument("--save-baseline", action="store_true", help="將本次結果存為基準")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="容許的退步比例")
+    args = parser.parse_args()
+
+    cases = _split(args.cases)
+    sizes = _split(args.sizes)
+    variants = _split(args.variants)
+    unknown = (set(cases) - set(CASES)) | (set(sizes) - set(FIXTURE_SIZES)) | (set(variants) - set(FIXTURE_VARIANTS))
+    if unknown:
+        parser.error(f"未知的參數值: {', '.join(sorted(unknown))}")
+
+    options = {"vosk_model": args.vosk_model, "batch_size": args.batch_size}
+    results: Dict[str, dict] = {}
+    for size in sizes:
+        for variant in variants:
+            spec = FixtureSpec(size=size, variant=variant, speakers=args.speakers)
+            started = time.perf_counter()
+            path = ensure_fixture(spec, Path(args.fixture_dir))
+            print(f"樣本 {spec.name}: {path}（準備 {time.perf_counter() - started:.1f} 秒）")
+
+            for case in cases:
+                key = f"{case}/{spec.name}"
+                result = run_case(case, path, spec, options, args.repeat)
+                results[key] = result
+                if "skipped" in result:
+                    print(f"  {case:<12} 略過: {result['skipped']}")
+                elif "error" in result:
+                    print(f"  {case:<12} 失敗: {result['error']}")
+                else:
+                    extra = {k: v for k, v in result.items() if k not in ("seconds", "throughput", "unit", "peak_rss_mb")}
+                    print(
+                        f"  {case:<12} {result['seconds']:9.3f} 秒  "
+                        f"{result['throughput']:12.1f} {result['unit']}/秒  "
+                        f"峰值 RSS {result['peak_rss_mb']:8.1f} MB"
+                        + (f"  {extra}" if extra else "")
+                    )
+
+    baseline_path = Path(args.baseline)
+    baseline = load_baseline(baseline_path)
+    failed = [key for key, result in results.items() if "error" in result]
+
+    if args.save_baseline:
+        save_baseline(baseline_path, results, baseline)
+        print(f"已儲存基準結果: {baseline_path}")
+    elif baseline is None:
+        print(f"找不到基準結果 {baseline_path}，以 --save-baseline 建立")
+    else:
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n與基準相比退步（容許 {args.tolerance:.0%}）:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\n與基準相比沒有超過 {args.tolerance:.0%} 的退步")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ from typing import Dict, Any, List, Optional
 from enum import Enum
 from django.conf import settings
 from apps.accounts.models import UserProfile
+from core.payment.entitlements import get_entitlements
 
 class ModelProviderType(str, Enum):
     """模型提供者類型"""
@@ -46,16 +47,16 @@ class ModelSelector:
         # 檢查用戶偏好
         if user_id:
             try:
-                profile = UserProfile.objects.get(user_id=user_id)
+                entitlements = get_entitlements(user_id)
                 # 讀取用戶偏好設定
-                user_preference = profile.monthly_quota.get("preferred_llm")
+                user_preference = entitlements.preference("preferred_llm")
                 if user_preference:
                     return ModelProviderType(user_preference)
                 
                 # 根據訂閱計劃選擇
-                if profile.subscription_plan == "free":
+                if entitlements.plan == "free":
                     # 如果 Gemini 配額還有剩餘，則使用 Gemini
-                    gemini_usage = profile.used_quota.get("gemini_calls", 0)
+                    gemini_usage = entitlements.used_quota.get("gemini_calls", 0)
                     gemini_limit = 20  # 免費版每月 20 次 Gemini 調用
                     
                     if gemini_usage < gemini_limit:
@@ -63,7 +64,7 @@ class ModelSelector:
                     else:
                         return cls.FREE_MODELS["llm"]
                     
-                elif profile.subscription_plan in ["basic", "premium"]:
+                elif entitlements.plan in ["basic", "premium"]:
                     return cls.PREMIUM_MODELS["llm"]
                     
             except UserProfile.DoesNotExist:
@@ -92,20 +93,20 @@ class ModelSelector:
         # 檢查用戶偏好
         if user_id:
             try:
-                profile = UserProfile.objects.get(user_id=user_id)
+                entitlements = get_entitlements(user_id)
                 # 讀取用戶偏好設定
-                user_preference = profile.monthly_quota.get("preferred_transcription")
+                user_preference = entitlements.preference("preferred_transcription")
                 if user_preference:
                     return ModelProviderType(user_preference)
                 
                 # 根據訂閱計劃選擇
-                if profile.subscription_plan == "free":
+                if entitlements.plan == "free":
                     # 對於長音訊使用本地方案
                     if audio_length > 10 * 60:  # 超過10分鐘
                         return ModelProviderType.VOSK
                     
                     # 檢查 Whisper 配額
-                    whisper_seconds = profile.used_quota.get("whisper_seconds", 0)
+                    whisper_seconds = entitlements.used_quota.get("whisper_seconds", 0)
                     whisper_limit = 30 * 60  # 免費版每月 30 分鐘
                     
                     if whisper_seconds + audio_length <= whisper_limit:
@@ -113,7 +114,7 @@ class ModelSelector:
                     else:
                         return ModelProviderType.VOSK
                 
-                elif profile.subscription_plan in ["basic", "premium"]:
+                elif entitlements.plan in ["basic", "premium"]:
                     return cls.PREMIUM_MODELS["transcription"]
                     
             except UserProfile.DoesNotExist:
@@ -140,14 +141,14 @@ class ModelSelector:
         # 檢查用戶偏好
         if user_id:
             try:
-                profile = UserProfile.objects.get(user_id=user_id)
+                entitlements = get_entitlements(user_id)
                 # 讀取用戶偏好設定
-                user_preference = profile.monthly_quota.get("preferred_speaker_recognition")
+                user_preference = entitlements.preference("preferred_speaker_recognition")
                 if user_preference:
                     return ModelProviderType(user_preference)
                 
                 # 根據訂閱計劃選擇
-                if profile.subscription_plan == "premium":
+                if entitlements.plan == "premium":
                     return cls.PREMIUM_MODELS["speaker_recognition"]
                     
             except UserProfile.DoesNotExist:
@@ -0,0 +1,200 @@
+"""
+音訊分段模組。
+
+將 16-bit 單聲道 PCM 資料流依靜音位置切分為（可重疊的）分析視窗，
+並提供將各視窗辨識結果依全域時間軸合併、去除重疊重複詞的工具。
+"""
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple
+
+import numpy as np
+
+from utils.type_definitions import AudioSegment
+
+# 每個取樣的位元組數（16-bit PCM）
+SAMPLE_WIDTH = 2
+
+
+class PCMWindow(NamedTuple):
+    """PCM 分析視窗"""
+    index: int  # 視窗序號
+    start_sample: int  # 視窗第一個取樣在整段音訊中的位置
+    pcm: bytes  # 視窗的 16-bit 單聲道 PCM 資料（包含前後重疊部分）
+    own_start: float  # 此視窗負責的時間範圍起點（秒）
+    own_end: float  # 此視窗負責的時間範圍終點（秒），最後一個視窗為無限大
+
+
+def frame_rms(samples: np.ndarray, frame_length: int) -> np.ndarray:
+    """
+    計算每個音框的均方根能量
+
+    參數:
+        samples: int16 或浮點數取樣陣列
+        frame_length: 每個音框的取樣數
+
+    返回:
+        各音框的 RMS 值陣列（不足一個音框的尾端會被忽略）
+    """
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return np.zeros(0, dtype=np.float64)
+    frames = samples[:frame_count * frame_length].astype(np.float64).reshape(frame_count, frame_length)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def find_quietest_offset(samples: np.ndarray, sample_rate: int, frame_seconds: float = 0.03) -> int:
+    """
+    找出取樣陣列中能量最低的音框，返回該音框中心的取樣位置
+
+    參數:
+        samples: 要搜尋的取樣陣列
+        sample_rate: 採樣率
+        frame_seconds: 音框長度（秒）
+    """
+    frame_length = max(1, int(sample_rate * frame_seconds))
+    energies = frame_rms(samples, frame_length)
+    if len(energies) == 0:
+        return len(samples) // 2
+    return int(np.argmin(energies)) * frame_length + frame_length // 2
+
+
+def iter_pcm_windows(
+    chunks: Iterable[bytes],
+    sample_rate: int,
+    window_seconds: float = 30.0,
+    overlap_seconds: float = 1.0,
+    search_seconds: float = 5.0
+) -> Iterator[PCMWindow]:
+    """
+    將 PCM 資料流切分為以靜音為界、前後重疊的視窗
+
+    切點選在目標長度前後 search_seconds 範圍內能量最低之處；每個視窗額外包含切點前後
+    overlap_seconds 的音訊以提供辨識上下文，並以 own_start/own_end 標示其負責的範圍。
+    記憶體用量只與視窗長度有關，與整段音訊長度無關。
+
+    參數:
+        chunks: 16-bit 單聲道 PCM 位元組區塊的迭代器
+        sample_rate: 採樣率
+        window_seconds: 目標視窗長度（秒）
+        overlap_seconds: 視窗前後重疊長度（秒）
+        search_seconds: 切點搜尋範圍（秒）
+
+    返回:
+        PCMWindow 迭代器
+    """
+    window_samples = int(window_seconds * sample_rate)
+    overlap_samples = int(overlap_seconds * sample_rate)
+    search_samples = min(int(search_seconds * sample_rate), window_samples // 2)
+
+    buffer = bytearray()
+    buffer_start = 0  # buffer 第一個取樣的全域位置
+    cut = 0  # 目前視窗負責範圍的起點（全域取樣位置）
+    index = 0
+
+    def window_bytes(start: int, end: int) -> bytes:
+        return bytes(buffer[(start - buffer_start) * SAMPLE_WIDTH:(end - buffer_start) * SAMPLE_WIDTH])
+
+    for chunk in chunks:
+        buffer.extend(chunk)
+
+        while True:
+            buffered_end = buffer_start + len(buffer) // SAMPLE_WIDTH
+            target = cut + window_samples
+            if buffered_end < target + search_samples + overlap_samples:
+                break
+
+            # 在目標切點附近尋找最安靜的位置
+            search_start = target - search_samples
+            search_region = np.frombuffer(
+                window_bytes(search_start, target + search_samples), dtype=np.int16
+            )
+            next_cut = search_start + find_quietest_offset(search_region, sample_rate)
+
+            window_start = max(0, cut - overlap_samples)
+            yield PCMWindow(
+                index=index,
+                start_sample=window_start,
+                pcm=window_bytes(window_start, next_cut + overlap_samples),
+                own_start=cut / sample_rate,
+                own_end=next_cut / sample_rate
+            )
+            index += 1
+            cut = next_cut
+
+            # 丟棄下一個視窗不再需要的資料
+            drop_until = max(buffer_start, cut - overlap_samples)
+            del buffer[:(drop_until - buffer_start) * SAMPLE_WIDTH]
+            buffer_start = drop_until
+
+    buffered_end = buffer_start + len(buffer) // SAMPLE_WIDTH
+    if buffered_end > cut or index == 0:
+        window_start = max(0, cut - overlap_samples)
+        yield PCMWindow(
+            index=index,
+            start_sample=window_start,
+            pcm=window_bytes(window_start, buffered_end),
+            own_start=cut / sample_rate,
+            own_end=float("inf")
+        )
+
+
+def stitch_window_utterances(windows: List[Dict[str, Any]]) -> List[AudioSegment]:
+    """
+    合併各視窗的辨識結果為全域片段列表
+
+    每個詞以其中點決定歸屬的視窗，落在視窗負責範圍外的詞（即重疊區內重複辨識的詞）會被捨棄。
+
+    參數:
+        windows: 依視窗序號排序的結果，每項包含 own_start、own_end 及 utterances；
+            utterances 中每項包含已換算為全域時間的 words 列表（word, start, end）
+
+    返回:
+        依時間排序的片段列表
+    """
+    segments: List[AudioSegment] = []
+
+    for window in windows:
+        for utterance in window["utterances"]:
+            kept_words = [
+                word for word in utterance["words"]
+                if window["own_start"] <= (word["start"] + word["end"]) / 2 < window["own_end"]
+            ]
+            if not kept_words:
+                continue
+
+            segments.append({
+                "start": kept_words[0]["start"],
+                "end": kept_words[-1]["end"],
+                "text": " ".join(word["word"] for word in kept_words),
+                "speaker_id": None,
+                "confidence": 1.0,
+                "words": kept_words
+            })
+
+    segments.sort(key=lambda segment: segment["start"])
+    return segments
+
+
+def stitch_chunk_segments(chunks: List[Dict[str, Any]]) -> List[AudioSegment]:
+    """
+    合併前後多解碼重疊範圍的分段轉錄結果
+
+    各分段在重疊範圍內獨立辨識，斷句位置不同，跨越分段交界的片段可能在兩側都出現。
+    片段帶有詞層級時間戳記時，以 stitch_window_utterances 依詞的中點決定歸屬；
+    沒有詞資訊的片段（辨識器未提供）視為單一個詞，以片段中點決定歸屬。
+
+    參數:
+        chunks: 依分段序號排序的結果，每項包含 own_start、own_end 及全域時間的 segments
+
+    返回:
+        依時間排序的片段列表
+    """
+    windows = []
+    for chunk in chunks:
+        utterances = [
+            {"words": segment.get("words") or [
+                {"word": segment["text"], "start": segment["start"], "end": segment["end"]}
+            ]}
+            for segment in chunk["segments"]
+        ]
+        windows.append({"own_start": chunk["own_start"], "own_end": chunk["own_end"], "utterances": utterances})
+    return stitch_window_utterances(windows)
@@ -0,0 +1,127 @@
+"""
+講者聚類策略模組。
+
+提供可替換的片段特徵聚類實作：片段數量少時直接以 ward 階層式聚類處理完整特徵矩陣；
+片段數量多時先以 mini-batch k-means 壓縮為微聚類，再沿時間軸連通性對微聚類中心
+進行階層式聚類，時間與記憶體皆隨片段數量線性成長。
+"""
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+from scipy import sparse
+from sklearn.cluster import AgglomerativeClustering, MiniBatchKMeans
+
+logger = logging.getLogger(__name__)
+
+# 片段數量達到此值時自動改用兩階段聚類
+TWO_STAGE_MIN_SEGMENTS = int(os.environ.get("SPEAKER_CLUSTERING_TWO_STAGE_MIN_SEGMENTS", 2000))
+
+
+class BaseClusteringStrategy(ABC):
+    """講者聚類策略的抽象類別"""
+
+    name = "base"
+
+    @abstractmethod
+    def fit_predict(self, features: np.ndarray, n_clusters: int) -> np.ndarray:
+        """
+        對片段特徵進行聚類
+
+        參數:
+            features: 形狀為 (片段數, 特徵維度) 的矩陣，列依片段時間順序排列
+            n_clusters: 講者（聚類）數量
+
+        返回:
+            每個片段的聚類標籤陣列
+        """
+        pass
+
+
+class AgglomerativeStrategy(BaseClusteringStrategy):
+    """以 ward 連結對完整特徵矩陣進行階層式聚類，時間與記憶體為 O(n²)"""
+
+    name = "agglomerative"
+
+    def fit_predict(self, features: np.ndarray, n_clusters: int) -> np.ndarray:
+        clustering = AgglomerativeClustering(
+            n_clusters=n_clusters,
+            metric="euclidean",
+            linkage="ward"
+        )
+        return clustering.fit_predict(features)
+
+
+class TwoStageClusteringStrategy(BaseClusteringStrategy):
+    """先以 mini-batch k-means 建立微聚類，再對微聚類中心進行受時間連通性限制的階層式聚類"""
+
+    name = "two_stage"
+
+    def __init__(self, micro_clusters: Optional[int] = None, batch_size: int = 1024, random_state: int = 0):
+        """
+        初始化兩階段聚類策略
+
+        參數:
+            micro_clusters: 微聚類數量，None 表示依片段數量自動決定
+            batch_size: mini-batch k-means 每批片段數
+            random_state: 亂數種子，確保結果可重現
+        """
+        self.micro_clusters = micro_clusters
+        self.batch_size = batch_size
+        self.random_state = random_state
+
+    def _micro_cluster_count(self, segment_count: int, n_clusters: int) -> int:
+        """決定微聚類數量，預設約為片段數的平方根，並限制在合理範圍內"""
+        count = self.micro_clusters or int(np.clip(4 * np.sqrt(segment_count), 50, 500))
+        return int(min(segment_count, max(count, n_clusters)))
+
+    def fit_predict(self, features: np.ndarray, n_clusters: int) -> np.ndarray:
+        segment_count = len(features)
+        kmeans = MiniBatchKMeans(
+            n_clusters=self._micro_cluster_count(segment_count, n_clusters),
+            batch_size=self.batch_size,
+            random_state=self.random_state,
+            n_init=3
+        )
+        micro_labels = kmeans.fit_predict(features)
+
+        # 移除沒有任何片段的微聚類，重新編號為連續索引
+        used, micro_labels = np.unique(micro_labels, return_inverse=True)
+        centroids = kmeans.cluster_centers_[used]
+        if len(centroids) <= n_clusters:
+            return micro_labels
+
+        # 時間上相鄰的片段所屬的微聚類互相連通
+        previous, following = micro_labels[:-1], micro_labels[1:]
+        connectivity = sparse.coo_matrix(
+            (np.ones(len(previous)), (previous, following)),
+            shape=(len(centroids), len(centroids))
+        ).tocsr()
+        connectivity = ((connectivity + connectivity.T) > 0).astype(np.int8)
+
+        clustering = AgglomerativeClustering(
+            n_clusters=n_clusters,
+            metric="euclidean",
+            linkage="ward",
+            connectivity=connectivity
+        )
+        centroid_labels = clustering.fit_predict(centroids)
+        logger.info(f"兩階段聚類: {segment_count} 個片段 -> {len(centroids)} 個微聚類 -> {n_clusters} 位講者")
+        return centroid_labels[micro_labels]
+
+
+def select_clustering_strategy(segment_count: int) -> BaseClusteringStrategy:
+    """
+    依片段數量選擇聚類策略
+
+    參數:
+        segment_count: 要聚類的片段數量
+
+    返回:
+        片段數量未達 TWO_STAGE_MIN_SEGMENTS 時為 AgglomerativeStrategy，否則為 TwoStageClusteringStrategy
+    """
+    if segment_count < TWO_STAGE_MIN_SEGMENTS:
+        return AgglomerativeStrategy()
+    return TwoStageClusteringStrategy()
@@ -0,0 +1,192 @@
+"""
+串流音訊解碼模組。
+
+以單一 ffmpeg 子程序將任意格式的音訊解碼為固定採樣率的 16-bit 單聲道 PCM，
+經由管線逐塊輸出，記憶體用量與音訊長度無關，也不會寫入任何臨時檔案。
+輸入可以是檔案路徑，也可以是二進位資料流或位元組區塊迭代器（經由 stdin 送入 ffmpeg）。
+"""
+import logging
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# ffmpeg 執行檔路徑，可透過環境變數指定
+FFMPEG_BINARY = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+
+# 16-bit PCM 每個取樣的位元組數
+SAMPLE_WIDTH = 2
+
+
+class FFmpegPCMDecoder:
+    """以 ffmpeg 管線將音訊解碼為 s16le 單聲道 PCM 資料流"""
+
+    def __init__(
+        self,
+        source: Union[str, Path, BinaryIO, Iterable[bytes]],
+        sample_rate: int = 16000,
+        chunk_size: int = 8000,
+        start: Optional[float] = None,
+        duration: Optional[float] = None,
+        input_format: Optional[str] = None
+    ):
+        """
+        初始化解碼器
+
+        參數:
+            source: 音訊檔案路徑、二進位資料流或位元組區塊迭代器
+            sample_rate: 輸出採樣率（Hz）
+            chunk_size: 每次讀取的位元組數
+            start: 開始解碼的時間點（秒），None 表示從頭開始
+            duration: 解碼長度（秒），None 表示解碼至結尾
+            input_format: 輸入格式提示（ffmpeg -f 參數），None 表示由 ffmpeg 自動偵測
+        """
+        if isinstance(source, (str, Path)):
+            self.source = str(source)
+            self._input: Optional[Iterable[bytes]] = None
+        else:
+            # 資料流與區塊迭代器經由 stdin 送入 ffmpeg
+            self.source = "pipe:0"
+            self._input = source
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.start = start
+        self.duration = duration
+        self.input_format = input_format
+        self.bytes_read = 0
+        self.read_seconds = 0.0  # 等待 ffmpeg 輸出的累計時間，即解碼階段耗時
+        self._process: Optional[subprocess.Popen] = None
+        self._feeder: Optional[threading.Thread] = None
+
+    @property
+    def decoded_duration(self) -> float:
+        """目前已解碼的音訊長度（秒）"""
+        return self.bytes_read / (SAMPLE_WIDTH * self.sample_rate)
+
+    def build_command(self) -> List[str]:
+        """組合 ffmpeg 指令"""
+        command = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error"]
+        if self._input is None:
+            command.append("-nostdin")
+        if self.start:
+            command += ["-ss", f"{self.start:.3f}"]
+        if self.input_format:
+            command += ["-f", self.input_format]
+        command += ["-i", self.source]
+        if self.duration is not None:
+            command += ["-t", f"{self.duration:.3f}"]
+        command += [
+            "-vn",
+            "-ac", "1",
+            "-ar", str(self.sample_rate),
+            "-acodec", "pcm_s16le",
+            "-f", "s16le",
+            "pipe:1"
+        ]
+        return command
+
+    def __iter__(self) -> Iterator[bytes]:
+        """逐塊產生 PCM 資料，解碼失敗時拋出 RuntimeError"""
+        self._process = subprocess.Popen(
+            self.build_command(),
+            stdin=subprocess.DEVNULL if self._input is None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        if self._input is not None:
+            self._feeder = threading.Thread(
+                target=self._feed_input, args=(self._process.stdin,), daemon=True
+            )
+            self._feeder.start()
+        try:
+            while True:
+                started = time.perf_counter()
+                chunk = self._process.stdout.read(self.chunk_size)
+                self.read_seconds += time.perf_counter() - started
+                if not chunk:
+                    break
+                self.bytes_read += len(chunk)
+                yield chunk
+
+            stderr = self._process.stderr.read().decode("utf-8", errors="replace")
+            if self._process.wait() != 0:
+                raise RuntimeError(f"ffmpeg 解碼失敗: {stderr.strip() or self._process.returncode}")
+        finally:
+            self.close()
+
+    def _feed_input(self, stdin: BinaryIO) -> None:
+        """於背景執行緒將輸入資料逐塊寫入 ffmpeg 的 stdin"""
+        source = self._input
+        if hasattr(source, "read"):
+            source = iter(lambda: self._input.read(self.chunk_size), b"")
+        try:
+            for chunk in source:
+                if chunk:
+                    stdin.write(chunk)
+        except (BrokenPipeError, ValueError, OSError):
+            # ffmpeg 已結束或解碼被中止，剩餘輸入不再需要
+            pass
+        except Exception as e:
+            logger.warning(f"寫入 ffmpeg 輸入時發生錯誤: {e}")
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        """終止 ffmpeg 子程序並釋放管線"""
+        process = self._process
+        if process is None:
+            return
+        self._process = None
+
+        if process.poll() is None:
+            process.kill()
+        for stream in (process.stdout, process.stderr):
+            if stream:
+                stream.close()
+        process.wait()
+
+        feeder = self._feeder
+        self._feeder = None
+        if feeder is not None and feeder is not threading.current_thread():
+            # 輸入來源可能仍阻塞於讀取，不無限期等待
+            feeder.join(timeout=1)
+
+    def __enter__(self) -> "FFmpegPCMDecoder":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+def encode_pcm(pcm: bytes, sample_rate: int = 16000, output_format: str = "mp3", bitrate: str = "32k") -> bytes:
+    """
+    以 ffmpeg 將 16-bit 單聲道 PCM 重新編碼為壓縮格式，全程於記憶體中完成
+
+    參數:
+        pcm: s16le 單聲道 PCM 資料
+        sample_rate: PCM 採樣率
+        output_format: 輸出容器格式（ffmpeg -f 參數，如 mp3、ogg）
+        bitrate: 輸出位元率
+
+    返回:
+        編碼後的音訊位元組，編碼失敗時拋出 RuntimeError
+    """
+    command = [
+        FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+        "-b:a", bitrate,
+        "-f", output_format,
+        "pipe:1"
+    ]
+    completed = subprocess.run(command, input=pcm, capture_output=True)
+    if completed.returncode != 0:
+        stderr = completed.stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"ffmpeg 編碼失敗: {stderr or completed.returncode}")
+    return completed.stdout
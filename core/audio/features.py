@@ -0,0 +1,213 @@
+"""
+音訊特徵擷取模組。
+
+以串流方式對整段音訊只計算一次音框層級的 MFCC，並維護沿音框方向的累加和，
+任意片段的 MFCC 平均值都能以兩列累加和相減在 O(1) 時間內取得，
+不需要為每個片段重新建立梅爾濾波器組與 FFT。
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import librosa
+import numpy as np
+
+
+class SegmentMFCCExtractor:
+    """以音框層級 MFCC 的累加和計算多個片段的 MFCC 平均特徵"""
+
+    def __init__(
+        self,
+        sample_rate: int,
+        n_mfcc: int = 13,
+        n_fft: int = 2048,
+        hop_length: int = 512,
+        n_mels: int = 128
+    ):
+        """
+        初始化特徵擷取器
+
+        參數:
+            sample_rate: 輸入取樣的採樣率
+            n_mfcc: MFCC 係數數量
+            n_fft: FFT 視窗長度（取樣數）
+            hop_length: 音框間距（取樣數）
+            n_mels: 梅爾濾波器數量
+        """
+        self.sample_rate = sample_rate
+        self.n_mfcc = n_mfcc
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+
+        # 梅爾濾波器組與窗函數只建立一次
+        self._mel_basis = librosa.filters.mel(sr=sample_rate, n_fft=n_fft, n_mels=n_mels)
+        self._window = librosa.filters.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+
+        # 音框 j 以取樣 j * hop_length 為中心，開頭補 n_fft / 2 個零使第 0 個音框完整
+        half = n_fft // 2
+        self._buffer = np.zeros(half, dtype=np.float32)
+        self._buffer_start = -half  # buffer 第一個取樣的全域位置
+        self._next_frame = 0  # 下一個待計算的音框索引
+        self.total_samples = 0
+        self.finished = False
+
+        # _cumsum[k] 為音框 _cumsum_start 至 _cumsum_start + k - 1 的 MFCC 總和
+        self._cumsum = np.zeros((1, n_mfcc), dtype=np.float64)
+        self._cumsum_start = 0
+
+    @property
+    def frames_computed(self) -> int:
+        """目前已計算的音框數量"""
+        return self._next_frame
+
+    def feed(self, samples: np.ndarray) -> None:
+        """
+        加入下一段連續取樣並計算所有已完整的音框
+
+        參數:
+            samples: 範圍在 [-1, 1] 的浮點數取樣
+        """
+        if self.finished:
+            raise RuntimeError("特徵擷取器已結束，無法再加入取樣")
+        samples = np.asarray(samples, dtype=np.float32)
+        self.total_samples += len(samples)
+        self._buffer = np.concatenate([self._buffer, samples])
+        self._compute_frames()
+
+    def finish(self) -> None:
+        """標記音訊結束，補零計算最後幾個音框（音框數量與 librosa center=True 相同）"""
+        if self.finished:
+            return
+        last_frame = self.total_samples // self.hop_length
+        needed_end = last_frame * self.hop_length + self.n_fft // 2
+        buffer_end = self._buffer_start + len(self._buffer)
+        if needed_end > buffer_end:
+            self._buffer = np.concatenate([
+                self._buffer, np.zeros(needed_end - buffer_end, dtype=np.float32)
+            ])
+        self._compute_frames(limit=last_frame + 1)
+        self.finished = True
+
+    def frame_range(self, start_sample: int, end_sample: int) -> Tuple[int, int]:
+        """
+        將取樣範圍換算為音框索引範圍 [first, last)
+
+        與對片段本身呼叫 librosa（center=True）相同，涵蓋 1 + 長度 // hop_length 個音框，
+        起點對齊到片段開始之後的第一個音框中心。
+        """
+        first = -(-start_sample // self.hop_length)
+        count = 1 + (end_sample - start_sample) // self.hop_length
+        last = first + count
+        if self.finished:
+            last = min(last, self._next_frame)
+        return first, max(first, last)
+
+    def is_ready(self, start_sample: int, end_sample: int) -> bool:
+        """片段所需的音框是否都已計算完成"""
+        _, last = self.frame_range(start_sample, end_sample)
+        return self.finished or last <= self._next_frame
+
+    def segment_mean(self, start_sample: int, end_sample: int) -> Optional[np.ndarray]:
+        """
+        以累加和取得片段的 MFCC 平均值
+
+        參數:
+            start_sample: 片段起點（全域取樣位置）
+            end_sample: 片段終點（全域取樣位置，不含）
+
+        返回:
+            長度為 n_mfcc 的平均特徵；片段沒有任何音框或所需音框已被捨棄時返回 None
+        """
+        first, last = self.frame_range(start_sample, end_sample)
+        if last <= first or first < self._cumsum_start or last > self._next_frame:
+            return None
+        total = self._cumsum[last - self._cumsum_start] - self._cumsum[first - self._cumsum_start]
+        return total / (last - first)
+
+    def discard_before(self, sample: int) -> None:
+        """捨棄起點早於指定取樣位置的片段不會再用到的累加和"""
+        first_frame = -(-sample // self.hop_length)
+        drop = min(first_frame, self._next_frame) - self._cumsum_start
+        if drop > 0:
+            self._cumsum = self._cumsum[drop:]
+            self._cumsum_start += drop
+
+    def _compute_frames(self, limit: Optional[int] = None) -> None:
+        """計算 buffer 中所有完整音框的 MFCC 並延伸累加和"""
+        half = self.n_fft // 2
+        buffer_end = self._buffer_start + len(self._buffer)
+        # 音框 j 需要取樣 [j * hop - half, j * hop + half)
+        available = (buffer_end - half) // self.hop_length + 1
+        if limit is not None:
+            available = min(available, limit)
+        count = available - self._next_frame
+        if count <= 0:
+            return
+
+        offset = self._next_frame * self.hop_length - half - self._buffer_start
+        span = self._buffer[offset:offset + (count - 1) * self.hop_length + self.n_fft]
+        frames = librosa.util.frame(span, frame_length=self.n_fft, hop_length=self.hop_length)
+        spectrum = np.abs(np.fft.rfft(frames * self._window[:, None], axis=0)) ** 2
+        mel = librosa.power_to_db(self._mel_basis @ spectrum, top_db=None)
+        mfcc = librosa.feature.mfcc(S=mel, n_mfcc=self.n_mfcc)
+
+        increments = np.cumsum(mfcc.T, axis=0, dtype=np.float64) + self._cumsum[-1]
+        self._cumsum = np.concatenate([self._cumsum, increments])
+        self._next_frame = available
+
+        # 只保留下一個音框仍需要的取樣
+        keep_from = self._next_frame * self.hop_length - half
+        drop = max(0, keep_from - self._buffer_start)
+        self._buffer = self._buffer[drop:]
+        self._buffer_start += drop
+
+
+def extract_segment_means(
+    blocks: Iterable[np.ndarray],
+    sample_rate: int,
+    ranges: List[Tuple[int, int, int]],
+    min_samples: int = 0
+) -> Dict[int, np.ndarray]:
+    """
+    以單次串流計算多個片段的 MFCC 平均特徵
+
+    參數:
+        blocks: 連續的浮點數取樣區塊
+        sample_rate: 採樣率
+        ranges: (起點取樣, 終點取樣, 片段索引) 列表
+        min_samples: 片段最短取樣數，實際可用長度不足者會被略過
+
+    返回:
+        片段索引 -> 平均特徵 的字典
+    """
+    extractor = SegmentMFCCExtractor(sample_rate)
+    pending = sorted(ranges)
+    features: Dict[int, np.ndarray] = {}
+
+    def process_ready() -> None:
+        nonlocal pending
+        remaining = []
+        for start_sample, end_sample, index in pending:
+            if not extractor.is_ready(start_sample, end_sample):
+                remaining.append((start_sample, end_sample, index))
+                continue
+            # 超出音訊範圍的部分會被截斷
+            available_end = min(end_sample, extractor.total_samples)
+            if available_end - start_sample < max(1, min_samples):
+                continue
+            mean = extractor.segment_mean(start_sample, available_end)
+            if mean is not None and np.all(np.isfinite(mean)):
+                features[index] = mean
+        pending = remaining
+        if pending:
+            extractor.discard_before(pending[0][0])
+
+    for block in blocks:
+        if not pending:
+            break
+        extractor.feed(block)
+        process_ready()
+
+    if pending:
+        extractor.finish()
+        process_ready()
+
+    return features
@@ -0,0 +1,92 @@
+"""
+即時字幕辨識資源模組。
+
+即時字幕的每個連線都需要一個 KaldiRecognizer；建立識別器需要配置解碼圖狀態，
+因此結束的識別器在 Reset() 後放回池中供下一個連線重用，並以池的容量限制單一
+工作程序同時服務的教室數量。
+"""
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from vosk import KaldiRecognizer
+
+from core.audio.model_pool import VoskModelPool
+
+logger = logging.getLogger(__name__)
+
+
+class RecognizerPoolExhausted(Exception):
+    """同時進行的即時辨識工作階段已達上限"""
+
+
+class RecognizerPool:
+    """依模型與採樣率分組的 KaldiRecognizer 池"""
+
+    def __init__(self, max_sessions: int = 48, max_idle_per_key: int = 8):
+        """
+        初始化識別器池
+
+        參數:
+            max_sessions: 同時借出的識別器上限（即同時進行的即時字幕連線數）
+            max_idle_per_key: 每種模型與採樣率組合最多保留的閒置識別器數量
+        """
+        self.max_sessions = max_sessions
+        self.max_idle_per_key = max_idle_per_key
+        self._idle: Dict[Tuple[str, int], List[KaldiRecognizer]] = defaultdict(list)
+        self._active = 0
+        self._lock = threading.Lock()
+
+    @property
+    def active_count(self) -> int:
+        """目前借出的識別器數量"""
+        with self._lock:
+            return self._active
+
+    def acquire(self, model_path: str, sample_rate: int) -> KaldiRecognizer:
+        """
+        借出識別器，可能需要從模型池載入模型，應在執行緒中呼叫
+
+        參數:
+            model_path: Vosk 模型目錄路徑
+            sample_rate: 輸入 PCM 的採樣率
+
+        返回:
+            已重設、可直接使用的 KaldiRecognizer
+
+        例外:
+            RecognizerPoolExhausted: 借出數量已達上限
+        """
+        key = (model_path, sample_rate)
+        with self._lock:
+            if self._active >= self.max_sessions:
+                raise RecognizerPoolExhausted(f"即時辨識工作階段已達上限 {self.max_sessions}")
+            self._active += 1
+            idle = self._idle[key]
+            recognizer = idle.pop() if idle else None
+
+        if recognizer is not None:
+            return recognizer
+
+        try:
+            return KaldiRecognizer(VoskModelPool.get_model(model_path), sample_rate)
+        except Exception:
+            with self._lock:
+                self._active -= 1
+            raise
+
+    def release(self, model_path: str, sample_rate: int, recognizer: KaldiRecognizer) -> None:
+        """歸還識別器，重設後保留供下次使用"""
+        key = (model_path, sample_rate)
+        try:
+            recognizer.Reset()
+            reusable = True
+        except Exception as e:
+            logger.warning(f"重設識別器失敗，將不再重用: {e}")
+            reusable = False
+
+        with self._lock:
+            self._active -= 1
+            if reusable and len(self._idle[key]) < self.max_idle_per_key:
+                self._idle[key].append(recognizer)
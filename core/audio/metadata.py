@@ -0,0 +1,158 @@
+"""
+音訊元數據探測模組。
+
+只讀取容器標頭（mutagen，失敗時改用 ffprobe）取得時長、採樣率與聲道數，
+不複製檔案也不解碼音訊，讀取的位元組數有上限，與檔案大小無關。
+"""
+import io
+import json
+import logging
+import os
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from utils.type_definitions import ServiceResult
+
+logger = logging.getLogger(__name__)
+
+# ffprobe 執行檔路徑，可透過環境變數指定
+FFPROBE_BINARY = os.environ.get("FFPROBE_BINARY", "ffprobe")
+
+# 解析標頭時允許讀取的最大位元組數
+MAX_HEADER_BYTES = 4 * 1024 * 1024
+
+
+class HeaderReadLimitExceeded(Exception):
+    """解析標頭所需讀取的資料超過上限"""
+
+
+class _BoundedReader(io.RawIOBase):
+    """限制總讀取量的檔案包裝器，確保標頭解析不會掃描整個檔案"""
+
+    def __init__(self, raw: io.BufferedReader, limit: int):
+        super().__init__()
+        self._raw = raw
+        self.limit = limit
+        self.bytes_read = 0
+        self.name = raw.name
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self.limit - self.bytes_read + 1
+        if self.bytes_read + size > self.limit:
+            # 允許讀到上限為止，超出時才中止
+            size = self.limit - self.bytes_read + 1
+        data = self._raw.read(size)
+        self.bytes_read += len(data)
+        if self.bytes_read > self.limit:
+            raise HeaderReadLimitExceeded(f"讀取標頭超過 {self.limit} 位元組")
+        return data
+
+    def readinto(self, buffer: Any) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._raw.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._raw.tell()
+
+
+def probe_audio_metadata(file_path: Union[str, Path]) -> ServiceResult:
+    """
+    探測音訊檔案的元數據
+
+    參數:
+        file_path: 音訊檔案路徑
+
+    返回:
+        ServiceResult，data 為包含 duration、sample_rate、channels 的字典，
+        無法取得的欄位值為 None
+    """
+    file_path = str(file_path)
+    if not os.path.exists(file_path):
+        return {
+            "success": False,
+            "error": f"檔案不存在: {file_path}",
+            "status_code": 404
+        }
+
+    metadata = _probe_with_mutagen(file_path)
+    if metadata is None or metadata["duration"] is None:
+        metadata = _probe_with_ffprobe(file_path) or metadata
+
+    if metadata is None:
+        return {
+            "success": False,
+            "error": "無法從檔案標頭取得音訊元數據",
+            "status_code": 422
+        }
+
+    return {
+        "success": True,
+        "data": metadata,
+        "status_code": 200
+    }
+
+
+def _probe_with_mutagen(file_path: str) -> Optional[Dict[str, Any]]:
+    """使用 mutagen 解析容器標頭"""
+    try:
+        import mutagen
+
+        with open(file_path, "rb") as raw:
+            reader = _BoundedReader(raw, MAX_HEADER_BYTES)
+            audio_meta = mutagen.File(reader)
+
+        if audio_meta is None or not hasattr(audio_meta, "info"):
+            return None
+
+        info = audio_meta.info
+        metadata = {
+            "duration": getattr(info, "length", None) or None,
+            "sample_rate": getattr(info, "sample_rate", None) or None,
+            "channels": getattr(info, "channels", None) or None,
+        }
+        logger.info(f"使用 mutagen 讀取標頭 {reader.bytes_read} 位元組: {metadata}")
+        return metadata
+    except Exception as e:
+        logger.warning(f"使用 mutagen 解析標頭失敗: {e}")
+        return None
+
+
+def _probe_with_ffprobe(file_path: str) -> Optional[Dict[str, Any]]:
+    """使用 ffprobe 讀取容器與串流資訊"""
+    command = [
+        FFPROBE_BINARY, "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "stream=sample_rate,channels,duration:format=duration",
+        "-of", "json",
+        file_path
+    ]
+    try:
+        completed = subprocess.run(command, capture_output=True, timeout=30, check=True)
+        probe = json.loads(completed.stdout.decode("utf-8") or "{}")
+    except Exception as e:
+        logger.warning(f"使用 ffprobe 解析標頭失敗: {e}")
+        return None
+
+    streams = probe.get("streams") or [{}]
+    stream = streams[0]
+    duration = stream.get("duration") or probe.get("format", {}).get("duration")
+
+    metadata = {
+        "duration": float(duration) if duration else None,
+        "sample_rate": int(stream["sample_rate"]) if stream.get("sample_rate") else None,
+        "channels": int(stream["channels"]) if stream.get("channels") else None,
+    }
+    logger.info(f"使用 ffprobe 獲取資訊: {metadata}")
+    return metadata
@@ -0,0 +1,135 @@
+"""
+Vosk 模型池模組。
+
+在單一工作程序內快取已載入的 Vosk 模型，讓同一程序中的所有轉錄任務以唯讀方式共用，
+避免每個任務都重新從磁碟載入數百 MB 的模型；超出記憶體預算時依 LRU 順序釋放模型。
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from vosk import Model
+
+logger = logging.getLogger(__name__)
+
+
+class VoskModelPool:
+    """程序層級的 Vosk 模型登錄表，以 LRU 策略管理記憶體預算"""
+
+    # 記憶體預算（位元組），可由環境變數或 configure() 調整
+    memory_budget = int(os.environ.get("VOSK_MODEL_POOL_BUDGET_MB", 2048)) * 1024 * 1024
+
+    # 模型路徑 -> (模型實例, 估計佔用位元組)，依最近使用順序排列
+    _models: "OrderedDict[str, Tuple[Model, int]]" = OrderedDict()
+    _lock = threading.Lock()
+    _loading_locks: Dict[str, threading.Lock] = {}
+
+    @classmethod
+    def configure(cls, memory_budget_mb: Optional[int] = None) -> None:
+        """
+        調整模型池設定
+
+        參數:
+            memory_budget_mb: 記憶體預算（MB），None 表示維持現有設定
+        """
+        if memory_budget_mb is not None:
+            with cls._lock:
+                cls.memory_budget = int(memory_budget_mb) * 1024 * 1024
+                cls._evict_locked(reserve=0)
+
+    @classmethod
+    def get_model(cls, model_path: str) -> Model:
+        """
+        取得指定路徑的 Vosk 模型，若尚未載入則載入並放入模型池
+
+        參數:
+            model_path: Vosk 模型目錄路徑
+
+        返回:
+            共用的 vosk.Model 實例（僅供唯讀使用，可同時建立多個 KaldiRecognizer）
+        """
+        key = os.path.abspath(model_path)
+
+        with cls._lock:
+            cached = cls._models.get(key)
+            if cached is not None:
+                cls._models.move_to_end(key)
+                return cached[0]
+            loading_lock = cls._loading_locks.setdefault(key, threading.Lock())
+
+        # 同一模型僅允許一個執行緒載入，其他執行緒等待後直接取用
+        with loading_lock:
+            with cls._lock:
+                cached = cls._models.get(key)
+                if cached is not None:
+                    cls._models.move_to_end(key)
+                    return cached[0]
+
+            model_size = cls._estimate_model_size(key)
+            logger.info(f"載入 Vosk 模型至模型池: {key} (約 {model_size / (1024 * 1024):.0f} MB)")
+            model = Model(key)
+
+            with cls._lock:
+                cls._evict_locked(reserve=model_size)
+                cls._models[key] = (model, model_size)
+                cls._loading_locks.pop(key, None)
+
+            return model
+
+    @classmethod
+    def is_loaded(cls, model_path: str) -> bool:
+        """檢查模型是否已在模型池中"""
+        with cls._lock:
+            return os.path.abspath(model_path) in cls._models
+
+    @classmethod
+    def loaded_models(cls) -> List[str]:
+        """返回已載入模型的路徑，依最近使用順序由舊到新排列"""
+        with cls._lock:
+            return list(cls._models.keys())
+
+    @classmethod
+    def memory_usage(cls) -> int:
+        """返回模型池目前估計佔用的位元組數"""
+        with cls._lock:
+            return sum(size for _, size in cls._models.values())
+
+    @classmethod
+    def evict(cls, model_path: str) -> bool:
+        """從模型池移除指定模型，返回是否有移除"""
+        with cls._lock:
+            return cls._models.pop(os.path.abspath(model_path), None) is not None
+
+    @classmethod
+    def clear(cls) -> None:
+        """清空模型池"""
+        with cls._lock:
+            cls._models.clear()
+
+    @classmethod
+    def _evict_locked(cls, reserve: int) -> None:
+        """
+        依 LRU 順序移除模型，直到加上 reserve 後不超過記憶體預算
+
+        注意: 呼叫前必須持有 _lock。正在執行中的任務仍持有模型參考，
+        記憶體會在該任務結束後才真正釋放。
+        """
+        used = sum(size for _, size in cls._models.values())
+        while cls._models and used + reserve > cls.memory_budget:
+            evicted_key, (_, evicted_size) = cls._models.popitem(last=False)
+            used -= evicted_size
+            logger.info(f"模型池超出記憶體預算，移除最久未使用的模型: {evicted_key}")
+
+    @staticmethod
+    def _estimate_model_size(model_path: str) -> int:
+        """以模型目錄的檔案總大小估計載入後的記憶體佔用"""
+        total = 0
+        for root, _, files in os.walk(model_path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    continue
+        return total
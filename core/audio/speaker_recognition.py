@@ -3,17 +3,37 @@
 支援簡易版基於聚類的方法，作為輕量且離線的講者分離解決方案。
 """
 from abc import ABC, abstractmethod
+import bisect
 from pathlib import Path
 import numpy as np
 from typing import List, Dict, Any, Optional, Tuple
 import librosa
-from sklearn.cluster import AgglomerativeClustering
 
+from core.audio.clustering import BaseClusteringStrategy, select_clustering_strategy
+from core.audio.decoder import FFmpegPCMDecoder
+from core.audio.features import extract_segment_means
 from utils.type_definitions import AudioSegment, ServiceResult
 
 class BaseSpeakerRecognizer(ABC):
     """講者辨識的基本抽象類別，定義所有講者辨識器必須實作的方法"""
 
+    # 指定的聚類策略，None 表示依片段數量自動選擇
+    clustering_strategy: Optional[BaseClusteringStrategy] = None
+
+    def get_clustering_strategy(self, segment_count: int) -> BaseClusteringStrategy:
+        """
+        取得用於講者聚類的策略
+        
+        參數:
+            segment_count: 要聚類的片段數量
+            
+        返回:
+            已指定的策略，或依片段數量自動選擇的策略
+        """
+        if self.clustering_strategy is not None:
+            return self.clustering_strategy
+        return select_clustering_strategy(segment_count)
+
     @abstractmethod
     def initialize(self) -> ServiceResult:
         """初始化講者辨識器，例如加載模型或設定連接"""
@@ -55,9 +75,22 @@ class BaseSpeakerRecognizer(ABC):
 class SimpleSpeakerRecognizer(BaseSpeakerRecognizer):
     """使用基本音訊特徵和聚類進行講者辨識的簡易實現"""
     
-    def __init__(self):
-        """初始化簡易講者辨識器"""
+    # 特徵擷取使用的固定分析採樣率
+    ANALYSIS_SAMPLE_RATE = 16000
+    # 每個片段最多取用的分析長度（秒），避免極長片段佔用大量記憶體
+    MAX_ANALYSIS_SECONDS = 30.0
+    # 片段最短分析長度（秒）
+    MIN_SEGMENT_SECONDS = 0.5
+    
+    def __init__(self, clustering_strategy: Optional[BaseClusteringStrategy] = None):
+        """
+        初始化簡易講者辨識器
+        
+        參數:
+            clustering_strategy: 聚類策略，None 表示依片段數量自動選擇
+        """
         self.initialized = False
+        self.clustering_strategy = clustering_strategy
     
     def initialize(self) -> ServiceResult:
         """初始化講者辨識器"""
@@ -96,41 +129,10 @@ class SimpleSpeakerRecognizer(BaseSpeakerRecognizer):
                     "status_code": 400
                 }
             
-            # 讀取音訊檔案
-            y, sr = librosa.load(str(audio_file), sr=None)
-            
-            # 提取音訊片段並計算特徵
-            segment_features = []
-            valid_segments = []
+            # 以循序區塊讀取音訊並逐片段計算特徵，記憶體用量與音訊長度無關
+            segment_features, valid_indices = self._extract_segment_features(audio_file, segments)
             
-            for segment in segments:
-                start_sample = int(segment["start"] * sr)
-                end_sample = int(segment["end"] * sr)
-                
-                if end_sample <= start_sample or start_sample >= len(y) or end_sample <= 0:
-                    continue
-                
-                # 確保範圍有效
-                start_sample = max(0, start_sample)
-                end_sample = min(len(y), end_sample)
-                
-                # 提取片段
-                segment_audio = y[start_sample:end_sample]
-                
-                # 確保片段夠長
-                if len(segment_audio) < sr * 0.5:  # 至少 0.5 秒
-                    continue
-                
-                # 提取 MFCC 特徵
-                try:
-                    mfcc = librosa.feature.mfcc(y=segment_audio, sr=sr, n_mfcc=13)
-                    mfcc_mean = np.mean(mfcc, axis=1)
-                    segment_features.append(mfcc_mean)
-                    valid_segments.append(segment)
-                except Exception:
-                    continue
-            
-            if len(valid_segments) <= 1:
+            if len(valid_indices) <= 1:
                 return {
                     "success": False,
                     "error": "有效片段不足，無法進行講者辨識",
@@ -138,36 +140,17 @@ class SimpleSpeakerRecognizer(BaseSpeakerRecognizer):
                 }
             
             # 估計講者數量
-            estimated_speakers = self._estimate_speaker_count(len(valid_segments))
+            estimated_speakers = self._estimate_speaker_count(len(valid_indices))
             
             # 執行聚類
             features_array = np.array(segment_features)
-            clustering = AgglomerativeClustering(
-                n_clusters=estimated_speakers,
-                affinity="euclidean",
-                linkage="ward"
-            )
-            labels = clustering.fit_predict(features_array)
+            strategy = self.get_clustering_strategy(len(valid_indices))
+            labels = strategy.fit_predict(features_array, estimated_speakers)
             
-            # 將聚類結果應用到片段
-            result_segments = []
-            for i, segment in enumerate(valid_segments):
-                segment_with_speaker = segment.copy()
-                segment_with_speaker["speaker_id"] = f"speaker_{labels[i]}"
-                result_segments.append(segment_with_speaker)
-            
-            # 處理未能提取特徵的片段
-            processed_indices = [segments.index(s) for s in valid_segments]
-            for i, segment in enumerate(segments):
-                if i not in processed_indices:
-                    # 嘗試根據鄰近片段分配講者
-                    nearest_speaker = self._find_nearest_speaker(segment, result_segments)
-                    segment_with_speaker = segment.copy()
-                    segment_with_speaker["speaker_id"] = nearest_speaker
-                    result_segments.append(segment_with_speaker)
-            
-            # 排序結果
-            result_segments.sort(key=lambda x: x["start"])
+            # 將聚類結果應用到片段，未能提取特徵的片段依時間最近的講者分配
+            result_segments = self._assign_speakers(
+                segments, valid_indices, [f"speaker_{label}" for label in labels]
+            )
             
             return {
                 "success": True,
@@ -182,6 +165,44 @@ class SimpleSpeakerRecognizer(BaseSpeakerRecognizer):
                 "status_code": 500
             }
     
+    def _extract_segment_features(self, audio_file: Path, segments: List[AudioSegment]) -> Tuple[List[np.ndarray], List[int]]:
+        """
+        以循序區塊讀取音訊，計算每個片段的 MFCC 平均特徵
+        
+        整段音訊只計算一次音框層級的 MFCC，片段平均值由累加和取得，
+        峰值記憶體取決於區塊大小與尚未處理片段的跨度，而非音訊總長度。
+        
+        參數:
+            audio_file: 音訊檔案路徑
+            segments: 轉錄片段列表
+            
+        返回:
+            (特徵列表, 對應的片段索引列表)，索引依原始順序排列
+        """
+        sr = self.ANALYSIS_SAMPLE_RATE
+        max_samples = int(self.MAX_ANALYSIS_SECONDS * sr)
+        min_samples = int(self.MIN_SEGMENT_SECONDS * sr)
+        
+        # 計算每個片段的取樣範圍
+        ranges = []
+        for index, segment in enumerate(segments):
+            start_sample = max(0, int(segment["start"] * sr))
+            end_sample = int(segment["end"] * sr)
+            if end_sample <= start_sample:
+                continue
+            ranges.append((start_sample, min(end_sample, start_sample + max_samples), index))
+        
+        decoder = FFmpegPCMDecoder(audio_file, sample_rate=sr, chunk_size=sr * 2 * 10)
+        with decoder:
+            blocks = (
+                np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+                for chunk in decoder
+            )
+            features = extract_segment_means(blocks, sr, ranges, min_samples=min_samples)
+        
+        valid_indices = sorted(features)
+        return [features[i] for i in valid_indices], valid_indices
+    
     def get_speaker_count(self, audio_file: Path) -> ServiceResult[int]:
         """獲取講者數量估計值"""
         try:
@@ -245,21 +266,62 @@ class SimpleSpeakerRecognizer(BaseSpeakerRecognizer):
         else:
             return min(4, segment_count // 4)
     
-    def _find_nearest_speaker(self, segment: AudioSegment, labeled_segments: List[AudioSegment]) -> str:
-        """根據時間找到最近的講者"""
-        segment_mid = (segment["start"] + segment["end"]) / 2
-        nearest_distance = float("inf")
-        nearest_speaker = "speaker_0"  # 預設
+    def _assign_speakers(self, segments: List[AudioSegment], labeled_indices: List[int], speaker_ids: List[str]) -> List[AudioSegment]:
+        """
+        將講者標籤套用到片段，並為沒有標籤的片段分配時間最近的講者
         
-        for labeled in labeled_segments:
-            labeled_mid = (labeled["start"] + labeled["end"]) / 2
-            distance = abs(segment_mid - labeled_mid)
+        參數:
+            segments: 原始片段列表
+            labeled_indices: 已有講者標籤的片段索引
+            speaker_ids: 與 labeled_indices 對應的講者 ID
             
-            if distance < nearest_distance:
-                nearest_distance = distance
-                nearest_speaker = labeled["speaker_id"]
+        返回:
+            依開始時間排序、全部附有講者 ID 的片段列表
+        """
+        result_segments = []
+        for index, speaker_id in zip(labeled_indices, speaker_ids):
+            segment_with_speaker = segments[index].copy()
+            segment_with_speaker["speaker_id"] = speaker_id
+            result_segments.append(segment_with_speaker)
+        
+        # 已標記片段依中點排序，供二分搜尋最近講者
+        labeled = sorted(
+            ((s["start"] + s["end"]) / 2, s["speaker_id"]) for s in result_segments
+        )
+        labeled_mids = [mid for mid, _ in labeled]
+        labeled_speakers = [speaker for _, speaker in labeled]
+        
+        processed_indices = set(labeled_indices)
+        for i, segment in enumerate(segments):
+            if i not in processed_indices:
+                segment_with_speaker = segment.copy()
+                segment_with_speaker["speaker_id"] = self._find_nearest_speaker(
+                    segment, labeled_mids, labeled_speakers
+                )
+                result_segments.append(segment_with_speaker)
+        
+        result_segments.sort(key=lambda x: x["start"])
+        return result_segments
+    
+    def _find_nearest_speaker(self, segment: AudioSegment, labeled_mids: List[float], labeled_speakers: List[str]) -> str:
+        """
+        根據時間找到最近的講者
+        
+        參數:
+            segment: 要分配講者的片段
+            labeled_mids: 已標記片段的中點（已排序）
+            labeled_speakers: 與 labeled_mids 對應的講者 ID
+        """
+        if not labeled_mids:
+            return "speaker_0"  # 預設
+        
+        segment_mid = (segment["start"] + segment["end"]) / 2
+        position = bisect.bisect_left(labeled_mids, segment_mid)
         
-        return nearest_speaker
+        # 最近的中點只可能是插入位置左右兩側之一，距離相同時取較早者
+        candidates = [i for i in (position - 1, position) if 0 <= i < len(labeled_mids)]
+        nearest = min(candidates, key=lambda i: abs(segment_mid - labeled_mids[i]))
+        return labeled_speakers[nearest]
     
     def health_check(self) -> bool:
         """檢查講者辨識服務狀態"""
@@ -0,0 +1,234 @@
+"""
+串流轉錄模組。
+
+提供以推送方式逐塊接收 PCM 資料的 Vosk 辨識工作階段，辨識過程中即時產生暫定（partial）
+與確定（final）事件；以及將非同步區塊迭代器銜接到同步串流轉錄函式的工具。
+記憶體用量固定，與串流長度無關。
+"""
+import asyncio
+import concurrent.futures
+import json
+import queue
+import threading
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, List, Optional, TypeVar
+
+from vosk import KaldiRecognizer
+
+from utils.type_definitions import AudioSegment, StreamEvent
+
+T = TypeVar("T")
+
+# 每個取樣的位元組數（16-bit PCM）
+SAMPLE_WIDTH = 2
+
+
+class VoskStreamSession:
+    """單一音訊串流的 Vosk 辨識工作階段"""
+
+    def __init__(
+        self,
+        model,
+        sample_rate: int = 16000,
+        offset: float = 0.0,
+        emit_partials: bool = True,
+        recognizer: Optional[KaldiRecognizer] = None
+    ):
+        """
+        初始化辨識工作階段
+
+        參數:
+            model: 已載入的 vosk.Model（可由模型池取得，多個工作階段可共用）
+            sample_rate: 輸入 PCM 的採樣率
+            offset: 加到所有時間戳記上的起始時間（秒）
+            emit_partials: 是否產生暫定文字事件
+            recognizer: 重用的識別器（須已 Reset），None 表示建立新的識別器
+        """
+        self.recognizer = recognizer or KaldiRecognizer(model, sample_rate)
+        self.recognizer.SetWords(True)  # 啟用詞級時間戳記
+        self.sample_rate = sample_rate
+        self.offset = offset
+        self.emit_partials = emit_partials
+        self.bytes_accepted = 0
+        self.finished = False
+        self._last_partial = ""
+
+    @property
+    def duration(self) -> float:
+        """目前已接收的音訊長度（秒）"""
+        return self.bytes_accepted / (SAMPLE_WIDTH * self.sample_rate)
+
+    def accept_pcm(self, pcm: bytes) -> List[StreamEvent]:
+        """
+        送入一段 16-bit 單聲道 PCM 資料
+
+        返回:
+            此次產生的事件列表（偵測到語句結束時為 final 事件，否則可能為 partial 事件）
+        """
+        if self.finished:
+            raise RuntimeError("辨識工作階段已結束")
+        if not pcm:
+            return []
+        self.bytes_accepted += len(pcm)
+
+        if self.recognizer.AcceptWaveform(pcm):
+            return self._final_events(json.loads(self.recognizer.Result()))
+
+        if not self.emit_partials:
+            return []
+        partial = json.loads(self.recognizer.PartialResult()).get("partial", "").strip()
+        if partial == self._last_partial:
+            return []
+        self._last_partial = partial
+        return [{"type": "partial", "text": partial, "segment": None}]
+
+    def finish(self) -> List[StreamEvent]:
+        """結束串流並取得最後的 final 事件"""
+        if self.finished:
+            return []
+        self.finished = True
+        return self._final_events(json.loads(self.recognizer.FinalResult()))
+
+    def _final_events(self, result: dict) -> List[StreamEvent]:
+        """將 Vosk 的語句結果轉換為 final 事件"""
+        self._last_partial = ""
+        text = result.get("text", "").strip()
+        if not text:
+            return []
+
+        segment: Optional[AudioSegment] = None
+        words = result.get("result") or []
+        if words:
+            start_time = words[0].get("start", 0.0)
+            end_time = words[-1].get("end", start_time + 1.0)
+            segment = {
+                "start": start_time + self.offset,
+                "end": end_time + self.offset,
+                "text": text,
+                "speaker_id": None,  # Vosk不提供講者辨識
+                "confidence": 1.0,  # Vosk不提供置信度
+                "words": [
+                    {
+                        "word": word.get("word", ""),
+                        "start": word.get("start", start_time) + self.offset,
+                        "end": word.get("end", start_time) + self.offset
+                    }
+                    for word in words
+                ]
+            }
+        return [{"type": "final", "text": text, "segment": segment}]
+
+
+def iter_binary_chunks(stream, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """以固定大小逐塊讀取二進位資料流"""
+    return iter(lambda: stream.read(chunk_size), b"")
+
+
+async def bridge_async_stream(
+    chunks: AsyncIterable[bytes],
+    stream_fn: Callable[[Iterable[bytes]], Iterator[T]],
+    max_buffered_chunks: int = 16,
+    max_buffered_results: int = 16
+) -> AsyncIterator[T]:
+    """
+    以背景執行緒執行同步串流函式，讓非同步程式碼以非同步迭代器方式使用
+
+    輸入與輸出都經過有上限的佇列：輸入端過快時暫停讀取，消費端過慢時背景執行緒暫停產生結果，
+    記憶體用量固定。
+
+    參數:
+        chunks: 非同步位元組區塊迭代器
+        stream_fn: 接收同步區塊迭代器並產生結果的函式（例如 transcriber.transcribe_chunks）
+        max_buffered_chunks: 輸入佇列的最大區塊數
+        max_buffered_results: 輸出佇列的最大結果數
+
+    返回:
+        stream_fn 產生結果的非同步迭代器
+    """
+    loop = asyncio.get_running_loop()
+    input_queue: "queue.Queue" = queue.Queue(maxsize=max_buffered_chunks)
+    output_queue: "asyncio.Queue" = asyncio.Queue(maxsize=max_buffered_results)
+    end_of_input = object()
+    end_of_output = object()
+    cancelled = threading.Event()
+
+    def input_iterator() -> Iterator[bytes]:
+        while True:
+            chunk = input_queue.get()
+            if chunk is end_of_input:
+                return
+            yield chunk
+
+    def put_output(item) -> None:
+        # 輸出佇列已滿時等待消費端取出；消費端停止迭代後不再等待
+        if cancelled.is_set():
+            return
+        try:
+            future = asyncio.run_coroutine_threadsafe(output_queue.put(item), loop)
+        except RuntimeError:
+            # 事件迴圈已關閉
+            return
+        while not cancelled.is_set():
+            try:
+                future.result(timeout=0.1)
+                return
+            except concurrent.futures.TimeoutError:
+                continue
+        future.cancel()
+
+    def worker() -> None:
+        try:
+            for item in stream_fn(input_iterator()):
+                if cancelled.is_set():
+                    break
+                put_output((item, None))
+        except BaseException as e:
+            put_output((end_of_output, e))
+            return
+        put_output((end_of_output, None))
+
+    def put_input(item) -> None:
+        # 背景執行緒提前結束後輸入佇列不再被取出，等待時定期檢查是否已取消，避免永遠阻塞
+        while not cancelled.is_set():
+            try:
+                input_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    async def pump() -> None:
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(put_input, chunk)
+        finally:
+            await asyncio.to_thread(put_input, end_of_input)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    pump_task = asyncio.ensure_future(pump())
+    try:
+        while True:
+            item, error = await output_queue.get()
+            if error is not None:
+                raise error
+            if item is end_of_output:
+                break
+            yield item
+        await pump_task
+    finally:
+        cancelled.set()
+        if not pump_task.done():
+            pump_task.cancel()
+            # 確保背景執行緒不會永遠等待輸入
+            try:
+                input_queue.put_nowait(end_of_input)
+            except queue.Full:
+                pass
+
+
+def rewind_stream(stream) -> None:
+    """若資料流可定位則回到開頭，與既有 transcribe_stream 從頭讀取的行為一致"""
+    try:
+        if stream.seekable():
+            stream.seek(0)
+    except (AttributeError, OSError):
+        pass
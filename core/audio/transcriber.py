@@ -1,27 +1,41 @@
 # core/audio/transcriber.py
+import time
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Dict, Any, Optional, BinaryIO, List, Union
+from typing import Dict, Any, Optional, AsyncIterable, AsyncIterator, BinaryIO, Iterable, Iterator, List, Tuple, Union
 
-from utils.type_definitions import TranscriptionResult, ServiceResult, AudioFormat
+from core.audio.streaming import bridge_async_stream, iter_binary_chunks, rewind_stream
+from core.audio.vad import VAD_ENABLED, SilenceSkipper
+from utils.type_definitions import TranscriptionResult, ServiceResult, AudioFormat, AudioSegment, StreamEvent
 
 
 class BaseTranscriber(ABC):
     """語音轉寫器的基本抽象類別，定義所有轉錄器必須實作的方法"""
 
+    # 辨識前是否略過長靜音，子類別可於初始化時覆寫
+    vad_enabled = VAD_ENABLED
+
     @abstractmethod
     def initialize(self) -> ServiceResult:
         """初始化轉錄器，例如加載模型或設定API連接"""
         pass
 
     @abstractmethod
-    def transcribe_file(self, audio_file: Path, language: Optional[str] = None) -> ServiceResult[TranscriptionResult]:
+    def transcribe_file(
+        self,
+        audio_file: Path,
+        language: Optional[str] = None,
+        start: float = 0.0,
+        duration: Optional[float] = None
+    ) -> ServiceResult[TranscriptionResult]:
         """
         轉錄音訊檔案
         
         參數:
             audio_file: 音訊檔案路徑
             language: 音訊語言代碼 (如 'zh-TW', 'en-US')
+            start: 開始轉錄的時間點（秒），片段時間戳記仍以整個檔案為準
+            duration: 轉錄長度（秒），None 表示轉錄至結尾
             
         返回:
             ServiceResult 包含 TranscriptionResult 或錯誤資訊
@@ -47,29 +61,157 @@ class BaseTranscriber(ABC):
     def health_check(self) -> bool:
         """檢查轉錄服務狀態"""
         pass
+
+    def get_model_identifier(self) -> str:
+        """返回使用的模型名稱，用於區分不同模型產生的轉錄結果"""
+        return self.__class__.__name__
+
+    @abstractmethod
+    def transcribe_chunks(self, chunks: Iterable[bytes], language: Optional[str] = None) -> Iterator[StreamEvent]:
+        """
+        串流轉錄：逐塊接收音訊資料並在辨識過程中產生事件
+        
+        參數:
+            chunks: 音訊資料的位元組區塊迭代器
+            language: 音訊語言代碼
+            
+        返回:
+            StreamEvent 迭代器（partial 為暫定文字，final 為已確定的片段）
+        """
+        pass
+
+    async def atranscribe_chunks(self, chunks: AsyncIterable[bytes], language: Optional[str] = None) -> AsyncIterator[StreamEvent]:
+        """
+        transcribe_chunks 的非同步版本，辨識於背景執行緒進行，不會阻塞事件迴圈
+        
+        參數:
+            chunks: 音訊資料的非同步位元組區塊迭代器
+            language: 音訊語言代碼
+        """
+        async for event in bridge_async_stream(chunks, lambda sync_chunks: self.transcribe_chunks(sync_chunks, language)):
+            yield event
+
+    def _skip_silence(self, pcm_chunks: Iterable[bytes], sample_rate: int) -> Tuple[Iterable[bytes], Optional[SilenceSkipper]]:
+        """
+        啟用 VAD 時將 PCM 資料流包裝為略過長靜音的資料流
+        
+        返回:
+            (要送入辨識的 PCM 資料流, 靜音略過器)；未啟用時略過器為 None。
+            辨識結果的時間戳記須以略過器的 timeline 換算回原始時間軸。
+        """
+        if not self.vad_enabled:
+            return pcm_chunks, None
+        skipper = SilenceSkipper(sample_rate)
+        return skipper.filter(pcm_chunks), skipper
+    
+    @staticmethod
+    def _stage_timings(started: float, decoder, skipper: Optional[SilenceSkipper]) -> Dict[str, float]:
+        """
+        依解碼器等待輸出的時間與靜音略過器的處理時間，將轉錄耗時拆分為各階段
+        
+        參數:
+            started: 轉錄開始時的 time.perf_counter() 值
+            decoder: 使用的 FFmpegPCMDecoder
+            skipper: 使用的靜音略過器，未啟用 VAD 時為 None
+        """
+        wall_seconds = time.perf_counter() - started
+        timings = {"decode": decoder.read_seconds}
+        if skipper:
+            timings["vad"] = skipper.elapsed_seconds
+        timings["recognition"] = max(0.0, wall_seconds - sum(timings.values()))
+        return timings
+    
+    @staticmethod
+    def _shift_segments(segments: List[AudioSegment], offset: float) -> List[AudioSegment]:
+        """將只轉錄部分範圍時的片段時間戳記平移回整個檔案的時間軸"""
+        if offset:
+            for segment in segments:
+                for item in [segment, *segment.get("words", [])]:
+                    item["start"] += offset
+                    item["end"] += offset
+        return segments
     
 # 繼續 core/audio/transcriber.py 檔案
+import bisect
+import logging
 import os
-import tempfile
+import random
+import time
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import openai
+from typing import Iterable, Tuple
+
+from core.audio.chunking import iter_pcm_windows
+from core.audio.decoder import FFmpegPCMDecoder, encode_pcm
+from core.audio.whisper_client import WhisperHTTPClient
+
+logger = logging.getLogger(__name__)
 
 class WhisperTranscriber(BaseTranscriber):
     """使用OpenAI Whisper API的轉錄器實作"""
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "whisper-1"):
+    # Whisper API 單次上傳的檔案大小上限為 25 MB，保留緩衝空間
+    MAX_UPLOAD_BYTES = 24 * 1024 * 1024
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: str = "whisper-1",
+        api_base: Optional[str] = None,
+        max_chunk_seconds: float = 600.0,
+        max_concurrency: Optional[int] = None,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+        request_timeout: Optional[float] = None,
+        vad_enabled: Optional[bool] = None,
+        deadline_seconds: Optional[float] = None
+    ):
         """
         初始化Whisper轉錄器
         
         參數:
             api_key: OpenAI API金鑰，若為None則從環境變數獲取
             model: Whisper模型名稱
+            api_base: API 基礎網址，若為None則從環境變數 OPENAI_API_BASE 獲取
+            max_chunk_seconds: 每個上傳分段的最大長度（秒），實際切點選在附近的靜音處
+            max_concurrency: 單一檔案同時上傳的分段數量，若為None則從環境變數 WHISPER_MAX_CONCURRENCY 獲取
+            max_retries: 每個分段失敗後的最大重試次數
+            retry_backoff: 重試等待的基礎秒數，每次重試加倍
+            request_timeout: 單一請求的逾時秒數，若為None則使用共用用戶端的連線與讀取逾時
+            vad_enabled: 是否在上傳前略過長靜音（靜音不計費），若為None則從環境變數 VAD_ENABLED 獲取
+            deadline_seconds: 每次轉錄的總期限（秒），超過時停止上傳並拋出 TimeoutError，
+                0 表示不限制，若為None則從環境變數 WHISPER_DEADLINE_SECONDS 獲取
         """
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
         self.model = model
+        self.api_base = (api_base or os.environ.get("OPENAI_API_BASE", "https://api.openai.com/v1")).rstrip("/")
+        self.max_concurrency = max(1, int(
+            max_concurrency if max_concurrency is not None else os.environ.get("WHISPER_MAX_CONCURRENCY", 4)
+        ))
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.request_timeout = request_timeout
+        # Whisper 工作程序使用 threads 執行池，Celery 的時間限制不會生效，由此期限限制任務耗時
+        self.deadline_seconds = float(
+            deadline_seconds if deadline_seconds is not None else os.environ.get("WHISPER_DEADLINE_SECONDS", 3600)
+        )
+        if vad_enabled is not None:
+            self.vad_enabled = vad_enabled
+        # 程序內所有 Whisper 轉錄器共用同一個連線池與同時請求上限
+        self.client = WhisperHTTPClient.get_instance()
+        self.sample_rate = 16000  # 分段重新編碼前的解碼採樣率
+        self.chunk_bitrate = "32k"  # 分段重新編碼的位元率
+        # 以編碼後的位元率換算分段長度，確保每個分段都在上傳大小上限內
+        bytes_per_second = int(self.chunk_bitrate.rstrip("k")) * 1000 / 8
+        self.max_chunk_seconds = min(max_chunk_seconds, self.MAX_UPLOAD_BYTES / bytes_per_second * 0.9)
         self.initialized = False
     
+    def get_model_identifier(self) -> str:
+        """返回Whisper模型名稱"""
+        return self.model
+    
     def initialize(self) -> ServiceResult:
         """初始化OpenAI API連接"""
         try:
@@ -80,11 +222,8 @@ class WhisperTranscriber(BaseTranscriber):
                     "status_code": 400
                 }
             
-            # 設定API金鑰
-            openai.api_key = self.api_key
-            
-            # 簡單測試API連接
-            openai.Model.list()
+            # 簡單測試API連接（使用程序共用的連線池，後續上傳可重用同一連線）
+            self._check_api()
             
             self.initialized = True
             return {
@@ -99,8 +238,27 @@ class WhisperTranscriber(BaseTranscriber):
                 "status_code": 500
             }
     
-    def transcribe_file(self, audio_file: Path, language: Optional[str] = None) -> ServiceResult[TranscriptionResult]:
-        """使用Whisper API轉錄音訊檔案"""
+    def _check_api(self) -> None:
+        """呼叫模型列表端點確認金鑰與連線可用，失敗時拋出例外"""
+        response = self.client.get(
+            f"{self.api_base}/models",
+            headers={"Authorization": f"Bearer {self.api_key}"}
+        )
+        response.raise_for_status()
+    
+    def transcribe_file(
+        self,
+        audio_file: Path,
+        language: Optional[str] = None,
+        start: float = 0.0,
+        duration: Optional[float] = None
+    ) -> ServiceResult[TranscriptionResult]:
+        """
+        使用Whisper API轉錄音訊檔案
+        
+        音訊以串流方式解碼並在靜音處切分為大小受限的分段，每個分段重新編碼為低位元率 MP3 後
+        以執行緒池平行上傳，失敗時依指數退避重試，最後依各分段的起始時間合併片段。
+        """
         try:
             if not self.initialized:
                 init_result = self.initialize()
@@ -114,50 +272,8 @@ class WhisperTranscriber(BaseTranscriber):
                     "error": f"檔案不存在: {str(audio_file)}",
                     "status_code": 404
                 }
-                
-            # 準備API請求參數
-            params = {
-                "model": self.model,
-                "response_format": "verbose_json"
-            }
             
-            if language:
-                params["language"] = language
-                
-            # 呼叫Whisper API
-            with open(audio_file, "rb") as audio:
-                response = openai.Audio.transcribe(**params, file=audio)
-            
-            # 處理回應
-            text = response.get("text", "")
-            segments = []
-            
-            # 提取時間戳記片段
-            if "segments" in response:
-                for segment in response["segments"]:
-                    segments.append({
-                        "start": segment.get("start", 0),
-                        "end": segment.get("end", 0),
-                        "text": segment.get("text", ""),
-                        "speaker_id": None,  # Whisper不提供講者辨識
-                        "confidence": segment.get("confidence", 1.0)
-                    })
-            
-            # 計算音訊時長
-            duration = segments[-1]["end"] if segments else 0
-            
-            transcription_result = {
-                "text": text,
-                "segments": segments,
-                "language": language or response.get("language", ""),
-                "duration": duration
-            }
-            
-            return {
-                "success": True,
-                "data": transcription_result,
-                "status_code": 200
-            }
+            return self._transcribe_source(audio_file, language, start=start, duration=duration)
             
         except Exception as e:
             return {
@@ -166,22 +282,215 @@ class WhisperTranscriber(BaseTranscriber):
                 "status_code": 500
             }
     
-    def transcribe_stream(self, audio_stream: BinaryIO, format: AudioFormat, language: Optional[str] = None) -> ServiceResult[TranscriptionResult]:
-        """使用Whisper API轉錄音訊流"""
-        try:
-            # Whisper API不直接支援流，故將流保存為臨時檔案
-            with tempfile.NamedTemporaryFile(suffix=f'.{format}', delete=False) as temp_file:
-                temp_file_path = temp_file.name
-                audio_stream.seek(0)
-                temp_file.write(audio_stream.read())
+    def transcribe_chunks(self, chunks: Iterable[bytes], language: Optional[str] = None) -> Iterator[StreamEvent]:
+        """
+        串流轉錄：以區塊迭代器輸入任意格式的音訊，每完成一個上傳分段即依序產生該分段的 final 事件
+        
+        Whisper API 不提供暫定結果，因此只會產生 final 事件。
+        """
+        if not self.initialized:
+            init_result = self.initialize()
+            if not init_result["success"]:
+                raise RuntimeError(init_result.get("error", "Whisper轉錄器初始化失敗"))
+        
+        with self._create_decoder(chunks) as decoder:
+            pcm_chunks, skipper = self._skip_silence(decoder, self.sample_rate)
+            for _, offset, response in self._transcribe_chunks(pcm_chunks, language):
+                segments = self._response_segments(response, offset)
+                if skipper:
+                    skipper.timeline.map_segments(segments)
+                for segment in segments:
+                    yield {"type": "final", "text": segment["text"], "segment": segment}
+    
+    def _create_decoder(self, source, start: float = 0.0, duration: Optional[float] = None) -> FFmpegPCMDecoder:
+        """建立上傳分段使用的 PCM 解碼器"""
+        return FFmpegPCMDecoder(
+            source, sample_rate=self.sample_rate, chunk_size=self.sample_rate * 2 * 10,
+            start=start or None, duration=duration
+        )
+    
+    def _transcribe_source(
+        self,
+        source,
+        language: Optional[str],
+        start: float = 0.0,
+        duration: Optional[float] = None
+    ) -> ServiceResult[TranscriptionResult]:
+        """解碼音訊來源（檔案路徑或資料流，可指定時間範圍）並分段上傳，合併為完整的轉錄結果"""
+        started = time.perf_counter()
+        texts = []
+        segments = []
+        detected_language = ""
+        
+        with self._create_decoder(source, start, duration) as decoder:
+            # 略過長靜音後才切分上傳，分段時間為略過靜音後的時間
+            pcm_chunks, skipper = self._skip_silence(decoder, self.sample_rate)
             
-            # 使用檔案轉錄方法
-            result = self.transcribe_file(Path(temp_file_path), language)
+            # 依分段順序合併文本與片段
+            for _, offset, response in self._transcribe_chunks(pcm_chunks, language):
+                chunk_text = response.get("text", "").strip()
+                if chunk_text:
+                    texts.append(chunk_text)
+                detected_language = detected_language or response.get("language", "")
+                segments.extend(self._response_segments(response, offset))
+        
+        if skipper:
+            skipper.timeline.map_segments(segments)
+        self._shift_segments(segments, start)
+        
+        transcription_result = {
+            "text": " ".join(texts),
+            "segments": segments,
+            "language": language or detected_language,
+            "duration": decoder.decoded_duration,
+            "skipped_seconds": skipper.skipped_seconds if skipper else 0.0,
+            "stage_timings": self._stage_timings(started, decoder, skipper)
+        }
+        
+        return {
+            "success": True,
+            "data": transcription_result,
+            "status_code": 200
+        }
+    
+    @staticmethod
+    def _response_segments(response: Dict[str, Any], offset: float) -> List[AudioSegment]:
+        """
+        提取 API 回應中的時間戳記片段並加上分段起始時間
+        
+        回應包含詞層級時間戳記時，依詞的中點將詞分配到所屬片段（合併重疊分段時使用）。
+        """
+        segments = [
+            {
+                "start": segment.get("start", 0) + offset,
+                "end": segment.get("end", 0) + offset,
+                "text": segment.get("text", ""),
+                "speaker_id": None,  # Whisper不提供講者辨識
+                "confidence": segment.get("confidence", 1.0)
+            }
+            for segment in response.get("segments", [])
+        ]
+        words = response.get("words") or []
+        if segments and words:
+            starts = [segment["start"] for segment in segments]
+            for segment in segments:
+                segment["words"] = []
+            for word in words:
+                start = word.get("start", 0) + offset
+                end = word.get("end", 0) + offset
+                index = max(0, bisect.bisect_right(starts, (start + end) / 2) - 1)
+                segments[index]["words"].append({"word": word.get("word", "").strip(), "start": start, "end": end})
+        return segments
+    
+    def _transcribe_chunks(self, pcm_chunks: Iterable[bytes], language: Optional[str]) -> Iterator[Tuple[int, float, Dict[str, Any]]]:
+        """
+        將 PCM 資料流在靜音處切分為分段，以有上限的執行緒池平行上傳
+        
+        結果依分段順序產生；同時待處理的分段數量有上限，記憶體用量不隨音訊長度成長。
+        所有分段共用同一個期限（deadline_seconds），超過期限後尚未完成的分段不再上傳。
+        
+        返回:
+            依分段順序產生 (分段序號, 起始時間, API 回應) 的迭代器
+        """
+        max_pending = self.max_concurrency * 2
+        deadline = time.monotonic() + self.deadline_seconds if self.deadline_seconds > 0 else None
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            pending = deque()  # 依提交順序排列的 (分段, future)
             
-            # 刪除臨時檔案
-            os.unlink(temp_file_path)
+            windows = iter_pcm_windows(
+                pcm_chunks, self.sample_rate, window_seconds=self.max_chunk_seconds, overlap_seconds=0
+            )
+            for window in windows:
+                if not window.pcm:
+                    continue
+                pending.append((window, executor.submit(self._transcribe_chunk, window.pcm, language, deadline)))
+                
+                # 依序產生已完成的結果，待處理數量達上限時等待最早的分段
+                while pending and (pending[0][1].done() or len(pending) >= max_pending):
+                    window, future = pending.popleft()
+                    yield window.index, window.own_start, future.result()
             
-            return result
+            while pending:
+                window, future = pending.popleft()
+                yield window.index, window.own_start, future.result()
+    
+    def _transcribe_chunk(self, pcm: bytes, language: Optional[str], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        重新編碼單一分段並上傳，遇到網路錯誤、429 或 5xx 回應時以指數退避重試
+        
+        指定 deadline（time.monotonic() 的時間點）時，每次請求的讀取逾時不超過剩餘時間，
+        剩餘時間不足以等待重試或已超過期限時拋出 TimeoutError。
+        """
+        audio_bytes = encode_pcm(pcm, self.sample_rate, output_format="mp3", bitrate=self.chunk_bitrate)
+        if len(audio_bytes) > self.MAX_UPLOAD_BYTES:
+            raise ValueError(f"分段編碼後大小 {len(audio_bytes)} 位元組超過上傳上限")
+        
+        data = {
+            "model": self.model,
+            "response_format": "verbose_json",
+            # 詞層級時間戳記用於合併重疊轉錄的分段
+            "timestamp_granularities[]": ["word", "segment"]
+        }
+        if language:
+            data["language"] = language
+        
+        for attempt in range(self.max_retries + 1):
+            timeout = self._remaining_timeout(deadline)
+            try:
+                response = self.client.post(
+                    f"{self.api_base}/audio/transcriptions",
+                    headers={"Authorization": f"Bearer {self.api_key}"},
+                    data=data,
+                    files={"file": ("chunk.mp3", audio_bytes, "audio/mpeg")},
+                    timeout=timeout
+                )
+                retryable = response.status_code == 429 or response.status_code >= 500
+                if not retryable:
+                    response.raise_for_status()
+                    return response.json()
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+            except requests.RequestException as e:
+                if isinstance(e, requests.HTTPError):
+                    raise
+                error = str(e)
+            
+            if attempt < self.max_retries:
+                delay = self.retry_backoff * (2 ** attempt) * (1 + random.random() * 0.1)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise TimeoutError(f"Whisper 轉錄超過期限 {self.deadline_seconds:g} 秒: {error}")
+                logger.warning(f"Whisper 分段上傳失敗（第 {attempt + 1} 次），{delay:.1f} 秒後重試: {error}")
+                time.sleep(delay)
+        
+        raise RuntimeError(f"Whisper 分段上傳重試 {self.max_retries} 次後仍失敗: {error}")
+    
+    def _remaining_timeout(self, deadline: Optional[float]) -> Optional[Any]:
+        """
+        計算請求的逾時設定，讀取逾時不超過期限前的剩餘時間
+        
+        返回:
+            傳給 WhisperHTTPClient 的逾時；未指定期限時為 request_timeout（None 表示使用用戶端預設）
+        """
+        if deadline is None:
+            return self.request_timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Whisper 轉錄超過期限 {self.deadline_seconds:g} 秒")
+        if self.request_timeout is not None:
+            return min(self.request_timeout, remaining)
+        connect_timeout, read_timeout = self.client.timeout
+        return (min(connect_timeout, remaining), min(read_timeout, remaining))
+    
+    def transcribe_stream(self, audio_stream: BinaryIO, format: AudioFormat, language: Optional[str] = None) -> ServiceResult[TranscriptionResult]:
+        """使用Whisper API轉錄音訊流，資料流經由 ffmpeg stdin 直接解碼，不寫入臨時檔案"""
+        try:
+            if not self.initialized:
+                init_result = self.initialize()
+                if not init_result["success"]:
+                    return init_result
+            
+            rewind_stream(audio_stream)
+            return self._transcribe_source(audio_stream, language)
             
         except Exception as e:
             return {
@@ -198,34 +507,106 @@ class WhisperTranscriber(BaseTranscriber):
                 return init_result["success"]
             
             # 簡單檢查API連接
-            openai.Model.list()
+            self._check_api()
             return True
         except Exception:
             return False
         
 # 繼續 core/audio/transcriber.py 檔案
-import wave
+import itertools
 import json
 from pathlib import Path
 import os
 import tempfile
-from typing import Dict, Any, Optional, BinaryIO, List, Union
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Optional, BinaryIO, Iterable, List, Tuple, Union
+
+from vosk import KaldiRecognizer, SetLogLevel
+
+from core.audio.chunking import iter_pcm_windows, stitch_window_utterances
+from core.audio.decoder import FFmpegPCMDecoder
+from core.audio.model_pool import VoskModelPool
+from core.audio.streaming import VoskStreamSession
+from utils.type_definitions import AudioSegment
+
+
+def _init_window_worker(model_path: str) -> None:
+    """平行辨識工作程序的初始化函式，預先從模型池載入模型"""
+    SetLogLevel(-1)
+    VoskModelPool.get_model(model_path)
+
+
+def _recognize_window(model_path: str, sample_rate: int, pcm: bytes, offset: float) -> List[Dict[str, Any]]:
+    """
+    在工作程序中辨識單一 PCM 視窗
+    
+    參數:
+        model_path: Vosk 模型路徑
+        sample_rate: 採樣率
+        pcm: 16-bit 單聲道 PCM 資料
+        offset: 視窗起點在整段音訊中的時間（秒）
+        
+    返回:
+        語句列表，每個語句的 words 已換算為全域時間
+    """
+    rec = KaldiRecognizer(VoskModelPool.get_model(model_path), sample_rate)
+    rec.SetWords(True)
+    utterances = []
+    
+    def collect(result_json: Dict[str, Any]) -> None:
+        words = result_json.get("result") or []
+        if words:
+            utterances.append({
+                "words": [
+                    {
+                        "word": word.get("word", ""),
+                        "start": word.get("start", 0) + offset,
+                        "end": word.get("end", 0) + offset
+                    }
+                    for word in words
+                ]
+            })
+    
+    step = 8000  # 每次處理4000幀（16-bit）
+    for position in range(0, len(pcm), step):
+        if rec.AcceptWaveform(pcm[position:position + step]):
+            collect(json.loads(rec.Result()))
+    collect(json.loads(rec.FinalResult()))
+    
+    return utterances
 
-from vosk import Model, KaldiRecognizer, SetLogLevel
-from pydub import AudioSegment
 
 class VoskTranscriber(BaseTranscriber):
     """使用Vosk進行離線語音辨識的轉錄器實作"""
     
-    def __init__(self, model_path: Optional[str] = None, model_name: str = "vosk-model-zh-cn-0.22"):
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        model_name: str = "vosk-model-zh-cn-0.22",
+        parallel_workers: Optional[int] = None,
+        parallel_min_duration: float = 600.0,
+        vad_enabled: Optional[bool] = None
+    ):
         """
         初始化Vosk轉錄器
         
         參數:
             model_path: Vosk模型路徑，若為None則使用預設路徑
             model_name: 模型名稱，用於自動下載或從預設目錄尋找模型
+            parallel_workers: 平行辨識使用的程序數，若為None則從環境變數獲取，1 表示不平行處理
+            parallel_min_duration: 啟用平行辨識的最短音訊時長（秒）
+            vad_enabled: 是否在辨識前略過長靜音，若為None則從環境變數 VAD_ENABLED 獲取
         """
         self.model_name = model_name
+        self.parallel_workers = (
+            parallel_workers if parallel_workers is not None
+            else int(os.environ.get("VOSK_PARALLEL_WORKERS", 1))
+        )
+        self.parallel_min_duration = parallel_min_duration
+        if vad_enabled is not None:
+            self.vad_enabled = vad_enabled
+        self.parallel_window_seconds = 30.0
+        self.sample_rate = 16000  # 解碼後送入識別器的採樣率
         self.model_path = model_path or os.path.join(
             os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
             "models",
@@ -236,6 +617,10 @@ class VoskTranscriber(BaseTranscriber):
         self.initialized = False
         SetLogLevel(-1)  # 減少日誌輸出
     
+    def get_model_identifier(self) -> str:
+        """返回Vosk模型目錄名稱"""
+        return os.path.basename(os.path.normpath(self.model_path))
+    
     def initialize(self) -> ServiceResult:
         """初始化Vosk模型"""
         try:
@@ -252,8 +637,8 @@ class VoskTranscriber(BaseTranscriber):
                     "status_code": 404
                 }
             
-            # 加載模型
-            self.model = Model(self.model_path)
+            # 從程序層級模型池取得模型，同一工作程序內只會從磁碟載入一次
+            self.model = VoskModelPool.get_model(self.model_path)
             self.initialized = True
             
             return {
@@ -312,161 +697,170 @@ class VoskTranscriber(BaseTranscriber):
             if os.path.exists(temp_zip):
                 os.unlink(temp_zip)
     
-    def transcribe_file(self, audio_file: Path, language: Optional[str] = None) -> ServiceResult[TranscriptionResult]:
-        """使用Vosk轉錄音訊檔案"""
+    def transcribe_file(
+        self,
+        audio_file: Path,
+        language: Optional[str] = None,
+        start: float = 0.0,
+        duration: Optional[float] = None
+    ) -> ServiceResult[TranscriptionResult]:
+        """使用Vosk轉錄音訊檔案（可指定時間範圍）"""
         try:
             if not self.initialized:
                 init_result = self.initialize()
                 if not init_result["success"]:
                     return init_result
             
-            # 確保音訊為WAV格式
-            temp_wav = None
-            wav_file_path = str(audio_file)
+            # 檢查檔案是否存在
+            if not audio_file.exists():
+                return {
+                    "success": False,
+                    "error": f"檔案不存在: {str(audio_file)}",
+                    "status_code": 404
+                }
             
-            if not str(audio_file).lower().endswith('.wav'):
-                # 使用pydub轉換格式
-                audio = AudioSegment.from_file(str(audio_file))
-                temp_wav = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-                wav_file_path = temp_wav.name
-                audio.export(wav_file_path, format='wav')
-                
-            # 打開WAV檔案
-            with wave.open(wav_file_path, "rb") as wf:
-                # 檢查音訊格式
-                if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
-                    # 若非單聲道16-bit PCM，需要轉換
-                    audio = AudioSegment.from_file(wav_file_path)
-                    audio = audio.set_channels(1)  # 轉換為單聲道
-                    audio = audio.set_sample_width(2)  # 設定為16-bit
-                    
-                    if temp_wav:
-                        temp_wav.close()
-                    
-                    temp_wav = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-                    wav_file_path = temp_wav.name
-                    audio.export(wav_file_path, format='wav', parameters=["-acodec", "pcm_s16le"])
-                    
-                    # 重新打開轉換後的檔案
-                    wf.close()
-                    wf = wave.open(wav_file_path, "rb")
+            # 以 ffmpeg 管線直接解碼為 16 kHz 單聲道 16-bit PCM，不產生臨時檔案
+            started = time.perf_counter()
+            with FFmpegPCMDecoder(audio_file, sample_rate=self.sample_rate, start=start or None, duration=duration) as decoder:
+                pcm_chunks = iter(decoder)
                 
-                # 創建識別器
-                sample_rate = wf.getframerate()
-                rec = KaldiRecognizer(self.model, sample_rate)
-                rec.SetWords(True)  # 啟用詞級時間戳記
+                # 先緩衝開頭的音訊以判斷長度，短音訊不值得啟動程序池
+                head_chunks = []
+                if self.parallel_workers > 1:
+                    head_limit = self.parallel_min_duration * self.sample_rate * 2
+                    for chunk in pcm_chunks:
+                        head_chunks.append(chunk)
+                        if decoder.bytes_read >= head_limit:
+                            break
+                is_long_audio = self.parallel_workers > 1 and decoder.decoded_duration >= self.parallel_min_duration
+                pcm_chunks, skipper = self._skip_silence(itertools.chain(head_chunks, pcm_chunks), self.sample_rate)
                 
-                # 存儲結果
-                result_text = ""
-                segments = []
-                
-                # 處理音訊
-                chunk_size = 4000  # 每次處理4000幀
-                last_end_time = 0
-                
-                while True:
-                    data = wf.readframes(chunk_size)
-                    if len(data) == 0:
-                        break
-                    
-                    if rec.AcceptWaveform(data):
-                        result_json = json.loads(rec.Result())
-                        
-                        # 提取文本
-                        segment_text = result_json.get("text", "").strip()
-                        if segment_text:
-                            result_text += segment_text + " "
-                            
-                            # 提取詞級時間戳記
-                            if "result" in result_json and result_json["result"]:
-                                words = result_json["result"]
-                                start_time = words[0].get("start", last_end_time)
-                                end_time = words[-1].get("end", start_time + 1.0)
-                                
-                                # 更新最後的結束時間
-                                last_end_time = end_time
-                                
-                                # 添加片段
-                                segments.append({
-                                    "start": start_time,
-                                    "end": end_time,
-                                    "text": segment_text,
-                                    "speaker_id": None,  # Vosk不提供講者辨識
-                                    "confidence": 1.0  # Vosk不提供置信度
-                                })
-                
-                # 處理最後的部分結果
-                final_result = json.loads(rec.FinalResult())
-                final_text = final_result.get("text", "").strip()
-                
-                if final_text:
-                    result_text += final_text
-                    
-                    # 提取最後部分的詞級時間戳記
-                    if "result" in final_result and final_result["result"]:
-                        words = final_result["result"]
-                        start_time = words[0].get("start", last_end_time)
-                        end_time = words[-1].get("end", start_time + 1.0)
-                        
-                        # 添加最後片段
-                        segments.append({
-                            "start": start_time,
-                            "end": end_time,
-                            "text": final_text,
-                            "speaker_id": None,
-                            "confidence": 1.0
-                        })
+                if is_long_audio:
+                    # 長音訊：依靜音切分視窗並以多程序平行辨識
+                    result_text, segments = self._recognize_parallel(pcm_chunks, self.sample_rate)
+                else:
+                    result_text, segments = self._recognize_sequential(pcm_chunks, self.sample_rate)
                 
                 # 計算音訊持續時間
-                duration = float(wf.getnframes()) / sample_rate
-                
-                # 清理臨時檔案
-                if temp_wav:
-                    temp_wav.close()
-                    os.unlink(wav_file_path)
-                
-                # 創建轉錄結果
-                transcription_result = {
-                    "text": result_text.strip(),
-                    "segments": segments,
-                    "language": language or "zh-TW",  # 預設使用繁體中文
-                    "duration": duration
-                }
-                
-                return {
-                    "success": True,
-                    "data": transcription_result,
-                    "status_code": 200
-                }
-                
+                decoded_duration = decoder.decoded_duration
+            
+            if skipper:
+                skipper.timeline.map_segments(segments)
+            self._shift_segments(segments, start)
+            
+            # 創建轉錄結果
+            transcription_result = {
+                "text": result_text.strip(),
+                "segments": segments,
+                "language": language or "zh-TW",  # 預設使用繁體中文
+                "duration": decoded_duration,
+                "skipped_seconds": skipper.skipped_seconds if skipper else 0.0,
+                "stage_timings": self._stage_timings(started, decoder, skipper)
+            }
+            
+            return {
+                "success": True,
+                "data": transcription_result,
+                "status_code": 200
+            }
+            
         except Exception as e:
-            # 清理臨時檔案
-            if temp_wav and os.path.exists(temp_wav.name):
-                temp_wav.close()
-                os.unlink(temp_wav.name)
-                
             return {
                 "success": False,
                 "error": f"Vosk轉錄失敗: {str(e)}",
                 "status_code": 500
             }
     
+    def _recognize_sequential(self, pcm_chunks: Iterable[bytes], sample_rate: int) -> Tuple[str, List[AudioSegment]]:
+        """以單一識別器依序辨識 PCM 資料流"""
+        session = VoskStreamSession(self.model, sample_rate, emit_partials=False)
+        
+        # 存儲結果
+        texts = []
+        segments = []
+        for event in self._iter_session_events(session, pcm_chunks, raw_pcm=True):
+            texts.append(event["text"])
+            if event["segment"]:
+                segments.append(event["segment"])
+        
+        return " ".join(texts), segments
+
+    def _recognize_parallel(self, pcm_chunks: Iterable[bytes], sample_rate: int) -> Tuple[str, List[AudioSegment]]:
+        """
+        將 PCM 資料流依靜音切分為重疊視窗，以程序池平行辨識後依全域時間軸合併
+        
+        同時待處理的視窗數量有上限，記憶體用量不隨音訊長度成長。
+        """
+        window_results = {}
+        max_pending = self.parallel_workers * 2
+        
+        with ProcessPoolExecutor(
+            max_workers=self.parallel_workers,
+            initializer=_init_window_worker,
+            initargs=(self.model_path,)
+        ) as executor:
+            pending = {}
+            
+            def collect(futures) -> None:
+                for future in futures:
+                    window = pending.pop(future)
+                    window_results[window.index] = {
+                        "own_start": window.own_start,
+                        "own_end": window.own_end,
+                        "utterances": future.result()
+                    }
+            
+            windows = iter_pcm_windows(pcm_chunks, sample_rate, window_seconds=self.parallel_window_seconds)
+            for window in windows:
+                future = executor.submit(
+                    _recognize_window, self.model_path, sample_rate, window.pcm, window.start_sample / sample_rate
+                )
+                pending[future] = window
+                
+                if len(pending) >= max_pending:
+                    done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                    collect(done)
+            
+            collect(list(pending))
+        
+        segments = stitch_window_utterances([window_results[index] for index in sorted(window_results)])
+        result_text = " ".join(segment["text"] for segment in segments)
+        
+        return result_text, segments
+    
     def transcribe_stream(self, audio_stream: BinaryIO, format: AudioFormat, language: Optional[str] = None) -> ServiceResult[TranscriptionResult]:
-        """使用Vosk轉錄音訊流"""
+        """使用Vosk轉錄音訊流，資料流經由 ffmpeg stdin 直接解碼，不寫入臨時檔案"""
         try:
-            # Vosk需要WAV格式，故將流保存為臨時檔案
-            with tempfile.NamedTemporaryFile(suffix=f'.{format}', delete=False) as temp_file:
-                temp_file_path = temp_file.name
-                audio_stream.seek(0)
-                temp_file.write(audio_stream.read())
+            if not self.initialized:
+                init_result = self.initialize()
+                if not init_result["success"]:
+                    return init_result
             
-            # 使用檔案轉錄方法
-            result = self.transcribe_file(Path(temp_file_path), language)
+            rewind_stream(audio_stream)
             
-            # 刪除臨時檔案
-            os.unlink(temp_file_path)
+            started = time.perf_counter()
+            with FFmpegPCMDecoder(iter_binary_chunks(audio_stream), sample_rate=self.sample_rate) as decoder:
+                pcm_chunks, skipper = self._skip_silence(decoder, self.sample_rate)
+                result_text, segments = self._recognize_sequential(pcm_chunks, self.sample_rate)
+                duration = decoder.decoded_duration
             
-            return result
+            if skipper:
+                skipper.timeline.map_segments(segments)
+            
+            transcription_result = {
+                "text": result_text,
+                "segments": segments,
+                "language": language or "zh-TW",  # 預設使用繁體中文
+                "duration": duration,
+                "skipped_seconds": skipper.skipped_seconds if skipper else 0.0,
+                "stage_timings": self._stage_timings(started, decoder, skipper)
+            }
+            
+            return {
+                "success": True,
+                "data": transcription_result,
+                "status_code": 200
+            }
             
         except Exception as e:
             return {
@@ -475,6 +869,43 @@ class VoskTranscriber(BaseTranscriber):
                 "status_code": 500
             }
     
+    def transcribe_chunks(
+        self,
+        chunks: Iterable[bytes],
+        language: Optional[str] = None,
+        raw_pcm: bool = False,
+        emit_partials: bool = True
+    ) -> Iterator[StreamEvent]:
+        """
+        串流轉錄：逐塊接收音訊並在辨識過程中即時產生 partial 與 final 事件
+        
+        記憶體用量固定，與串流長度無關，可用於課堂即時字幕。
+        
+        參數:
+            chunks: 音訊資料的位元組區塊迭代器
+            language: 音訊語言代碼（Vosk 由模型決定語言，此參數僅供介面一致）
+            raw_pcm: 為 True 時 chunks 已是採樣率為 self.sample_rate 的 16-bit 單聲道 PCM，不經 ffmpeg 解碼
+            emit_partials: 是否產生暫定文字事件
+        """
+        if not self.initialized:
+            init_result = self.initialize()
+            if not init_result["success"]:
+                raise RuntimeError(init_result.get("error", "Vosk轉錄器初始化失敗"))
+        
+        session = VoskStreamSession(self.model, self.sample_rate, emit_partials=emit_partials)
+        yield from self._iter_session_events(session, chunks, raw_pcm)
+    
+    def _iter_session_events(self, session: VoskStreamSession, chunks: Iterable[bytes], raw_pcm: bool) -> Iterator[StreamEvent]:
+        """將音訊區塊（必要時先經 ffmpeg 解碼）送入辨識工作階段並產生事件"""
+        decoder = None if raw_pcm else FFmpegPCMDecoder(chunks, sample_rate=self.sample_rate)
+        try:
+            for pcm in (chunks if decoder is None else decoder):
+                yield from session.accept_pcm(pcm)
+            yield from session.finish()
+        finally:
+            if decoder is not None:
+                decoder.close()
+    
     def health_check(self) -> bool:
         """檢查Vosk服務狀態"""
         try:
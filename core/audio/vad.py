@@ -0,0 +1,217 @@
+"""
+語音活動偵測（VAD）模組。
+
+以向量化的音框能量區分語音與靜音，在辨識前移除 PCM 資料流中較長的靜音（下課、分組討論等），
+並記錄移除後的時間軸與原始時間軸的對應，讓辨識結果的時間戳記可以換算回原始音訊。
+"""
+import bisect
+import os
+import time
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from core.audio.chunking import SAMPLE_WIDTH, frame_rms
+from utils.type_definitions import AudioSegment
+
+# 是否在辨識前略過靜音
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "True") == "True"
+
+# 音框能量低於此值（dBFS）視為靜音
+VAD_THRESHOLD_DB = float(os.environ.get("VAD_THRESHOLD_DB", -45))
+
+# 連續靜音達到此長度（秒）才會被略過
+VAD_MIN_SILENCE_SECONDS = float(os.environ.get("VAD_MIN_SILENCE_SECONDS", 2.0))
+
+# 略過靜音時在語音前後保留的長度（秒），避免切掉字首字尾
+VAD_PADDING_SECONDS = float(os.environ.get("VAD_PADDING_SECONDS", 0.3))
+
+
+class TimelineMap:
+    """略過靜音後的（壓縮）時間軸與原始時間軸的對應"""
+
+    def __init__(self):
+        # 每個連續區間在壓縮時間軸與原始時間軸上的起點（秒），依時間排序
+        self._compact_starts: List[float] = [0.0]
+        self._original_starts: List[float] = [0.0]
+
+    def add_gap(self, compact_time: float, original_time: float) -> None:
+        """記錄壓縮時間 compact_time 之後的音訊從原始時間 original_time 開始（兩者之間的靜音已被移除）"""
+        if compact_time <= self._compact_starts[-1]:
+            self._compact_starts[-1] = compact_time
+            self._original_starts[-1] = original_time
+        else:
+            self._compact_starts.append(compact_time)
+            self._original_starts.append(original_time)
+
+    @property
+    def gap_count(self) -> int:
+        """被移除的靜音區間數量（不含開頭）"""
+        return len(self._compact_starts) - 1
+
+    def to_original(self, time: float, is_end: bool = False) -> float:
+        """
+        將壓縮時間軸上的時間換算為原始時間
+
+        參數:
+            time: 壓縮時間軸上的時間（秒）
+            is_end: 是否為片段終點；終點剛好落在區間交界時歸屬前一個區間
+        """
+        if is_end:
+            index = bisect.bisect_left(self._compact_starts, time) - 1
+        else:
+            index = bisect.bisect_right(self._compact_starts, time) - 1
+        index = max(0, index)
+        return time - self._compact_starts[index] + self._original_starts[index]
+
+    def map_segments(self, segments: List[AudioSegment]) -> List[AudioSegment]:
+        """將片段（及其詞）的起訖時間就地換算為原始時間，並返回同一列表"""
+        for segment in segments:
+            for item in [segment, *segment.get("words", [])]:
+                item["start"] = self.to_original(item["start"])
+                item["end"] = self.to_original(item["end"], is_end=True)
+        return segments
+
+
+class SilenceSkipper:
+    """
+    串流式靜音略過器
+
+    逐塊接收 16-bit 單聲道 PCM，每個資料塊內的音框能量以 numpy 一次計算，
+    依語音/靜音交替的區段處理：短於 min_silence_seconds 的靜音原樣保留，
+    較長的靜音只保留與語音相鄰的 padding_seconds，其餘移除並記錄於 timeline。
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        threshold_db: Optional[float] = None,
+        min_silence_seconds: Optional[float] = None,
+        padding_seconds: Optional[float] = None,
+        frame_seconds: float = 0.03
+    ):
+        """
+        初始化靜音略過器
+
+        參數:
+            sample_rate: PCM 採樣率
+            threshold_db: 靜音門檻（dBFS），若為None則使用 VAD_THRESHOLD_DB
+            min_silence_seconds: 被略過的最短靜音長度（秒），若為None則使用 VAD_MIN_SILENCE_SECONDS
+            padding_seconds: 在語音前後保留的靜音長度（秒），若為None則使用 VAD_PADDING_SECONDS
+            frame_seconds: 能量判斷的音框長度（秒）
+        """
+        threshold_db = VAD_THRESHOLD_DB if threshold_db is None else threshold_db
+        min_silence_seconds = VAD_MIN_SILENCE_SECONDS if min_silence_seconds is None else min_silence_seconds
+        padding_seconds = VAD_PADDING_SECONDS if padding_seconds is None else padding_seconds
+
+        self.sample_rate = sample_rate
+        self.frame_samples = max(1, int(sample_rate * frame_seconds))
+        self.frame_bytes = self.frame_samples * SAMPLE_WIDTH
+        self.threshold = 32768 * 10 ** (threshold_db / 20)  # 以 int16 振幅表示的 RMS 門檻
+        self.min_silence_frames = max(1, round(min_silence_seconds / frame_seconds))
+        self.padding_bytes = min(round(padding_seconds / frame_seconds), self.min_silence_frames // 2) * self.frame_bytes
+        self.timeline = TimelineMap()
+
+        self.input_samples = 0  # 已分類的原始取樣數
+        self.output_samples = 0  # 已輸出的取樣數
+        self.elapsed_seconds = 0.0  # 能量計算與區段處理的累計時間
+        self._remainder = bytearray()  # 不足一個音框的資料
+        self._silence = bytearray()  # 目前靜音區段中尚未決定是否輸出的資料
+        self._silence_frames = 0  # 目前靜音區段的音框數
+        self._after_speech = False  # 目前靜音區段前方是否有語音
+        self._skipping = False  # 目前靜音區段是否已確定被略過
+
+    @property
+    def skipped_seconds(self) -> float:
+        """已略過的靜音長度（秒）"""
+        return (self.input_samples - self.output_samples) / self.sample_rate
+
+    def filter(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        移除 PCM 資料流中的長靜音
+
+        參數:
+            chunks: 16-bit 單聲道 PCM 位元組區塊的迭代器
+
+        返回:
+            移除長靜音後的 PCM 區塊迭代器
+        """
+        for chunk in chunks:
+            self._remainder.extend(chunk)
+            usable = len(self._remainder) // self.frame_bytes * self.frame_bytes
+            if not usable:
+                continue
+            block = bytes(self._remainder[:usable])
+            del self._remainder[:usable]
+
+            started = time.perf_counter()
+            output = self._process_block(block)
+            self.elapsed_seconds += time.perf_counter() - started
+            if output:
+                yield output
+
+        output = self._finish()
+        if output:
+            yield output
+
+    def _process_block(self, block: bytes) -> bytes:
+        """分類一個由完整音框組成的資料塊，返回應輸出的資料"""
+        is_speech = frame_rms(np.frombuffer(block, dtype=np.int16), self.frame_samples) >= self.threshold
+
+        # 找出語音/靜音交替的區段
+        changes = np.flatnonzero(np.diff(is_speech.astype(np.int8))) + 1
+        starts = np.concatenate(([0], changes))
+        ends = np.concatenate((changes, [len(is_speech)]))
+
+        output = bytearray()
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            data = block[start * self.frame_bytes:end * self.frame_bytes]
+            if is_speech[start]:
+                self._on_speech(data, output)
+            else:
+                self._on_silence(data, end - start, output)
+            self.input_samples += len(data) // SAMPLE_WIDTH
+        return bytes(output)
+
+    def _on_speech(self, data: bytes, output: bytearray) -> None:
+        if self._skipping:
+            # 前方的長靜音已被移除，保留的前導靜音從原始時間軸的此處開始
+            resume_sample = self.input_samples - len(self._silence) // SAMPLE_WIDTH
+            self.timeline.add_gap(self.output_samples / self.sample_rate, resume_sample / self.sample_rate)
+            self._skipping = False
+        self._emit(self._silence, output)
+        self._emit(data, output)
+        self._silence = bytearray()
+        self._silence_frames = 0
+        self._after_speech = True
+
+    def _on_silence(self, data: bytes, frame_count: int, output: bytearray) -> None:
+        self._silence_frames += frame_count
+        self._silence.extend(data)
+
+        if not self._skipping and self._silence_frames >= self.min_silence_frames:
+            # 確定為長靜音：輸出接在前一段語音後的 padding，之後只保留最後 padding 作為下一段語音的前導
+            if self._after_speech:
+                self._emit(self._silence[:self.padding_bytes], output)
+            self._skipping = True
+
+        if self._skipping:
+            keep = self.padding_bytes
+            del self._silence[:max(0, len(self._silence) - keep)]
+
+    def _finish(self) -> bytes:
+        """處理結尾不足一個音框的資料與最後的靜音區段"""
+        output = bytearray()
+        tail = bytes(self._remainder)
+        self._remainder = bytearray()
+        if not self._skipping:
+            self._emit(self._silence, output)
+            self._emit(tail, output)
+        self.input_samples += len(tail) // SAMPLE_WIDTH
+        self._silence = bytearray()
+        self._silence_frames = 0
+        return bytes(output)
+
+    def _emit(self, data, output: bytearray) -> None:
+        output.extend(data)
+        self.output_samples += len(data) // SAMPLE_WIDTH
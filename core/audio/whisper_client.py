@@ -0,0 +1,198 @@
+"""
+Whisper API 的 HTTP 用戶端模組。
+
+每個工作程序只建立一個 requests.Session，以 keep-alive 連線池讓程序內所有 Whisper
+請求共用 TCP/TLS 連線，並以共用的號誌限制同時進行的請求數；同時記錄連線重用率
+與請求延遲百分位數，供監控調整。
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+
+class _ConnectionCountingAdapter(HTTPAdapter):
+    """記錄實際建立新連線次數的 HTTPAdapter"""
+
+    def __init__(self, *args, **kwargs):
+        self.new_connections = 0
+        self._count_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        adapter = self
+
+        def counting(pool_class):
+            class CountingConnectionPool(pool_class):
+                def _new_conn(self):
+                    with adapter._count_lock:
+                        adapter.new_connections += 1
+                    return super()._new_conn()
+            return CountingConnectionPool
+
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: counting(pool_class)
+            for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+
+class WhisperHTTPClient:
+    """程序層級共用的 Whisper API HTTP 用戶端"""
+
+    # 計算延遲百分位數時保留的最近請求數
+    LATENCY_WINDOW = 1000
+
+    _instance: Optional["WhisperHTTPClient"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None
+    ):
+        """
+        初始化 HTTP 用戶端
+
+        參數:
+            max_concurrency: 程序內同時進行的請求上限，同時也是連線池大小，
+                若為None則從環境變數 WHISPER_MAX_CONCURRENCY 獲取
+            connect_timeout: 建立連線的逾時秒數，若為None則從環境變數 WHISPER_CONNECT_TIMEOUT 獲取
+            read_timeout: 等待回應的逾時秒數，若為None則從環境變數 WHISPER_READ_TIMEOUT 獲取
+        """
+        self.max_concurrency = max(1, int(
+            max_concurrency if max_concurrency is not None else os.environ.get("WHISPER_MAX_CONCURRENCY", 4)
+        ))
+        self.timeout = (
+            float(connect_timeout if connect_timeout is not None else os.environ.get("WHISPER_CONNECT_TIMEOUT", 10)),
+            float(read_timeout if read_timeout is not None else os.environ.get("WHISPER_READ_TIMEOUT", 300))
+        )
+        self.pid = os.getpid()
+
+        # 重試由呼叫端依請求語意處理，連線池本身不重試
+        self._adapter = _ConnectionCountingAdapter(
+            pool_connections=4,
+            pool_maxsize=self.max_concurrency,
+            max_retries=0
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._metrics_lock = threading.Lock()
+        self._request_count = 0
+        self._error_count = 0
+        self._in_flight = 0
+        self._latencies = deque(maxlen=self.LATENCY_WINDOW)
+
+    @classmethod
+    def get_instance(cls) -> "WhisperHTTPClient":
+        """
+        取得目前程序共用的用戶端
+
+        fork 後的子程序不可沿用父程序的連線，因此程序 ID 不同時會建立新的用戶端。
+        """
+        with cls._instance_lock:
+            if cls._instance is None or cls._instance.pid != os.getpid():
+                cls._instance = cls()
+                logger.info(
+                    f"建立 Whisper HTTP 用戶端: 同時請求上限 {cls._instance.max_concurrency}, "
+                    f"逾時 {cls._instance.timeout}"
+                )
+            return cls._instance
+
+    @classmethod
+    def reset_instance(cls) -> None:
+        """關閉並移除共用的用戶端（主要用於測試或調整設定後重建）"""
+        with cls._instance_lock:
+            if cls._instance is not None:
+                cls._instance.close()
+            cls._instance = None
+
+    def request(self, method: str, url: str, timeout: Optional[Any] = None, **kwargs) -> requests.Response:
+        """
+        送出 HTTP 請求，超過同時請求上限時會等待
+
+        參數:
+            method: HTTP 方法
+            url: 完整網址
+            timeout: 逾時設定，若為None則使用用戶端的 (連線, 讀取) 逾時
+            **kwargs: 傳給 requests.Session.request 的其他參數
+
+        返回:
+            requests.Response
+        """
+        with self._semaphore:
+            with self._metrics_lock:
+                self._in_flight += 1
+            started = time.perf_counter()
+            failed = True
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+                failed = response.status_code >= 500
+                return response
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._metrics_lock:
+                    self._in_flight -= 1
+                    self._request_count += 1
+                    self._error_count += int(failed)
+                    self._latencies.append(elapsed)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        取得用戶端統計資料
+
+        返回:
+            包含請求數、錯誤數、新建連線數、連線重用率、進行中請求數
+            與最近請求延遲百分位數（毫秒）的字典
+        """
+        with self._metrics_lock:
+            request_count = self._request_count
+            latencies = sorted(self._latencies)
+            metrics = {
+                "requests": request_count,
+                "errors": self._error_count,
+                "in_flight": self._in_flight,
+            }
+        new_connections = self._adapter.new_connections
+        metrics["new_connections"] = new_connections
+        metrics["connection_reuse_rate"] = (
+            max(0.0, 1 - new_connections / request_count) if request_count else 0.0
+        )
+        metrics["latency_ms"] = {
+            name: percentile(latencies, q) * 1000
+            for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+        }
+        return metrics
+
+    def log_metrics(self) -> None:
+        """將統計資料寫入日誌"""
+        metrics = self.get_metrics()
+        latency = metrics["latency_ms"]
+        logger.info(
+            f"Whisper HTTP 用戶端統計: 請求 {metrics['requests']} 次, 錯誤 {metrics['errors']} 次, "
+            f"新建連線 {metrics['new_connections']} 次, 連線重用率 {metrics['connection_reuse_rate']:.1%}, "
+            f"延遲 p50/p90/p99 = {latency['p50']:.0f}/{latency['p90']:.0f}/{latency['p99']:.0f} ms"
+        )
+
+    def close(self) -> None:
+        """關閉連線池"""
+        self.session.close()
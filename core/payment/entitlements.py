@@ -0,0 +1,124 @@
+"""
+使用者權益快取，將訂閱計劃、計劃配額與使用者偏好解析為一個物件並快取。
+
+配額檢查、佇列路由與模型選擇在同一個任務中都需要使用者的計劃，改為共用快取的解析結果，
+不必各自讀取 UserProfile。快取分兩層：各程序的本地記憶體（Django 預設快取）與可選的
+共用快取（設定 ENTITLEMENTS_CACHE_URL 時使用 Redis）。UserProfile 儲存時清除兩層快取；
+其他程序的本地快取無法即時清除，以較短的 ENTITLEMENTS_LOCAL_TTL 限制過期時間。
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from apps.accounts.models import UserProfile
+
+# 解析方式或欄位改變時遞增，讓快取的舊物件失效
+ENTITLEMENTS_VERSION = 1
+
+SHARED_CACHE_ALIAS = "shared"
+
+
+@dataclass(frozen=True)
+class Entitlements:
+    """使用者已解析的權益"""
+    user_id: int
+    plan: str
+    # 服務類型 -> 計劃配額（來自 QuotaManager.PLAN_QUOTAS）
+    plan_quotas: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    monthly_quota: Dict[str, Any] = field(default_factory=dict)
+    used_quota: Dict[str, Any] = field(default_factory=dict)
+
+    def plan_quota(self, service_type: str) -> Dict[str, Any]:
+        """取得指定服務的計劃配額，計劃不提供此服務時返回空字典"""
+        return self.plan_quotas.get(str(getattr(service_type, "value", service_type)), {})
+
+    def preference(self, key: str) -> Optional[str]:
+        """取得使用者的模型偏好設定（存放於 monthly_quota）"""
+        return self.monthly_quota.get(key)
+
+
+def _cache_key(user_id: int) -> str:
+    return f"entitlements:v{ENTITLEMENTS_VERSION}:{user_id}"
+
+
+def _shared_cache():
+    """共用快取，未設定時返回 None"""
+    if SHARED_CACHE_ALIAS in settings.CACHES:
+        return caches[SHARED_CACHE_ALIAS]
+    return None
+
+
+def _resolve(user_id: int) -> Entitlements:
+    """讀取 UserProfile 並解析權益"""
+    from core.payment.quota import QuotaManager
+
+    plan, monthly_quota, used_quota = UserProfile.objects.values_list(
+        "subscription_plan", "monthly_quota", "used_quota"
+    ).get(user_id=user_id)
+    plan_quotas = {
+        service_type.value: dict(quota)
+        for service_type, quota in QuotaManager.PLAN_QUOTAS.get(plan, {}).items()
+    }
+    return Entitlements(
+        user_id=user_id,
+        plan=plan,
+        plan_quotas=plan_quotas,
+        monthly_quota=monthly_quota or {},
+        used_quota=used_quota or {},
+    )
+
+
+def get_entitlements(user_id: int) -> Entitlements:
+    """
+    取得使用者的權益，依序查詢本地快取、共用快取，都未命中時讀取資料庫
+
+    參數:
+        user_id: 使用者 ID
+
+    返回:
+        Entitlements 實例
+
+    例外:
+        UserProfile.DoesNotExist: 使用者或配置檔不存在
+    """
+    key = _cache_key(user_id)
+    local = caches["default"]
+    local_ttl = getattr(settings, "ENTITLEMENTS_LOCAL_TTL", 30)
+
+    entitlements = local.get(key)
+    if entitlements is not None:
+        return entitlements
+
+    shared = _shared_cache()
+    if shared is not None:
+        entitlements = shared.get(key)
+        if entitlements is not None:
+            local.set(key, entitlements, local_ttl)
+            return entitlements
+
+    entitlements = _resolve(user_id)
+    if shared is not None:
+        shared.set(key, entitlements, getattr(settings, "ENTITLEMENTS_CACHE_TTL", 300))
+    local.set(key, entitlements, local_ttl)
+    return entitlements
+
+
+def invalidate_entitlements(user_id: int) -> None:
+    """
+    清除使用者的權益快取
+
+    在交易中呼叫時，除了立即清除，交易提交後會再清除一次，
+    避免其他程序在提交前讀到舊資料並重新寫回快取。
+    """
+    def delete():
+        key = _cache_key(user_id)
+        caches["default"].delete(key)
+        shared = _shared_cache()
+        if shared is not None:
+            shared.delete(key)
+
+    delete()
+    transaction.on_commit(delete)
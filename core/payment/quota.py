@@ -1,13 +1,15 @@
 """
 使用配額管理系統，提供免費和付費服務之間的界限控制。
 """
+import logging
 from typing import Dict, Any, Tuple, Optional
 from enum import Enum
-from datetime import datetime, timedelta
 from django.contrib.auth import get_user_model
-from apps.accounts.models import UserProfile, UsageLog
+from apps.accounts.models import UserProfile, UsageLog, UsageCounter, QuotaReservation
+from core.payment.entitlements import get_entitlements
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 class ServiceType(str, Enum):
     """服務類型枚舉"""
@@ -96,11 +98,68 @@ class QuotaManager:
         },
     }
     
+    @classmethod
+    def _check_plan(cls, user_id: int, service_type: ServiceType, **kwargs) -> Tuple[bool, str, int]:
+        """
+        依訂閱計劃檢查服務是否啟用、內容類型、檔案大小與音訊時長限制（不含每月使用量）
+        
+        返回:
+            (是否允許, 訊息, 每月上限)，每月上限為負值表示無限制
+        """
+        entitlements = get_entitlements(user_id)
+        plan = entitlements.plan
+        
+        # 獲取計劃配額
+        plan_quota = entitlements.plan_quota(service_type)
+        
+        # 檢查服務是否啟用
+        if not plan_quota.get("enabled", False):
+            return False, f"您的帳戶類型 ({plan}) 不支援此服務。", 0
+        
+        # 檢查內容類型限制
+        if service_type == ServiceType.CONTENT_GENERATION:
+            content_type = kwargs.get("content_type")
+            allowed_types = plan_quota.get("allowed_types", [])
+            if content_type not in allowed_types:
+                return False, f"您的帳戶類型 ({plan}) 不支援生成 {content_type} 內容。", 0
+        
+        # 檢查檔案大小限制
+        if service_type == ServiceType.AUDIO_TRANSCRIPTION and "file_size" in kwargs:
+            file_size = kwargs.get("file_size", 0)
+            max_size = plan_quota.get("file_size_limit", 0)
+            if max_size > 0 and file_size > max_size:
+                max_mb = max_size / (1024 * 1024)
+                return False, f"檔案過大。您的帳戶類型最大支援 {max_mb:.0f}MB 的檔案。", 0
+        
+        # 檢查音訊時長限制
+        if service_type in [ServiceType.AUDIO_TRANSCRIPTION, ServiceType.SPEAKER_IDENTIFICATION] and "duration" in kwargs:
+            duration = kwargs.get("duration", 0)
+            max_duration = plan_quota.get("max_duration", 0)
+            if max_duration > 0 and duration > max_duration:
+                max_min = max_duration / 60
+                return False, f"音訊時長過長。您的帳戶類型最大支援 {max_min:.0f}分鐘 的音訊。", 0
+        
+        # 0 與負值皆不限制每月使用量
+        monthly_limit = plan_quota.get("monthly_limit", 0)
+        return True, "允許使用服務", monthly_limit if monthly_limit > 0 else -1
+    
+    @staticmethod
+    def _limit_message(monthly_limit: int) -> str:
+        return f"您已達到本月使用限制 ({monthly_limit} 次)。請下個月再試或升級您的帳戶。"
+    
+    @staticmethod
+    def _missing_profile_message(user_id: int) -> str:
+        if not User.objects.filter(id=user_id).exists():
+            return "使用者不存在"
+        return "使用者配置檔不存在"
+    
     @classmethod
     def check_quota(cls, user_id: int, service_type: ServiceType, **kwargs) -> Tuple[bool, str]:
         """
         檢查使用者是否有足夠的配額使用服務。
         
+        只讀取不佔用名額，適合在上傳前提示使用者；實際執行服務前應以 reserve_quota 佔用名額。
+        
         參數:
             user_id: 使用者ID
             service_type: 服務類型
@@ -113,64 +172,124 @@ class QuotaManager:
             (是否允許, 訊息)
         """
         try:
-            user = User.objects.get(id=user_id)
-            profile = UserProfile.objects.get(user=user)
-            plan = profile.subscription_plan
-            
-            # 獲取計劃配額
-            plan_quota = cls.PLAN_QUOTAS.get(plan, {}).get(service_type, {})
-            
-            # 檢查服務是否啟用
-            if not plan_quota.get("enabled", False):
-                return False, f"您的帳戶類型 ({plan}) 不支援此服務。"
-            
-            # 檢查內容類型限制
-            if service_type == ServiceType.CONTENT_GENERATION:
-                content_type = kwargs.get("content_type")
-                allowed_types = plan_quota.get("allowed_types", [])
-                if content_type not in allowed_types:
-                    return False, f"您的帳戶類型 ({plan}) 不支援生成 {content_type} 內容。"
-            
-            # 檢查檔案大小限制
-            if service_type == ServiceType.AUDIO_TRANSCRIPTION and "file_size" in kwargs:
-                file_size = kwargs.get("file_size", 0)
-                max_size = plan_quota.get("file_size_limit", 0)
-                if max_size > 0 and file_size > max_size:
-                    max_mb = max_size / (1024 * 1024)
-                    return False, f"檔案過大。您的帳戶類型最大支援 {max_mb:.0f}MB 的檔案。"
-            
-            # 檢查音訊時長限制
-            if service_type in [ServiceType.AUDIO_TRANSCRIPTION, ServiceType.SPEAKER_IDENTIFICATION] and "duration" in kwargs:
-                duration = kwargs.get("duration", 0)
-                max_duration = plan_quota.get("max_duration", 0)
-                if max_duration > 0 and duration > max_duration:
-                    max_min = max_duration / 60
-                    return False, f"音訊時長過長。您的帳戶類型最大支援 {max_min:.0f}分鐘 的音訊。"
+            allowed, message, monthly_limit = cls._check_plan(user_id, service_type, **kwargs)
+            if not allowed:
+                return False, message
             
             # 檢查每月使用量限制
-            monthly_limit = plan_quota.get("monthly_limit", 0)
             if monthly_limit > 0:
-                # 計算本月使用量
-                now = datetime.now()
-                month_start = datetime(now.year, now.month, 1)
-                month_usage = UsageLog.objects.filter(
-                    user=user,
-                    service_type=service_type,
-                    created_at__gte=month_start
-                ).count()
+                # 本月使用量（含保留中）：讀取月度計數（唯一索引單點查詢）
+                month_usage = UsageCounter.get_count(user_id, service_type, include_reserved=True)
                 
                 if month_usage >= monthly_limit:
-                    return False, f"您已達到本月使用限制 ({monthly_limit} 次)。請下個月再試或升級您的帳戶。"
+                    return False, cls._limit_message(monthly_limit)
             
-            return True, "允許使用服務"
+            return True, message
             
-        except User.DoesNotExist:
-            return False, "使用者不存在"
         except UserProfile.DoesNotExist:
-            return False, "使用者配置檔不存在"
+            return False, cls._missing_profile_message(user_id)
         except Exception as e:
             return False, f"配額檢查錯誤: {str(e)}"
     
+    @classmethod
+    def reserve_quota(cls, user_id: int, service_type: ServiceType, resource_id: Optional[int] = None,
+                      **kwargs) -> Tuple[bool, str, Optional[int]]:
+        """
+        檢查配額並原子地佔用一次每月名額。
+        
+        名額在計數資料列的鎖內判定，並行任務不會同時通過最後一個名額；不同使用者互不阻塞。
+        服務完成時以 commit_quota 提交，失敗時以 release_quota 歸還。
+        
+        參數:
+            user_id: 使用者ID
+            service_type: 服務類型
+            resource_id: 資源ID，同一資源重複保留（例如任務重試）時沿用既有保留
+            **kwargs: 同 check_quota
+        
+        返回:
+            (是否允許, 訊息, 保留ID)
+        """
+        try:
+            allowed, message, monthly_limit = cls._check_plan(user_id, service_type, **kwargs)
+            if not allowed:
+                return False, message, None
+            
+            reservation = QuotaReservation.reserve(
+                user_id,
+                service_type,
+                limit=monthly_limit,
+                resource_id=resource_id
+            )
+            if reservation is None:
+                return False, cls._limit_message(monthly_limit), None
+            
+            return True, message, reservation.id
+            
+        except UserProfile.DoesNotExist:
+            return False, cls._missing_profile_message(user_id), None
+        except Exception as e:
+            return False, f"配額檢查錯誤: {str(e)}", None
+    
+    @staticmethod
+    def _find_reservation(user_id: int, service_type: ServiceType, reservation_id: Optional[int],
+                          resource_id: Optional[int]) -> Optional[QuotaReservation]:
+        """依保留ID，或依資源ID找出保留中的配額"""
+        if reservation_id is not None:
+            return QuotaReservation.objects.filter(id=reservation_id).first()
+        if resource_id is not None:
+            return QuotaReservation.find_active(user_id, service_type, resource_id)
+        return None
+    
+    @classmethod
+    def commit_quota(cls, user_id: int, service_type: ServiceType, reservation_id: Optional[int] = None,
+                     **kwargs) -> None:
+        """
+        提交保留的名額並記錄使用日誌。
+        
+        未指定 reservation_id 時依 resource_id 找出保留；找不到保留時（例如未經 reserve_quota
+        的呼叫端）直接記錄使用。重複提交同一保留不會重複記錄。
+        
+        參數:
+            user_id: 使用者ID
+            service_type: 服務類型
+            reservation_id: reserve_quota 返回的保留ID
+            **kwargs: 同 log_usage
+        """
+        try:
+            reservation = cls._find_reservation(user_id, service_type, reservation_id, kwargs.get("resource_id"))
+            if reservation is None:
+                cls.log_usage(user_id, service_type, **kwargs)
+                return
+            
+            reservation.commit(
+                kwargs.get("operation", service_type),
+                tokens_used=kwargs.get("tokens_used", 0),
+                model_name=kwargs.get("model_name", ""),
+                audio_duration=kwargs.get("duration"),
+                skipped_duration=kwargs.get("skipped_duration"),
+            )
+            
+        except Exception as e:
+            # 記錄錯誤但不影響主流程
+            logger.exception(f"配額提交錯誤: {str(e)}")
+    
+    @classmethod
+    def release_quota(cls, user_id: int, service_type: ServiceType, reservation_id: Optional[int] = None,
+                      resource_id: Optional[int] = None) -> bool:
+        """
+        歸還保留的名額（服務失敗時呼叫）。
+        
+        返回:
+            是否有保留被釋放
+        """
+        try:
+            reservation = cls._find_reservation(user_id, service_type, reservation_id, resource_id)
+            return reservation.release() if reservation is not None else False
+            
+        except Exception as e:
+            logger.exception(f"配額釋放錯誤: {str(e)}")
+            return False
+    
     @classmethod
     def log_usage(cls, user_id: int, service_type: ServiceType, **kwargs) -> None:
         """
@@ -185,21 +304,20 @@ class QuotaManager:
                 - tokens_used: 使用的token數量
                 - model_name: 模型名稱
                 - duration: 音訊時長(秒)
+                - skipped_duration: 辨識前略過的靜音時長(秒)
         """
         try:
-            user = User.objects.get(id=user_id)
-            
-            log_data = {
-                "user": user,
-                "service_type": service_type,
-                "operation": kwargs.get("operation", service_type),
-                "resource_id": kwargs.get("resource_id"),
-                "tokens_used": kwargs.get("tokens_used", 0),
-                "model_name": kwargs.get("model_name", ""),
-                "audio_duration": kwargs.get("duration"),
-            }
-            
-            UsageLog.objects.create(**log_data)
+            # 日誌與月度計數在同一交易中寫入
+            UsageLog.log_usage(
+                user_id,
+                service_type,
+                kwargs.get("operation", service_type),
+                resource_id=kwargs.get("resource_id"),
+                tokens_used=kwargs.get("tokens_used", 0),
+                model_name=kwargs.get("model_name", ""),
+                audio_duration=kwargs.get("duration"),
+                skipped_duration=kwargs.get("skipped_duration"),
+            )
             
         except Exception as e:
             # 記錄錯誤但不影響主流程
@@ -0,0 +1,172 @@
+/**
+ * 課堂即時字幕模組
+ * 擷取麥克風音訊，轉換為 16kHz 16-bit PCM 後透過 WebSocket 傳送，並顯示伺服器回傳的字幕
+ */
+
+class LiveCaptionClient {
+    /**
+     * 初始化即時字幕用戶端
+     * @param {Object} options - 設定選項
+     */
+    constructor(options = {}) {
+        this.endpoint = options.endpoint || '/ws/live-caption/';
+        this.title = options.title || '';
+        this.sampleRate = options.sampleRate || 16000;
+        this.frameMs = options.frameMs || 100; // 每個傳送訊框的長度（毫秒）
+
+        // 顯示元素
+        this.captionSelector = options.captionSelector || '.live-caption-final';
+        this.partialSelector = options.partialSelector || '.live-caption-partial';
+
+        // 回調函數
+        this.onReady = options.onReady || (() => {});
+        this.onFinal = options.onFinal || this.defaultFinalHandler.bind(this);
+        this.onPartial = options.onPartial || this.defaultPartialHandler.bind(this);
+        this.onClose = options.onClose || (() => {});
+        this.onError = options.onError || ((message) => console.error(`即時字幕錯誤: ${message}`));
+
+        this.socket = null;
+        this.stream = null;
+        this.audioContext = null;
+        this.processor = null;
+        this.pending = [];
+        this.pendingLength = 0;
+    }
+
+    /**
+     * 建立連線並開始擷取麥克風
+     */
+    async start() {
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const params = new URLSearchParams({ title: this.title, sample_rate: this.sampleRate });
+        this.socket = new WebSocket(`${protocol}//${window.location.host}${this.endpoint}?${params}`);
+        this.socket.binaryType = 'arraybuffer';
+        this.socket.onmessage = (event) => this.handleMessage(JSON.parse(event.data));
+        this.socket.onclose = (event) => {
+            this.releaseAudio();
+            if (event.code === 4401) {
+                this.onError('請先登入');
+            } else if (event.code === 1013) {
+                this.onError('目前即時字幕連線數已滿，請稍後再試');
+            }
+            this.onClose(event);
+        };
+
+        this.stream = await navigator.mediaDevices.getUserMedia({ audio: { channelCount: 1 } });
+        this.audioContext = new (window.AudioContext || window.webkitAudioContext)();
+        const source = this.audioContext.createMediaStreamSource(this.stream);
+        this.processor = this.audioContext.createScriptProcessor(4096, 1, 1);
+        this.processor.onaudioprocess = (event) => this.handleAudio(event.inputBuffer.getChannelData(0));
+        source.connect(this.processor);
+        this.processor.connect(this.audioContext.destination);
+    }
+
+    /**
+     * 停止擷取，送出剩餘音訊並通知伺服器結束
+     */
+    stop() {
+        this.flush();
+        this.releaseAudio();
+        if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+            this.socket.send(JSON.stringify({ type: 'stop' }));
+        }
+    }
+
+    /**
+     * 釋放麥克風與音訊處理資源
+     */
+    releaseAudio() {
+        if (this.processor) {
+            this.processor.disconnect();
+            this.processor = null;
+        }
+        if (this.audioContext) {
+            this.audioContext.close();
+            this.audioContext = null;
+        }
+        if (this.stream) {
+            this.stream.getTracks().forEach(track => track.stop());
+            this.stream = null;
+        }
+    }
+
+    /**
+     * 降採樣並累積音訊，滿一個訊框即傳送
+     * @param {Float32Array} samples - 麥克風原始採樣
+     */
+    handleAudio(samples) {
+        const ratio = this.audioContext.sampleRate / this.sampleRate;
+        const length = Math.floor(samples.length / ratio);
+        const pcm = new Int16Array(length);
+        for (let i = 0; i < length; i++) {
+            const value = Math.max(-1, Math.min(1, samples[Math.floor(i * ratio)]));
+            pcm[i] = value < 0 ? value * 0x8000 : value * 0x7fff;
+        }
+        this.pending.push(pcm);
+        this.pendingLength += length;
+
+        if (this.pendingLength >= this.sampleRate * this.frameMs / 1000) {
+            this.flush();
+        }
+    }
+
+    /**
+     * 傳送累積的 PCM 資料
+     */
+    flush() {
+        if (!this.pendingLength || !this.socket || this.socket.readyState !== WebSocket.OPEN) {
+            return;
+        }
+        const frame = new Int16Array(this.pendingLength);
+        let offset = 0;
+        this.pending.forEach(chunk => {
+            frame.set(chunk, offset);
+            offset += chunk.length;
+        });
+        this.pending = [];
+        this.pendingLength = 0;
+        this.socket.send(frame.buffer);
+    }
+
+    /**
+     * 處理伺服器訊息
+     * @param {Object} message - 伺服器訊息
+     */
+    handleMessage(message) {
+        switch (message.type) {
+            case 'ready':
+                this.onReady(message);
+                break;
+            case 'partial':
+                this.onPartial(message.text);
+                break;
+            case 'final':
+                this.onFinal(message);
+                break;
+            case 'error':
+                this.onError(message.message);
+                break;
+        }
+    }
+
+    defaultPartialHandler(text) {
+        const element = document.querySelector(this.partialSelector);
+        if (element) {
+            element.textContent = text;
+        }
+    }
+
+    defaultFinalHandler(message) {
+        const container = document.querySelector(this.captionSelector);
+        if (container) {
+            const line = document.createElement('p');
+            line.textContent = message.text;
+            container.appendChild(line);
+            container.scrollTop = container.scrollHeight;
+        }
+        this.defaultPartialHandler('');
+    }
+}
+
+// 匯出為全域物件
+window.LiveCaptionClient = LiveCaptionClient;
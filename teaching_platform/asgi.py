@@ -3,6 +3,8 @@ ASGI config for teaching_platform project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+HTTP 請求交由 Django 處理；WebSocket 連線依路徑分派，目前提供課堂即時字幕端點。
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -13,4 +15,25 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'teaching_platform.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# 須在 Django 初始化之後匯入
+from apps.audio_manager.live import live_caption_application  # noqa: E402
+
+# WebSocket 路徑與對應的 ASGI 應用程式
+websocket_routes = {
+    '/ws/live-caption/': live_caption_application,
+}
+
+
+async def application(scope, receive, send):
+    """依連線類型分派至 Django 或 WebSocket 應用程式"""
+    if scope['type'] == 'websocket':
+        handler = websocket_routes.get(scope['path'])
+        if handler is None:
+            await receive()
+            await send({'type': 'websocket.close', 'code': 4404})
+            return
+        await handler(scope, receive, send)
+        return
+    await django_application(scope, receive, send)
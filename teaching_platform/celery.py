@@ -1,9 +1,25 @@
 # teaching_platform/celery.py
 """
 Celery 配置檔案，針對 Windows 環境進行優化。
+
+音訊任務依工作負載類型分送到不同佇列，每個佇列由各自的工作程序服務：
+
+    celery -A teaching_platform worker -Q metadata -P prefork -n metadata@%h
+    celery -A teaching_platform worker -Q short -P prefork -n short@%h
+    celery -A teaching_platform worker -Q transcription -P prefork -n transcription@%h
+    celery -A teaching_platform worker -Q whisper -P threads -n whisper@%h
+    celery -A teaching_platform worker -Q speaker -P prefork -n speaker@%h
+    celery -A teaching_platform worker -Q priority -P prefork -n priority@%h
+
+工作程序啟動時依 WORKER_PROFILES 套用該佇列的並發數與時間限制（命令列參數優先）；
+執行池類型需以 -P 指定，與設定不符時會記錄警告。
 """
 import os
+import logging
 from celery import Celery
+from celery.concurrency import get_implementation
+from celery.signals import celeryd_init, worker_process_init, worker_process_shutdown
+from kombu import Queue
 import platform
 
 # 設定 Django 設定模組
@@ -37,9 +53,212 @@ if platform.system() == 'Windows':
     # 設定結果後端為文件系統或數據庫（避免使用 Redis 作為結果後端）
     # app.conf.result_backend = 'db+sqlite:///celery-results.sqlite'
 
+# 音訊任務名稱
+PROCESS_AUDIO_TASK = 'apps.audio_manager.tasks.process_audio_file'
+TRANSCRIBE_TASK = 'apps.audio_manager.tasks.transcribe_audio_file'
+CHUNK_TASK = 'apps.audio_manager.tasks.transcribe_chunk'
+FINALIZE_TASK = 'apps.audio_manager.tasks.finalize_transcription'
+SPEAKER_TASK = 'apps.audio_manager.tasks.identify_speakers'
+
+# 各佇列工作程序的執行池、並發數與時間限制（秒）
+WORKER_PROFILES = {
+    # 只讀取容器標頭，耗時短
+    'metadata': {'pool': 'prefork', 'concurrency': 4, 'soft_time_limit': 60, 'time_limit': 120},
+    # 預估耗時短的轉錄與講者辨識，不必排在數小時的長任務之後
+    'short': {'pool': 'prefork', 'concurrency': 2, 'soft_time_limit': 600, 'time_limit': 900},
+    # Vosk 離線轉錄，CPU 密集，並發數等於 CPU 核心數
+    'transcription': {'pool': 'prefork', 'concurrency': os.cpu_count() or 1, 'soft_time_limit': 4 * 3600, 'time_limit': 4 * 3600 + 600},
+    # Whisper API 轉錄，主要在等待網路回應，以執行緒提高並發。
+    # threads 執行池不支援時間限制，以下兩項不會生效（僅作為其他執行池的參考值）；
+    # 實際期限由 WhisperTranscriber 的 HTTP 逾時與 WHISPER_DEADLINE_SECONDS 總期限控制
+    'whisper': {'pool': 'threads', 'concurrency': 16, 'soft_time_limit': 3600, 'time_limit': 3900},
+    # 講者辨識，CPU 與記憶體用量較高
+    'speaker': {'pool': 'prefork', 'concurrency': 2, 'soft_time_limit': 1800, 'time_limit': 2100},
+    # 進階方案使用者的所有轉錄與講者辨識任務
+    'priority': {'pool': 'prefork', 'concurrency': 2, 'soft_time_limit': 4 * 3600, 'time_limit': 4 * 3600 + 600},
+}
+
+# 需要 Vosk 模型的佇列，其他佇列的工作程序不預先載入模型
+VOSK_QUEUES = {'short', 'transcription', 'priority'}
+
+# 任務名稱對應的預設佇列
+TASK_QUEUES = {
+    PROCESS_AUDIO_TASK: 'metadata',
+    TRANSCRIBE_TASK: 'transcription',
+    CHUNK_TASK: 'transcription',
+    # 合併分段結果只有資料庫寫入
+    FINALIZE_TASK: 'short',
+    SPEAKER_TASK: 'speaker',
+}
+
+# 不依方案與預估耗時選擇佇列的任務
+FIXED_QUEUE_TASKS = {PROCESS_AUDIO_TASK, FINALIZE_TASK}
+
+app.conf.task_default_queue = 'celery'
+app.conf.task_queues = [Queue('celery')] + [Queue(name) for name in WORKER_PROFILES]
+
+# 本工作程序服務的佇列，於 celeryd_init 時設定，子程序繼承
+worker_queues = set()
+
+
+def estimate_task_seconds(engine, audio_duration):
+    """
+    以每秒音訊的處理秒數估計任務耗時
+
+    參數:
+        engine: 'vosk'、'whisper' 或 'speaker'
+        audio_duration: 音訊長度（秒）
+    """
+    from django.conf import settings
+
+    factors = getattr(settings, 'TASK_REALTIME_FACTORS', {})
+    return (audio_duration or 0) * factors.get(engine, 1.0)
+
+
+def select_audio_queue(task_name, audio_file_id, default, transcriber_type=None):
+    """
+    依音訊檔案的擁有者方案與預估耗時選擇轉錄或講者辨識任務的佇列
+
+    參數:
+        task_name: 任務名稱
+        audio_file_id: 音訊檔案的 ID
+        default: 無法判斷時使用的佇列
+        transcriber_type: 任務已決定的轉錄器類型（分段任務），None 表示依方案與音訊長度選擇
+
+    返回:
+        佇列名稱
+    """
+    from django.conf import settings
+    from apps.audio_manager.models import AudioFile
+
+    from apps.accounts.models import UserProfile
+    from core.payment.entitlements import get_entitlements
+
+    info = AudioFile.objects.filter(id=audio_file_id).values('duration', 'user_id').first()
+    if not info:
+        return default
+
+    try:
+        plan = get_entitlements(info['user_id']).plan
+    except UserProfile.DoesNotExist:
+        plan = None
+    if plan in getattr(settings, 'PRIORITY_QUEUE_PLANS', []):
+        return 'priority'
+
+    duration = info['duration'] or 0
+    if task_name == CHUNK_TASK:
+        # 分段轉錄任務只處理一個分段
+        duration = min(duration, getattr(settings, 'TRANSCRIPTION_CHUNK_SECONDS', 600))
+    if task_name in (TRANSCRIBE_TASK, CHUNK_TASK):
+        if transcriber_type:
+            # 分段任務沿用整個檔案選定的轉錄器，不以分段長度重新選擇
+            engine = transcriber_type
+        else:
+            from apps.audio_manager.tasks import select_transcriber_type
+
+            engine = select_transcriber_type(info['user_id'], duration)
+        queue = 'whisper' if engine == 'whisper' else 'transcription'
+    else:
+        engine = 'speaker'
+        queue = default
+
+    if estimate_task_seconds(engine, duration) <= getattr(settings, 'TASK_SHORT_MAX_SECONDS', 120):
+        return 'short'
+    return queue
+
+
+def route_audio_task(name, args, kwargs, options, task=None, **kw):
+    """
+    Celery 任務路由：元數據與合併任務使用固定佇列，轉錄與講者辨識任務依方案與預估耗時選擇佇列
+
+    呼叫 apply_async 時明確指定的 queue 優先於此路由。
+    """
+    default = TASK_QUEUES.get(name)
+    if default is None or name in FIXED_QUEUE_TASKS:
+        return {'queue': default} if default else None
+
+    kwargs = kwargs or {}
+    audio_file_id = args[0] if args else kwargs.get('audio_file_id')
+    transcriber_type = None
+    if name == CHUNK_TASK:
+        # transcribe_chunk(audio_file_id, index, transcriber_type, language)
+        transcriber_type = args[2] if len(args) > 2 else kwargs.get('transcriber_type')
+    try:
+        queue = select_audio_queue(name, audio_file_id, default, transcriber_type)
+    except Exception as e:
+        # 路由失敗不應阻擋任務送出
+        logging.getLogger(__name__).warning(f"任務路由失敗，使用預設佇列 {default}: {e}")
+        queue = default
+    return {'queue': queue}
+
+
+app.conf.task_routes = (route_audio_task,)
+
 # 自動從所有已註冊的 Django 應用程式中發現任務
 app.autodiscover_tasks()
 
+@celeryd_init.connect
+def apply_worker_profile(sender=None, conf=None, options=None, **kwargs):
+    """工作程序啟動時依服務的佇列套用並發數與時間限制，命令列已指定的參數不覆寫"""
+    logger = logging.getLogger(__name__)
+    queues = (options or {}).get('queues') or []
+    if isinstance(queues, str):
+        queues = queues.split(',')
+    worker_queues.update(queue.strip() for queue in queues if queue.strip())
+
+    profiles = [WORKER_PROFILES[queue] for queue in worker_queues if queue in WORKER_PROFILES]
+    if not profiles or platform.system() == 'Windows':
+        return
+
+    if options.get('concurrency') is None:
+        conf.worker_concurrency = max(profile['concurrency'] for profile in profiles)
+    if options.get('soft_time_limit') is None:
+        conf.task_soft_time_limit = max(profile['soft_time_limit'] for profile in profiles)
+    if options.get('time_limit') is None:
+        conf.task_time_limit = max(profile['time_limit'] for profile in profiles)
+
+    pool_cls = options.get('pool_cls')
+    expected = {profile['pool'] for profile in profiles}
+    if pool_cls is not None and pool_cls not in {get_implementation(pool) for pool in expected}:
+        logger.warning(f"佇列 {', '.join(sorted(worker_queues))} 建議使用 -P {'/'.join(sorted(expected))}，目前為 {pool_cls.__module__}")
+
+@worker_process_init.connect
+def warm_vosk_models(**kwargs):
+    """工作程序啟動時預先載入 Vosk 模型至程序層級模型池"""
+    from django.conf import settings
+    from core.audio.model_pool import VoskModelPool
+    from core.audio.transcriber import TranscriberFactory
+
+    logger = logging.getLogger(__name__)
+    if worker_queues and not worker_queues & VOSK_QUEUES:
+        return
+    VoskModelPool.configure(memory_budget_mb=getattr(settings, 'VOSK_MODEL_POOL_BUDGET_MB', None))
+
+    for model_name in getattr(settings, 'VOSK_PRELOAD_MODELS', []):
+        transcriber = TranscriberFactory.create_transcriber('vosk', model_name=model_name)
+        result = transcriber.initialize()
+        if result["success"]:
+            logger.info(f"已預先載入 Vosk 模型: {model_name}")
+        else:
+            logger.warning(f"預先載入 Vosk 模型失敗: {model_name}, {result.get('error')}")
+
+@worker_process_shutdown.connect
+def log_whisper_client_metrics(**kwargs):
+    """工作程序結束時記錄 Whisper HTTP 用戶端的連線重用率與延遲統計"""
+    from core.audio.whisper_client import WhisperHTTPClient
+
+    client = WhisperHTTPClient._instance
+    if client is not None and client.pid == os.getpid():
+        client.log_metrics()
+        client.close()
+
+@worker_process_shutdown.connect
+def flush_usage_events(**kwargs):
+    """工作程序結束時寫入緩衝區中的使用事件（prefork 子程序以 os._exit 結束，不會執行 atexit）"""
+    from apps.accounts.services import usage_buffer
+
+    usage_buffer.stop()
+
 @app.task(bind=True)
 def debug_task(self):
     """測試任務，用於確認 Celery 是否正常運行"""
@@ -108,6 +108,83 @@ CELERY_TASK_ACKS_LATE = True  # 確保任務在完成後才確認
 CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # 減少預取，提高穩定性
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True  # 解決棄用警告
 
+# Celery 任務路由設定（佇列與各佇列工作程序的設定見 teaching_platform/celery.py）
+TASK_SHORT_MAX_SECONDS = float(os.environ.get('TASK_SHORT_MAX_SECONDS', 120))  # 預估處理時間不超過此秒數的任務送往 short 佇列
+TASK_REALTIME_FACTORS = {
+    'vosk': float(os.environ.get('TASK_REALTIME_FACTOR_VOSK', 0.5)),
+    'whisper': float(os.environ.get('TASK_REALTIME_FACTOR_WHISPER', 0.15)),
+    'speaker': float(os.environ.get('TASK_REALTIME_FACTOR_SPEAKER', 0.05)),
+}  # 每秒音訊預估所需的處理秒數，用於估計任務耗時
+PRIORITY_QUEUE_PLANS = [
+    plan.strip() for plan in os.environ.get('PRIORITY_QUEUE_PLANS', 'premium').split(',')
+    if plan.strip()
+]  # 轉錄與講者辨識任務改送 priority 佇列的訂閱計劃
+
+# Vosk 模型池設定（每個工作程序各自維護一份模型池）
+VOSK_MODEL_POOL_BUDGET_MB = int(os.environ.get('VOSK_MODEL_POOL_BUDGET_MB', 2048))  # 模型池記憶體預算
+VOSK_PRELOAD_MODELS = [
+    name.strip() for name in os.environ.get('VOSK_PRELOAD_MODELS', 'vosk-model-zh-cn-0.22').split(',')
+    if name.strip()
+]  # 工作程序啟動時預先載入的模型
+
+# 長音訊分段轉錄設定，各分段結果保存為檢查點，重試時只重新轉錄未完成的分段
+TRANSCRIPTION_CHUNK_SECONDS = float(os.environ.get('TRANSCRIPTION_CHUNK_SECONDS', 600))  # 每個分段的長度（秒）
+TRANSCRIPTION_CHUNK_OVERLAP_SECONDS = float(os.environ.get('TRANSCRIPTION_CHUNK_OVERLAP_SECONDS', 15))  # 分段前後額外解碼的長度（秒）
+
+# 轉錄片段批次寫入的每批筆數
+TRANSCRIPT_SEGMENT_BATCH_SIZE = int(os.environ.get('TRANSCRIPT_SEGMENT_BATCH_SIZE', 1000))
+
+# 上傳處理器：上傳時同步計算內容雜湊值，供轉錄快取比對重複檔案
+FILE_UPLOAD_HANDLERS = [
+    'utils.file_handlers.HashingMemoryFileUploadHandler',
+    'utils.file_handlers.HashingTemporaryFileUploadHandler',
+]
+
+# 相同內容的音訊重複上傳時直接複製既有轉錄結果
+TRANSCRIPTION_CACHE_ENABLED = os.environ.get('TRANSCRIPTION_CACHE_ENABLED', 'True') == 'True'
+
+# 課堂即時字幕（ASGI WebSocket）設定，每個 ASGI 工作程序各自套用
+LIVE_CAPTION_MODEL = os.environ.get('LIVE_CAPTION_MODEL', 'vosk-model-zh-cn-0.22')  # 即時字幕使用的 Vosk 模型
+LIVE_CAPTION_MAX_SESSIONS = int(os.environ.get('LIVE_CAPTION_MAX_SESSIONS', 48))  # 同時進行的即時字幕連線上限
+LIVE_CAPTION_THREADS = int(os.environ.get('LIVE_CAPTION_THREADS', 8))  # 執行辨識的執行緒數
+LIVE_CAPTION_PERSIST_BATCH_SIZE = int(os.environ.get('LIVE_CAPTION_PERSIST_BATCH_SIZE', 20))  # 累積多少個片段寫入一次資料庫
+LIVE_CAPTION_PERSIST_INTERVAL = float(os.environ.get('LIVE_CAPTION_PERSIST_INTERVAL', 5.0))  # 片段寫入資料庫的最長間隔（秒）
+
+# 音訊處理效能指標（/audio/metrics/，Prometheus 文字格式）
+METRICS_ALLOWED_IPS = [
+    ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+    if ip.strip()
+]  # 允許抓取指標的來源位址
+PIPELINE_METRICS_WINDOW = int(os.environ.get('PIPELINE_METRICS_WINDOW', 500))  # 計算指標時取樣的最近記錄數
+
+# 快取設定：各程序的本地記憶體快取，設定 ENTITLEMENTS_CACHE_URL 時另以 Redis 作為跨程序的共用快取
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'teaching-platform',
+    },
+}
+ENTITLEMENTS_CACHE_URL = os.environ.get('ENTITLEMENTS_CACHE_URL', '')
+if ENTITLEMENTS_CACHE_URL:
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': ENTITLEMENTS_CACHE_URL,
+    }
+ENTITLEMENTS_CACHE_TTL = int(os.environ.get('ENTITLEMENTS_CACHE_TTL', 300))  # 使用者權益在共用快取的保存秒數
+ENTITLEMENTS_LOCAL_TTL = int(os.environ.get('ENTITLEMENTS_LOCAL_TTL', 30))  # 使用者權益在本地快取的保存秒數（其他程序的變更最多延遲此秒數生效）
+
+# 配額保留：任務開始前佔用每月名額，完成時提交、失敗時釋放
+QUOTA_RESERVATION_TTL = int(os.environ.get('QUOTA_RESERVATION_TTL', 6 * 60 * 60))  # 未提交的保留逾時釋放的秒數
+
+# 使用事件寫入緩衝：被追蹤的視圖只將事件放入程序內緩衝區，之後批次寫入使用日誌與配額
+USAGE_BUFFER_ENABLED = os.environ.get('USAGE_BUFFER_ENABLED', 'True') == 'True'
+USAGE_BUFFER_BATCH_SIZE = int(os.environ.get('USAGE_BUFFER_BATCH_SIZE', 100))  # 累積多少筆事件時立即寫入
+USAGE_BUFFER_FLUSH_INTERVAL = float(os.environ.get('USAGE_BUFFER_FLUSH_INTERVAL', 5.0))  # 背景寫入的間隔（秒）
+USAGE_BUFFER_MAX_EVENTS = int(os.environ.get('USAGE_BUFFER_MAX_EVENTS', 10000))  # 寫入持續失敗時緩衝區最多保留的事件數
+
+# 使用統計頁可查詢的最長天數
+USAGE_STATISTICS_MAX_DAYS = int(os.environ.get('USAGE_STATISTICS_MAX_DAYS', 365))
+
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'home'  # 可以修改為儀表板或其他適合的頁面
 
@@ -0,0 +1,73 @@
+"""
+檔案上傳處理模組。
+
+提供在上傳過程中逐塊計算內容雜湊值的上傳處理器，完成上傳時雜湊值已就緒，
+不需要再讀取一次檔案；另提供對既有檔案計算雜湊值的備用函數。
+"""
+import hashlib
+from pathlib import Path
+from typing import BinaryIO, Union
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+# 內容雜湊使用的演算法
+CONTENT_HASH_ALGORITHM = "sha256"
+
+# 計算既有檔案雜湊值時每次讀取的位元組數
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class HashingUploadHandlerMixin:
+    """
+    在上傳處理器實際保存資料塊時同步更新雜湊值，
+    完成後將十六進位雜湊值設定在上傳檔案的 content_hash 屬性
+    """
+
+    def new_file(self, *args, **kwargs):
+        # 必須在 super() 之前建立，MemoryFileUploadHandler 啟用時會拋出 StopFutureHandlers
+        self._hasher = hashlib.new(CONTENT_HASH_ALGORITHM)
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        # 返回 None 表示此處理器已保存該資料塊，否則資料會交給下一個處理器
+        if remaining is None:
+            self._hasher.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.content_hash = self._hasher.hexdigest()
+        return uploaded_file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin, MemoryFileUploadHandler):
+    """將小檔案保存在記憶體並同步計算內容雜湊值"""
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin, TemporaryFileUploadHandler):
+    """將大檔案寫入臨時檔案並同步計算內容雜湊值"""
+
+
+def compute_content_hash(source: Union[str, Path, BinaryIO], chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """
+    逐塊計算檔案內容的雜湊值，用於沒有在上傳時計算雜湊值的檔案
+
+    參數:
+        source: 檔案路徑或已開啟的二進位檔案物件
+        chunk_size: 每次讀取的位元組數
+
+    返回:
+        十六進位雜湊字串
+    """
+    hasher = hashlib.new(CONTENT_HASH_ALGORITHM)
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                hasher.update(chunk)
+    else:
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
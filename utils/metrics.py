@@ -0,0 +1,135 @@
+"""
+處理效能量測工具模組。
+
+提供累計各處理階段耗時的計時器、讀取程序峰值記憶體（RSS）的函數，
+以及輸出 Prometheus 文字格式指標的工具。
+"""
+import math
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+class StageTimer:
+    """累計各處理階段耗時的計時器"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """量測區塊耗時並累計到指定階段（例外發生時同樣記錄）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float) -> None:
+        """累計階段耗時（秒）"""
+        self.timings[name] = self.timings.get(name, 0.0) + max(0.0, seconds)
+
+    def update(self, timings: Optional[Dict[str, float]]) -> None:
+        """合併其他來源（例如轉錄器）回報的階段耗時"""
+        for name, seconds in (timings or {}).items():
+            self.add(name, seconds)
+
+    @property
+    def elapsed(self) -> float:
+        """自建立計時器起經過的秒數"""
+        return time.perf_counter() - self.started
+
+    def as_dict(self, ndigits: int = 3) -> Dict[str, float]:
+        """返回四捨五入後的階段耗時，適合存入 JSONField"""
+        return {name: round(seconds, ndigits) for name, seconds in self.timings.items()}
+
+
+def reset_peak_rss() -> bool:
+    """
+    重設目前程序的峰值 RSS 記錄（Linux 的 VmHWM），讓長駐工作程序可量測單一任務的峰值
+
+    返回:
+        是否成功重設；不支援的平台返回 False，此時 peak_rss_mb 為程序生命週期內的峰值
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    """取得目前程序的峰值 RSS（MB）"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以位元組為單位，Linux 以 KB 為單位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """以最近排名法計算已排序數列的百分位數"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def render_summary(
+    name: str,
+    help_text: str,
+    samples: Dict[str, List[float]],
+    label: Optional[str] = None,
+    quantiles: Iterable[float] = (0.5, 0.9, 0.99)
+) -> List[str]:
+    """
+    以 Prometheus summary 格式輸出數值分佈
+
+    參數:
+        name: 指標名稱
+        help_text: 指標說明
+        samples: 標籤值對應的數值列表；label 為 None 時使用鍵 ""
+        label: 標籤名稱，None 表示不加標籤
+        quantiles: 要輸出的分位數
+
+    返回:
+        Prometheus 文字格式的行列表
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} summary"]
+    for label_value, values in sorted(samples.items()):
+        base_labels = {label: label_value} if label else {}
+        ordered = sorted(values)
+        for q in quantiles:
+            labels = _format_labels({**base_labels, "quantile": str(q)})
+            lines.append(f"{name}{labels} {percentile(ordered, q):.6g}")
+        lines.append(f"{name}_sum{_format_labels(base_labels)} {sum(ordered):.6g}")
+        lines.append(f"{name}_count{_format_labels(base_labels)} {len(ordered)}")
+    return lines
+
+
+def render_gauge(name: str, help_text: str, value: float, labels: Optional[Dict[str, str]] = None) -> List[str]:
+    """以 Prometheus gauge 格式輸出單一數值"""
+    return [
+        f"# HELP {name} {help_text}",
+        f"# TYPE {name} gauge",
+        f"{name}{_format_labels(labels or {})} {value:.6g}",
+    ]
@@ -19,6 +19,8 @@ class AudioSegment(TypedDict, total=False):
     text: str
     speaker_id: Optional[str]
     confidence: Optional[float]
+    segment_id: Optional[int]  # 對應的 TranscriptSegment 主鍵（若有）
+    words: List[Dict[str, Any]]  # 詞層級時間戳記（word, start, end），辨識器有提供時才有
 
 # 轉錄結果類型
 class TranscriptionResult(TypedDict, total=False):
@@ -27,6 +29,15 @@ class TranscriptionResult(TypedDict, total=False):
     segments: List[AudioSegment]
     language: str
     duration: float
+    skipped_seconds: float  # 辨識前略過的靜音秒數
+    stage_timings: Dict[str, float]  # 各處理階段耗時（秒），例如 decode、vad、recognition
+
+# 串流轉錄事件類型
+class StreamEvent(TypedDict, total=False):
+    """串流轉錄事件的標準格式"""
+    type: Literal['partial', 'final']  # partial 為暫定文字，final 為已確定的片段
+    text: str
+    segment: Optional[AudioSegment]  # final 事件的片段（含時間戳記），無詞級時間時為 None
 
 # LLM 參數類型
 class LLMParameters(TypedDict, total=False):